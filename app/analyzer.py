@@ -1,150 +1,160 @@
-from dataclasses import dataclass
-from typing import List, Optional
-import re
+from typing import Dict, Iterable, List, Optional, Tuple
 import json
+import os
+import re
+import time
 from datetime import datetime
-from .openai_service import get_openai_service, GPTAnalysisResult
-
-
-@dataclass
-class Rule:
-	category: str
-	severity: str
-	pattern: re.Pattern
-	explanation: str
-	guidance: str
-
-
-def _rules() -> List[Rule]:
-	return [
-		Rule(
-			category="Perpetual Rights",
-			severity="high",
-			pattern=re.compile(r"in perpetuity|perpetual rights|forever irrevocable", re.IGNORECASE),
-			explanation="The agreement appears to grant rights forever (perpetual). This can mean you lose control of your work or likeness indefinitely.",
-			guidance="Ask to limit the term (e.g., 1-3 years) and specify exactly what rights are granted and where."
-		),
-		Rule(
-			category="Exclusivity / Non-Compete",
-			severity="high",
-			pattern=re.compile(r"exclusive\s+(services|rights)|non-\s*compete|exclusivity", re.IGNORECASE),
-			explanation="Exclusive or non-compete terms can block you from working with others or earning elsewhere.",
-			guidance="Ask to remove exclusivity, narrow it to specific projects/brands, or add a short, paid exclusivity window."
-		),
-		Rule(
-			category="Arbitration / Venue",
-			severity="medium",
-			pattern=re.compile(r"binding arbitration|waive\s+jury|venue\s+shall\s+be|governing law", re.IGNORECASE),
-			explanation="Arbitration and venue clauses can limit how and where disputes are resolved, often favoring the company.",
-			guidance="Ask for your local venue, the right to bring claims in court, and a mutual choice of law that is neutral."
-		),
-		Rule(
-			category="Indemnification",
-			severity="high",
-			pattern=re.compile(r"indemnif(y|ication)|hold\s+harmless", re.IGNORECASE),
-			explanation="One-sided indemnification can make you responsible for broad legal risks.",
-			guidance="Make indemnification mutual and limited to breaches you actually cause, capped at fees received."
-		),
-		Rule(
-			category="Ownership of Content / Likeness",
-			severity="high",
-			pattern=re.compile(r"work for hire|assign\s+all\s+rights|exclusive\s+license|use of likeness", re.IGNORECASE),
-			explanation="Transferring ownership or broad likeness rights can mean you can't control use of your image or content.",
-			guidance="Clarify you retain ownership and grant only a narrow, time-limited license for specified uses."
-		),
-		Rule(
-			category="Unilateral Changes",
-			severity="medium",
-			pattern=re.compile(r"we\s+may\s+modify\s+this\s+agreement|subject to change without notice", re.IGNORECASE),
-			explanation="Allows the other party to change terms without your consent.",
-			guidance="Require written mutual agreement for changes and notice periods."
-		),
-		Rule(
-			category="Confidentiality / Penalties",
-			severity="medium",
-			pattern=re.compile(r"non-?disparagement|liquidated damages|confidentiality", re.IGNORECASE),
-			explanation="Overbroad confidentiality or penalties can silence you or impose heavy fees.",
-			guidance="Limit to legitimate trade secrets; remove punitive liquidated damages; allow safety and legal reporting."
-		),
-		Rule(
-			category="Payment Terms / Chargebacks",
-			severity="medium",
-			pattern=re.compile(r"chargebacks|net\s*\d+|payment\s+upon\s+acceptance|withhold\s+payment", re.IGNORECASE),
-			explanation="Slow or conditional payment terms and chargebacks can delay or reduce your income.",
-			guidance="Ask for clear rates, payment on delivery or within 7-14 days, and limit chargebacks to valid, documented issues."
-		),
-		Rule(
-			category="Cancellation / No-Show Fees",
-			severity="low",
-			pattern=re.compile(r"cancellation fee|no-?show fee|forfeit fee", re.IGNORECASE),
-			explanation="Fees for cancellations or no-shows may be excessive or one-sided.",
-			guidance="Set fair, mutual cancellation terms with reasonable notice periods."
-		),
-		Rule(
-			category="Ownership of Content / Likeness",
-			severity="high",
-			pattern=re.compile(r"absolute right and permission to use", re.IGNORECASE),
-			explanation="Grants extremely broad rights to use your content or likeness without meaningful limits.",
-			guidance="Narrow the grant to specific, necessary uses; limit scope, territory, and duration; retain approval rights for sensitive uses."
-		),
-		Rule(
-			category="Broad Media Rights",
-			severity="high",
-			pattern=re.compile(r"in any media now known or hereinafter\s+invented", re.IGNORECASE),
-			explanation="Allows use across all current and future media, which is unusually broad and risky.",
-			guidance="Limit media types to those actually needed today, or require mutual consent for new media in the future."
-		),
-		Rule(
-			category="Perpetual Rights",
-			severity="high",
-			pattern=re.compile(r"without\s+time", re.IGNORECASE),
-			explanation="Suggests no time limit on rights, effectively making them perpetual.",
-			guidance="Add a clear term (e.g., 1-3 years) and renewal only by mutual written agreement."
-		),
-		Rule(
-			category="Payment Terms / Compensation",
-			severity="medium",
-			pattern=re.compile(r"no\s+claim\s+to\s+compensation", re.IGNORECASE),
-			explanation="States you have no right to compensation, which can waive payment for your work or likeness.",
-			guidance="Ensure express compensation terms are included, or remove any clause waiving compensation rights."
-		),
-        # Broad, perpetual, and universe-wide rights phrases flagged per user guidance
-        Rule(
-            category="Broad/Perpetual Rights Language",
-            severity="high",
-            pattern=re.compile(
-                r"(" \
-                r"owns\s+all\s+rights|" \
-                r"perpetual(?:ly)?\s+in\s+any\s+manner\s+whatsoever|" \
-                r"by\s+any\s+present\s+or\s+future\s+devices|" \
-                r"perpetual\s+right\s+to\s+use\s+my\s+name|" \
-                r"any\s+other\s+person\s+or\s+company\s+who\s+holds\s+or\s+acquires|" \
-                r"to\s+alter,?\s+dub,?\s+revise|" \
-                r"change\s+in\s+any\s+manner\s+whatsoever|" \
-                r"rights?\s+to\s+be\s+worldwide\s+and\s+in\s+perpetuity|" \
-                r"including\s+the\s+right\s+to\s+reproduce,?\s+use|" \
-                r"by\s+any\s+present\s+or\s+future\s+means\s+and\s+devices|" \
-                r"throughout\s+the\s+universe|" \
-                r"in\s+perpetuity\s+in\s+all\s+media|" \
-                r"whether\s+now\s+known\s+or\s+hereafter\s+devised|" \
-                r"for\s+any\s+medium" \
-                r")",
-                re.IGNORECASE,
-            ),
-            explanation="Very broad or perpetual rights language detected (e.g., universe-wide, all media, present/future devices, perpetual name/image use). Such terms can permanently transfer or license your rights without limits.",
-            guidance="Ask to limit scope (specific uses), territory, and term; remove universe-wide and perpetual language; require approvals for edits (alter/dub/revise) and name/likeness uses; consult union/agent or counsel."
-        ),
-	]
-
-
-def analyze_text(text: str):
+from .openai_service import get_openai_service, GPTAnalysisResult, MAX_CONTRACT_CHARS
+from .normalize import normalize
+from .fuzzy import confidence, lowercase
+from .rulebook import Rule, active_rulebook
+from .segmenter import Clause, attach_clauses, select_context
+from .metrics import RULE_PROFILING, rule_metrics
+from .classifier import classify_clauses, needs_gpt
+
+
+# language is a contract's language (see app.language); each has its own rule
+# pack, falling back to the default language's rules (see app.rulebook)
+
+
+def _rules(language: Optional[str] = None) -> List[Rule]:
+	return active_rulebook(language).rules
+
+
+def current_ruleset(language: Optional[str] = None) -> Dict[str, str]:
+	"""Rule id -> rule version for the rules in effect."""
+	return active_rulebook(language).ruleset
+
+
+def current_categories(language: Optional[str] = None) -> Dict[str, str]:
+	"""Rule id -> category for the rules in effect."""
+	return {rule.id: rule.category for rule in _rules(language)}
+
+
+def ruleset_version(language: Optional[str] = None) -> str:
+	"""Fingerprint of the current ruleset (all rule ids and versions); stored on
+	contracts so re-analysis knows which rules each contract was analyzed with."""
+	return active_rulebook(language).fingerprint
+
+
+# Rules scan the text in windows and may overrun their budget by at most one
+# window: re cannot be interrupted mid-search, so the budget is checked between
+# windows (and the rulecheck fuzzing keeps pathological patterns out up front).
+RULE_BUDGET_SECONDS = float(os.environ.get("CG_RULE_BUDGET_MS", "250")) / 1000
+RULE_WINDOW_CHARS = 8000
+RULE_WINDOW_OVERLAP = 1000  # longer than any match a rule is expected to produce
+
+
+def _run_rule(rule: Rule, text: str, deadline: float) -> Tuple[List[re.Match], bool]:
+	"""Matches of rule in text (same as finditer for matches shorter than the
+	overlap), and whether the rule was stopped at the deadline."""
+	matches = []
+	pos, n = 0, len(text)
+	while pos < n:
+		end = min(n, pos + RULE_WINDOW_CHARS)
+		# matches starting past limit belong to the next window
+		limit = n if end == n else end - RULE_WINDOW_OVERLAP
+		next_pos = limit
+		for match in rule.pattern.finditer(text, pos, end):
+			if match.start() >= limit:
+				break
+			matches.append(match)
+			next_pos = max(next_pos, match.end())
+		pos = next_pos
+		if pos < n and time.perf_counter() > deadline:
+			return matches, True
+	return matches, False
+
+
+_SEVERITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Spans separated by at most this many non-alphanumeric chars count as adjacent
+MERGE_GAP_CHARS = 3
+
+
+def merge_flags(flags: List[dict], text: str) -> List[dict]:
+	"""Merge overlapping or adjacent flags of the same category into one flag.
+
+	Sorting by (category, start) puts every run of mergeable spans next to each
+	other, so one sweep merges them: O(n log n). A merged flag spans all its
+	parts, keeps the highest severity (explanation and guidance come from
+	that rule) and the highest confidence, and lists every contributing rule
+	in rule_ids.
+	"""
+	merged: List[dict] = []
+	group: List[dict] = []
+	group_end = 0
+
+	def flush() -> None:
+		primary = min(group, key=lambda f: _SEVERITY_RANK.get(f["severity"], len(_SEVERITY_RANK)))
+		start = group[0]["start_index"]
+		flag = dict(primary, start_index=start, end_index=group_end)
+		flag["rule_ids"] = ",".join(sorted({rule_id for f in group for rule_id in (f.get("rule_ids") or f["rule_id"]).split(",")}))
+		flag["confidence"] = max(f.get("confidence", 1.0) for f in group)
+		if len(group) > 1:
+			flag["excerpt"] = text[max(0, start - 80): min(len(text), group_end + 80)]
+		merged.append(flag)
+
+	for flag in sorted(flags, key=lambda f: (f["category"], f["start_index"], -f["end_index"])):
+		if group and flag["category"] == group[0]["category"]:
+			gap = text[group_end:flag["start_index"]]
+			if flag["start_index"] <= group_end or (len(gap) <= MERGE_GAP_CHARS and not any(c.isalnum() for c in gap)):
+				group.append(flag)
+				group_end = max(group_end, flag["end_index"])
+				continue
+		if group:
+			flush()
+		group = [flag]
+		group_end = flag["end_index"]
+	if group:
+		flush()
+	merged.sort(key=lambda f: (f["start_index"], f["category"]))
+	return merged
+
+
+def _approximate_spans(rule: Rule, lowered: str, exact: List[Tuple[int, int]]) -> List[Tuple[int, int, float]]:
+	"""(start, end, confidence) of the rule's fuzzy phrases in lowercase text,
+	skipping spans an exact match of the rule already covers."""
+	spans = []
+	for phrase in rule.fuzzy:
+		for start, end, distance in phrase.find(lowered):
+			if not any(start < e and s < end for s, e in exact):
+				spans.append((start, end, confidence(phrase, distance)))
+	return spans
+
+
+def analyze_text(text: str, rule_ids: Optional[Iterable[str]] = None, ocr: bool = False, language: Optional[str] = None):
+	"""Run the rules of language (or only those in rule_ids) over text and return
+	flag dicts, overlapping matches of one category merged (see merge_flags).
+
+	With ocr=True the rules' fuzzy phrases are also matched within a small edit
+	distance (see app.fuzzy); those flags carry a confidence below 1.
+	"""
+	selected = set(rule_ids) if rule_ids is not None else None
+	text = text or ""
+	started = time.perf_counter()
+	# Rules match the normalized text; offsets and excerpts refer to the original
+	normalized = normalize(text)
+	lowered = lowercase(normalized.text) if ocr else None
 	flags = []
-	for rule in _rules():
-		for match in rule.pattern.finditer(text or ""):
-			start = match.start()
-			end = match.end()
+	# One rulebook for the whole analysis, even if a reload swaps it meanwhile
+	for rule in _rules(language):
+		if selected is not None and rule.id not in selected:
+			continue
+		rule_start = time.perf_counter()
+		matches, exceeded = _run_rule(rule, normalized.text, rule_start + RULE_BUDGET_SECONDS)
+		spans = [(match.start(), match.end(), 1.0) for match in matches]
+		if lowered is not None and rule.fuzzy:
+			spans += _approximate_spans(rule, lowered, [(s, e) for s, e, _ in spans])
+		if RULE_PROFILING:
+			rule_metrics.record_rule(rule.id, time.perf_counter() - rule_start, len(spans), len(normalized.text), exceeded)
+		if exceeded:
+			print(f"[rules] {rule.id} stopped after {RULE_BUDGET_SECONDS * 1000:.0f} ms on {len(text)} chars; its flags may be incomplete")
+		for span_start, span_end, match_confidence in spans:
+			start, end = normalized.to_original(span_start, span_end)
 			excerpt = text[max(0, start - 80): min(len(text), end + 80)]
 			flags.append({
+				"rule_id": rule.id,
+				"rule_version": rule.version,
 				"category": rule.category,
 				"severity": rule.severity,
 				"start_index": start,
@@ -152,36 +162,88 @@ def analyze_text(text: str):
 				"excerpt": excerpt,
 				"explanation": rule.explanation,
 				"guidance": rule.guidance,
+				"confidence": match_confidence,
 			})
+	flags = merge_flags(flags, text)
+	if RULE_PROFILING:
+		rule_metrics.record_analysis(time.perf_counter() - started, len(text))
 	return flags
 
 
-async def analyze_contract_comprehensive(text: str, contract_title: str = "Contract") -> dict:
+_SEVERITY_WEIGHT = {"high": 3, "medium": 2, "low": 1}
+_FOCUS_WEIGHT = 1000  # above any clause's flag weight
+
+
+def gpt_context(text: str, clauses: List[Clause], flags: Iterable, budget: int = MAX_CONTRACT_CHARS, focus: Iterable[int] = ()) -> str:
+	"""Contract text for GPT: whole when it fits, otherwise whole clauses that
+	fit the budget, the focus clauses first, then flagged ones (weighted by severity)."""
+	if len(text) <= budget or not clauses:
+		return text
+	scores: Dict[int, float] = {ordinal: _FOCUS_WEIGHT for ordinal in focus}
+	for flag in flags:
+		ordinal = flag["clause_ordinal"] if isinstance(flag, dict) else flag.clause_ordinal
+		severity = flag["severity"] if isinstance(flag, dict) else flag.severity
+		if ordinal is not None:
+			scores[ordinal] = scores.get(ordinal, 0) + _SEVERITY_WEIGHT.get(severity, 1)
+	return select_context(text, clauses, scores, budget)
+
+
+async def analyze_contract_comprehensive(
+	text: str,
+	contract_title: str = "Contract",
+	clauses: Optional[List[Clause]] = None,
+	ocr: bool = False,
+	rule_flags: Optional[List[dict]] = None,
+	reused_gpt: Optional[dict] = None,
+	focus: Iterable[int] = (),
+	language: Optional[str] = None,
+) -> dict:
 	"""
 	Perform comprehensive contract analysis using both rule-based and GPT analysis
-	Returns a dictionary with both rule-based flags and GPT analysis results
+	Returns a dictionary with both rule-based flags and GPT analysis results.
+	With the contract's clauses, flags get clause_ordinal and GPT sees whole clauses.
+	With a clause classifier model the clauses are scored too, and GPT is only
+	called when the model is unsure about the contract (see classifier.needs_gpt).
+	ocr=True matches key phrases approximately too (see analyze_text).
+	rule_flags and reused_gpt, when given (carried over from a near-duplicate
+	or the previous version, see app.dedup and app.versions), are used instead
+	of running the rules or calling GPT. The focus clauses (those changed since
+	the previous version) go first in GPT's context. The rules are those of the
+	contract's language.
 	"""
 	# Perform rule-based analysis
-	rule_flags = analyze_text(text)
+	if rule_flags is None:
+		rule_flags = analyze_text(text, ocr=ocr, language=language)
+	if clauses is not None:
+		attach_clauses(rule_flags, clauses)
+	clause_scores = classify_clauses(text, clauses) if clauses is not None else None
 	
 	# Perform GPT analysis if available
 	gpt_analysis = None
 	openai_service = get_openai_service()
-	if openai_service.is_available():
+	if reused_gpt is not None:
+		print("Skipping GPT analysis: reusing an earlier contract's")
+	elif openai_service.is_available() and not needs_gpt(clause_scores):
+		print(f"Skipping GPT analysis: classifier confidence {clause_scores.confidence:.2f}")
+	elif openai_service.is_available():
 		try:
-			gpt_analysis = await openai_service.analyze_contract_with_gpt(text, contract_title)
+			gpt_text = gpt_context(text, clauses or [], rule_flags, focus=focus)
+			gpt_analysis = await openai_service.analyze_contract_with_gpt(gpt_text, contract_title)
 		except Exception as e:
 			print(f"GPT analysis failed: {e}")
 	
 	# Prepare result
 	result = {
 		"rule_based_flags": rule_flags,
+		"clause_scores": clause_scores,
 		"gpt_analysis": None,
 		"analysis_timestamp": datetime.utcnow().isoformat()
 	}
 	
 	# Add GPT analysis if available
-	if gpt_analysis:
+	if reused_gpt is not None:
+		result["gpt_analysis"] = {key: reused_gpt[key] for key in ("summary", "key_risks", "recommendations", "overall_assessment", "confidence_score")}
+	elif gpt_analysis:
 		result["gpt_analysis"] = {
 			"summary": gpt_analysis.summary,
 			"key_risks": gpt_analysis.key_risks,
@@ -196,21 +258,32 @@ async def analyze_contract_comprehensive(text: str, contract_title: str = "Contr
 def save_gpt_analysis_to_contract(contract, gpt_analysis: GPTAnalysisResult):
 	"""
 	Save GPT analysis results to a contract model instance
-	Note: This function is temporarily disabled until database migration is complete
 	"""
 	if gpt_analysis:
-		# GPT columns are temporarily commented out in the model
-		# This function will work again after running the database migration
-		print("Warning: GPT analysis saving is temporarily disabled until database migration")
-		pass
+		contract.gpt_summary = gpt_analysis.summary
+		contract.gpt_key_risks = json.dumps(gpt_analysis.key_risks)
+		contract.gpt_recommendations = json.dumps(gpt_analysis.recommendations)
+		contract.gpt_overall_assessment = gpt_analysis.overall_assessment
+		contract.gpt_confidence_score = str(gpt_analysis.confidence_score)
+		contract.gpt_analysis_date = datetime.utcnow()
 
 
 def get_gpt_analysis_from_contract(contract) -> Optional[dict]:
 	"""
 	Retrieve GPT analysis results from a contract model instance
-	Note: This function is temporarily disabled until database migration is complete
 	"""
-	# GPT columns are temporarily commented out in the model
-	# This function will work again after running the database migration
-	print("Warning: GPT analysis retrieval is temporarily disabled until database migration")
-	return None 
\ No newline at end of file
+	if not contract.gpt_summary:
+		return None
+
+	try:
+		return {
+			"summary": contract.gpt_summary,
+			"key_risks": json.loads(contract.gpt_key_risks) if contract.gpt_key_risks else [],
+			"recommendations": json.loads(contract.gpt_recommendations) if contract.gpt_recommendations else [],
+			"overall_assessment": contract.gpt_overall_assessment,
+			"confidence_score": float(contract.gpt_confidence_score) if contract.gpt_confidence_score else 0.0,
+			"analysis_date": contract.gpt_analysis_date.isoformat() if contract.gpt_analysis_date else None
+		}
+	except (json.JSONDecodeError, ValueError) as e:
+		print(f"Error parsing GPT analysis from contract: {e}")
+		return None
@@ -58,4 +58,15 @@ async def get_current_user(request: Request) -> models.User:
 			raise HTTPException(status_code=401, detail="User not found")
 		return user
 	finally:
-		db.close() 
\ No newline at end of file
+		db.close() 
+
+# Admin endpoints are disabled unless CG_ADMIN_TOKEN is set; callers send it as X-Admin-Token
+ADMIN_TOKEN = os.environ.get("CG_ADMIN_TOKEN") or None
+
+
+async def require_admin(request: Request) -> None:
+	if not ADMIN_TOKEN:
+		raise HTTPException(status_code=404, detail="Not found")
+	token = request.headers.get("X-Admin-Token") or ""
+	if not hmac.compare_digest(token, ADMIN_TOKEN):
+		raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from .analyzer import analyze_text, ruleset_version
+from .classifier import ClauseScores, classify_clauses
+from .language import detect_language
+from .segmenter import Clause, attach_clauses, segment
+from .terms import Term, extract_terms
+
+# Analysis processes shared by batch requests of this worker; 0 = CPU count,
+# 1 analyzes in a thread of this process
+BATCH_WORKERS = int(os.environ.get("CG_BATCH_WORKERS", "0"))
+# Documents analyzed ahead of the one being returned, per pool process
+BATCH_LOOKAHEAD = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class Analysis(NamedTuple):
+	"""Everything /contracts/create stores for one document."""
+	ruleset_version: str
+	clauses: List[Clause]
+	flags: List[dict]
+	terms: List[Term]
+	clause_scores: Optional[ClauseScores]  # None without a classifier model
+	language: str
+
+
+def analyze_one(text: str, language: Optional[str] = None) -> Analysis:
+	"""Analysis of text with the rules of its language (detected unless given)."""
+	language = language or detect_language(text)
+	analyzed_with = ruleset_version(language)
+	clauses = segment(text)
+	flags = analyze_text(text, language=language)
+	attach_clauses(flags, clauses)
+	return Analysis(analyzed_with, clauses, flags, extract_terms(text, clauses), classify_clauses(text, clauses), language)
+
+
+def batch_workers() -> int:
+	return BATCH_WORKERS or os.cpu_count() or 1
+
+
+def get_pool() -> Optional[Executor]:
+	"""The shared analysis process pool, started on first use (None with one worker).
+
+	Processes are spawned rather than forked, so they do not inherit the
+	server's threads and open database connections.
+	"""
+	global _pool
+	workers = batch_workers()
+	if workers <= 1:
+		return None
+	with _pool_lock:
+		if _pool is None:
+			_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+		return _pool
+
+
+def stop_pool() -> None:
+	global _pool
+	with _pool_lock:
+		pool, _pool = _pool, None
+	if pool is not None:
+		pool.shutdown(cancel_futures=True)
+
+
+def analyze_many(texts: Iterable[str], workers: Optional[int] = None) -> Iterator[Analysis]:
+	"""analyze_one() over texts across the process pool, yielding results in input order.
+
+	texts is consumed lazily with a bounded number in flight, so it can be a
+	generator over a large corpus.
+	"""
+	pool = get_pool() if workers is None else (ProcessPoolExecutor(max_workers=workers) if workers > 1 else None)
+	if pool is None:
+		for text in texts:
+			yield analyze_one(text)
+		return
+	window = batch_workers() * BATCH_LOOKAHEAD if workers is None else workers * BATCH_LOOKAHEAD
+	pending = deque()
+	try:
+		for text in texts:
+			pending.append(pool.submit(analyze_one, text))
+			if len(pending) >= window:
+				yield pending.popleft().result()
+		while pending:
+			yield pending.popleft().result()
+	finally:
+		for future in pending:
+			future.cancel()
+		if workers is not None:
+			pool.shutdown()
@@ -0,0 +1,244 @@
+"""Local clause classifier: hashed word n-grams and a linear model in NumPy.
+
+A tier between the regex rules and GPT. Each clause's own text (see
+segmenter.own_spans) becomes a set of hashed unigram and bigram features,
+and one-vs-rest logistic regression scores it against every risk category.
+Scoring a contract is a gather and a cumulative sum over all its clauses at
+once, so it takes milliseconds. Training happens offline
+(python -m app.scripts.train_classifier) on clauses that the rules flagged,
+plus any hand-labelled examples, so paraphrases of flagged language score
+high even when no rule matches.
+
+The model is optional: without a model file every function here returns
+None and ingest runs as before.
+"""
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from zlib import crc32
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+from .normalize import normalize
+from .segmenter import Clause, own_spans
+
+CLASSIFIER_MODEL_PATH = os.environ.get("CG_CLASSIFIER_MODEL", os.path.join(os.path.dirname(__file__), "rules", "clause_model.npz"))
+# A clause is labelled with its top category from this probability on
+CLAUSE_MIN_SCORE = float(os.environ.get("CG_CLASSIFIER_MIN_SCORE", "0.5"))
+# Uploads call GPT only when the model is less confident than this about the contract
+GPT_GATING = os.environ.get("CG_GPT_GATING", "1") not in ("0", "false", "False")
+GPT_GATE_CONFIDENCE = float(os.environ.get("CG_GPT_GATE_CONFIDENCE", "0.9"))
+
+# 2^16 buckets x categories float32 weights: ~256 KB per category in memory
+DEFAULT_HASH_BITS = 16
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def clause_features(text: str, bits: int) -> np.ndarray:
+	"""Distinct hashed unigrams and bigrams of text. crc32 rather than hash()
+	because the buckets must not change between processes."""
+	words = _WORD.findall(normalize(text).text.lower())
+	grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+	mask = (1 << bits) - 1
+	hashed = np.fromiter((crc32(g.encode("utf-8")) & mask for g in grams), dtype=np.int64, count=len(grams))
+	return np.unique(hashed)
+
+
+def _batch(feature_sets: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""(all indices, per-index scale, segment bounds) for a batch of feature sets.
+	Features are binary and each clause's vector has unit L2 norm."""
+	lengths = np.fromiter((len(f) for f in feature_sets), dtype=np.int64, count=len(feature_sets))
+	bounds = np.zeros(len(feature_sets) + 1, dtype=np.int64)
+	np.cumsum(lengths, out=bounds[1:])
+	indices = np.concatenate(feature_sets) if len(feature_sets) else np.zeros(0, dtype=np.int64)
+	scale = np.repeat(1.0 / np.sqrt(np.maximum(lengths, 1)), lengths).astype(np.float32)
+	return indices, scale, bounds
+
+
+def _segment_sums(rows: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+	"""Sum of rows[bounds[i]:bounds[i + 1]] for every i (empty segments give 0)."""
+	totals = np.zeros((rows.shape[0] + 1, rows.shape[1]), dtype=np.float64)
+	np.cumsum(rows, axis=0, out=totals[1:])
+	return totals[bounds[1:]] - totals[bounds[:-1]]
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+	return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+
+@dataclass
+class ClauseModel:
+	categories: List[str]
+	weights: np.ndarray  # (2 ** bits, categories) float32
+	bias: np.ndarray  # (categories,) float32
+	bits: int
+
+	@cached_property
+	def version(self) -> str:
+		h = hashlib.sha256()
+		h.update("\0".join(self.categories).encode("utf-8"))
+		h.update(self.weights.tobytes())
+		h.update(self.bias.tobytes())
+		return h.hexdigest()[:12]
+
+	@classmethod
+	def empty(cls, categories: List[str], bits: int = DEFAULT_HASH_BITS) -> "ClauseModel":
+		return cls(list(categories), np.zeros((1 << bits, len(categories)), dtype=np.float32), np.zeros(len(categories), dtype=np.float32), bits)
+
+	def featurize(self, texts: Iterable[str]) -> List[np.ndarray]:
+		return [clause_features(text, self.bits) for text in texts]
+
+	def predict_features(self, feature_sets: Sequence[np.ndarray]) -> np.ndarray:
+		"""(clauses, categories) probabilities."""
+		indices, scale, bounds = _batch(feature_sets)
+		logits = _segment_sums(self.weights[indices] * scale[:, None], bounds) + self.bias
+		return _sigmoid(logits)
+
+	def predict(self, texts: Sequence[str]) -> np.ndarray:
+		return self.predict_features(self.featurize(texts))
+
+	def save(self, path: str) -> None:
+		np.savez_compressed(path, categories=np.array(self.categories), weights=self.weights, bias=self.bias, bits=np.array(self.bits))
+
+	@classmethod
+	def load(cls, path: str) -> "ClauseModel":
+		with np.load(path) as data:
+			return cls([str(c) for c in data["categories"]], data["weights"].astype(np.float32), data["bias"].astype(np.float32), int(data["bits"]))
+
+
+def train(
+	texts: Sequence[str],
+	labels: Sequence[Iterable[str]],
+	categories: Optional[List[str]] = None,
+	bits: int = DEFAULT_HASH_BITS,
+	epochs: int = 8,
+	learning_rate: float = 0.5,
+	l2: float = 1e-6,
+	batch_size: int = 64,
+	seed: int = 0,
+) -> ClauseModel:
+	"""Fit one-vs-rest logistic regression by mini-batch SGD. Positives are
+	up-weighted per category (up to 20x), as flagged clauses are rare."""
+	categories = categories or sorted({c for row in labels for c in row})
+	model = ClauseModel.empty(categories, bits)
+	column = {c: i for i, c in enumerate(categories)}
+	y = np.zeros((len(texts), len(categories)), dtype=np.float32)
+	for row, names in enumerate(labels):
+		for name in names:
+			if name in column:
+				y[row, column[name]] = 1.0
+	positives = y.sum(axis=0)
+	pos_weight = np.clip((len(texts) - positives) / np.maximum(positives, 1), 1.0, 20.0).astype(np.float32)
+	features = model.featurize(texts)
+	rng = np.random.default_rng(seed)
+	for epoch in range(epochs):
+		rate = learning_rate / (1 + epoch)
+		order = rng.permutation(len(texts))
+		for start in range(0, len(order), batch_size):
+			rows = order[start:start + batch_size]
+			batch = [features[i] for i in rows]
+			indices, scale, bounds = _batch(batch)
+			probs = model.predict_features(batch)
+			target = y[rows]
+			# d(weighted log loss)/d(logit)
+			grad = (probs - target) * np.where(target > 0, pos_weight, 1.0)
+			grad = grad.astype(np.float32) / len(rows)
+			per_index = np.repeat(grad, np.diff(bounds), axis=0) * scale[:, None]
+			np.add.at(model.weights, indices, -rate * per_index)
+			model.bias -= rate * grad.sum(axis=0)
+		model.weights *= (1 - rate * l2)
+	return model
+
+
+def evaluate(model: ClauseModel, texts: Sequence[str], labels: Sequence[Iterable[str]], threshold: float = 0.5) -> Dict[str, Dict[str, float]]:
+	"""Precision, recall, F1 and support per category, plus "micro" over all."""
+	probs = model.predict(texts)
+	predicted = probs >= threshold
+	column = {c: i for i, c in enumerate(model.categories)}
+	actual = np.zeros_like(predicted)
+	for row, names in enumerate(labels):
+		for name in names:
+			if name in column:
+				actual[row, column[name]] = True
+	report = {}
+	for name, tp, fp, fn in [
+		*[(c, (predicted[:, i] & actual[:, i]).sum(), (predicted[:, i] & ~actual[:, i]).sum(), (~predicted[:, i] & actual[:, i]).sum())
+		  for c, i in column.items()],
+		("micro", (predicted & actual).sum(), (predicted & ~actual).sum(), (~predicted & actual).sum()),
+	]:
+		precision = tp / (tp + fp) if tp + fp else 0.0
+		recall = tp / (tp + fn) if tp + fn else 0.0
+		f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+		report[name] = {"precision": float(precision), "recall": float(recall), "f1": float(f1), "support": int(tp + fn)}
+	return report
+
+
+@dataclass
+class ClauseScores:
+	"""Model output for one contract."""
+	model_version: str
+	confidence: float  # 1 = every clause's top category is clearly in (or out)
+	by_ordinal: Dict[int, Tuple[str, float]] = field(default_factory=dict)  # top category of labelled clauses
+
+	def apply(self, contract) -> None:
+		"""Set risk_category/risk_score on a Contract row's clauses and the model fields on the contract."""
+		for clause in contract.clauses:
+			category, score = self.by_ordinal.get(clause.ordinal, (None, None))
+			clause.risk_category, clause.risk_score = category, score
+		contract.model_confidence = self.confidence
+		contract.model_version = self.model_version
+
+
+_model: Optional[ClauseModel] = None
+_model_mtime: Optional[float] = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> Optional[ClauseModel]:
+	"""The model at CG_CLASSIFIER_MODEL, reloaded when the file changes; None without one."""
+	global _model, _model_mtime
+	try:
+		mtime = os.stat(CLASSIFIER_MODEL_PATH).st_mtime
+	except OSError:
+		return None
+	if mtime != _model_mtime:
+		with _model_lock:
+			if mtime != _model_mtime:
+				try:
+					model = ClauseModel.load(CLASSIFIER_MODEL_PATH)
+				except Exception as e:
+					print(f"[classifier] Could not load {CLASSIFIER_MODEL_PATH}: {e}")
+					return _model
+				_model, _model_mtime = model, mtime
+				print(f"[classifier] Loaded model {model.version} ({len(model.categories)} categories, 2^{model.bits} features)")
+	return _model
+
+
+def classify_clauses(text: str, clauses: List[Clause], model: Optional[ClauseModel] = None) -> Optional[ClauseScores]:
+	"""Score every clause's own text in one batch; None without a model."""
+	model = model or get_model()
+	if model is None:
+		return None
+	spans = own_spans(clauses) if clauses else [(None, 0, len(text))]
+	if not spans:
+		return ClauseScores(model.version, 1.0)
+	probs = model.predict([text[start:end] for _, start, end in spans])
+	# How far the least certain clause's top score is from a coin flip
+	confidence = float(2.0 * np.min(np.abs(probs.max(axis=1) - 0.5))) if probs.size else 1.0
+	scores = ClauseScores(model.version, round(confidence, 4))
+	best = probs.argmax(axis=1) if probs.size else []
+	for (ordinal, _, _), column, row in zip(spans, best, probs):
+		if ordinal is not None and row[column] >= CLAUSE_MIN_SCORE:
+			scores.by_ordinal[ordinal] = (model.categories[column], round(float(row[column]), 4))
+	return scores
+
+
+def needs_gpt(scores: Optional[ClauseScores]) -> bool:
+	"""Whether an upload should also be analyzed by GPT: always without a
+	model or with gating off, otherwise only for low-confidence contracts."""
+	return not GPT_GATING or scores is None or scores.confidence < GPT_GATE_CONFIDENCE
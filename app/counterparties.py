@@ -0,0 +1,241 @@
+"""Counterparties: normalized entities behind Contract.counterparty, with risk profiles.
+
+Each user's counterparties are entities looked up by normalized name:
+casefolded, punctuation and whitespace folded, with a leading "the" and
+legal suffixes ("Inc.", "LLC", "Ltd") dropped. So "Acme Studios, Inc." and
+"ACME  studios" are one entity. Other spellings can be added as aliases,
+which merges the entities they name.
+
+Every entity carries its profile, kept up to date at ingest like the risk
+summary counters (see app.summary):
+
+- contracts and flags per flag category;
+- histograms of payment days, term lengths and territories, so medians and
+  typical values are read without touching the contracts;
+- how many contracts have an exclusivity flag.
+
+Reading a profile reads one row.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import re
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .terms import PAYMENT_DAYS, TERM_LENGTH, TERRITORY
+
+_WORD = re.compile(r"[^\W_]+")
+_LEGAL_SUFFIXES = {
+	"inc", "incorporated", "llc", "llp", "lp", "ltd", "limited", "corp", "corporation", "co", "company",
+	"plc", "gmbh", "ag", "sa", "sas", "bv", "nv", "pty", "pte", "srl", "kk",
+}
+PERPETUAL = "perpetual"  # term_days key for perpetual terms
+
+
+def normalize_name(name: Optional[str]) -> Optional[str]:
+	"""Lookup key for a counterparty name; None when nothing is left."""
+	words = _WORD.findall((name or "").casefold())
+	if len(words) > 1 and words[0] == "the":
+		words = words[1:]
+	while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+		words = words[:-1]
+	return " ".join(words)[:255] or None
+
+
+def _is_exclusivity(category: str) -> bool:
+	return "exclusiv" in category.lower()
+
+
+def _get(item, key: str, attribute: str):
+	return item[key] if isinstance(item, dict) else getattr(item, attribute)
+
+
+def contract_profile(flags: Iterable, terms: Iterable) -> dict:
+	"""One contract's contribution to its counterparty's profile. flags are
+	analyzer dicts or ClauseFlag rows; terms are ContractTerm rows."""
+	flags_by_category = Counter(_get(f, "category", "category") for f in flags)
+	payment = Counter()
+	term = Counter()
+	territories = Counter()
+	for t in terms:
+		if t.kind == PAYMENT_DAYS and t.number_value is not None:
+			payment[str(int(t.number_value))] = 1
+		elif t.kind == TERM_LENGTH:
+			term[PERPETUAL if t.number_value is None else str(int(t.number_value))] = 1
+		elif t.kind == TERRITORY:
+			territories[t.value_text.lower()] = 1
+	return {
+		"flag_count": sum(flags_by_category.values()),
+		"categories": {category: [1, n] for category, n in flags_by_category.items()},
+		"payment_days": dict(payment),
+		"term_days": dict(term),
+		"territories": dict(territories),
+		"exclusive": int(any(_is_exclusivity(c) for c in flags_by_category)),
+	}
+
+
+def _add_counts(stored: Optional[str], delta: Dict[str, object], sign: int) -> str:
+	counts = json.loads(stored) if stored else {}
+	for key, value in delta.items():
+		if isinstance(value, list):
+			current = counts.get(key, [0] * len(value))
+			counts[key] = [a + sign * b for a, b in zip(current, value)]
+			if not any(counts[key]):
+				del counts[key]
+		else:
+			counts[key] = counts.get(key, 0) + sign * value
+			if not counts[key]:
+				del counts[key]
+	return json.dumps(counts, sort_keys=True)
+
+
+def _apply_profile(counterparty: models.Counterparty, profile: dict, sign: int, contracts: int = 1) -> None:
+	counterparty.contract_count = (counterparty.contract_count or 0) + sign * contracts
+	counterparty.flag_count = (counterparty.flag_count or 0) + sign * profile["flag_count"]
+	counterparty.exclusive_count = (counterparty.exclusive_count or 0) + sign * profile["exclusive"]
+	counterparty.category_counts = _add_counts(counterparty.category_counts, profile["categories"], sign)
+	counterparty.payment_days = _add_counts(counterparty.payment_days, profile["payment_days"], sign)
+	counterparty.term_days = _add_counts(counterparty.term_days, profile["term_days"], sign)
+	counterparty.territories = _add_counts(counterparty.territories, profile["territories"], sign)
+	counterparty.updated_at = datetime.utcnow()
+
+
+def _stored_profile(counterparty: models.Counterparty) -> dict:
+	"""The counterparty's whole profile as one contract_profile()-shaped dict."""
+	return {
+		"flag_count": counterparty.flag_count or 0,
+		"exclusive": counterparty.exclusive_count or 0,
+		"categories": json.loads(counterparty.category_counts or "{}"),
+		"payment_days": json.loads(counterparty.payment_days or "{}"),
+		"term_days": json.loads(counterparty.term_days or "{}"),
+		"territories": json.loads(counterparty.territories or "{}"),
+	}
+
+
+def _locked(db: Session, counterparty_id: int) -> models.Counterparty:
+	# FOR UPDATE where supported: concurrent ingests add to the same counters
+	return db.query(models.Counterparty).filter_by(id=counterparty_id).with_for_update().one()
+
+
+def resolve(db: Session, user_id: int, name: Optional[str]) -> Optional[models.Counterparty]:
+	"""The user's counterparty called name (or one of its aliases), created if new."""
+	key = normalize_name(name)
+	if key is None:
+		return None
+	alias = db.get(models.CounterpartyAlias, (user_id, key))
+	if alias is not None:
+		return _locked(db, alias.counterparty_id)
+	counterparty = models.Counterparty(user_id=user_id, name=" ".join(name.split())[:255], contract_count=0, flag_count=0, exclusive_count=0)
+	try:
+		with db.begin_nested():
+			db.add(counterparty)
+			db.flush()
+			db.add(models.CounterpartyAlias(user_id=user_id, normalized_name=key, name=counterparty.name, counterparty_id=counterparty.id))
+			db.flush()
+	except IntegrityError:
+		# Another writer created it first
+		alias = db.get(models.CounterpartyAlias, (user_id, key))
+		return _locked(db, alias.counterparty_id)
+	return counterparty
+
+
+def add_contract(db: Session, contract: models.Contract, flags: Iterable) -> None:
+	"""Link a new contract to its counterparty and add it to the profile.
+	Runs in the caller's session, so the profile commits with the contract."""
+	if contract.user_id is None:
+		return
+	counterparty = resolve(db, contract.user_id, contract.counterparty)
+	if counterparty is None:
+		return
+	contract.counterparty_id = counterparty.id
+	_apply_profile(counterparty, contract_profile(flags, contract.terms), 1)
+
+
+def apply_contract(db: Session, contract: models.Contract, flags: Iterable, sign: int = 1) -> None:
+	"""Add (sign=1) or remove (sign=-1) a linked contract's flags and terms from its counterparty's profile."""
+	if contract.counterparty_id is None:
+		return
+	_apply_profile(_locked(db, contract.counterparty_id), contract_profile(flags, contract.terms), sign)
+
+
+def add_alias(db: Session, counterparty: models.Counterparty, name: str) -> Optional[models.Counterparty]:
+	"""Make name another spelling of counterparty. If name is already another
+	counterparty of the user's, that one is merged in: its contracts, profile
+	and aliases move over. Returns the merged counterparty, if any. Raises
+	ValueError for a name with nothing left after normalizing."""
+	key = normalize_name(name)
+	if key is None:
+		raise ValueError("Alias is empty after normalizing")
+	alias = db.get(models.CounterpartyAlias, (counterparty.user_id, key))
+	if alias is None:
+		db.add(models.CounterpartyAlias(user_id=counterparty.user_id, normalized_name=key, name=" ".join(name.split())[:255], counterparty_id=counterparty.id))
+		return None
+	if alias.counterparty_id == counterparty.id:
+		return None
+	other = _locked(db, alias.counterparty_id)
+	_apply_profile(counterparty, _stored_profile(other), 1, contracts=other.contract_count or 0)
+	db.query(models.Contract).filter_by(counterparty_id=other.id).update({"counterparty_id": counterparty.id}, synchronize_session=False)
+	db.query(models.CounterpartyAlias).filter_by(counterparty_id=other.id).update({"counterparty_id": counterparty.id}, synchronize_session=False)
+	db.expire(other)
+	db.delete(other)
+	return other
+
+
+def median(histogram: Dict[str, int]) -> Optional[float]:
+	"""Median of a {value: count} histogram of numbers."""
+	values = sorted((float(value), n) for value, n in histogram.items() if n > 0)
+	total = sum(n for _, n in values)
+	if not total:
+		return None
+	lower = upper = None
+	seen = 0
+	for value, n in values:
+		if lower is None and seen + n >= (total + 1) // 2:
+			lower = value
+		if seen + n >= total // 2 + 1:
+			upper = value
+			break
+		seen += n
+	return (lower + upper) / 2
+
+
+def _top(histogram: Dict[str, int], limit: int = 5) -> List[Tuple[str, int]]:
+	return sorted(histogram.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def profile(counterparty: models.Counterparty) -> dict:
+	"""GET /counterparties/{id}/profile, read from the precomputed row."""
+	stored = _stored_profile(counterparty)
+	contracts = counterparty.contract_count or 0
+	share = (lambda n: round(n / contracts, 3)) if contracts else (lambda n: 0.0)
+	payment = stored["payment_days"]
+	term = dict(stored["term_days"])
+	perpetual = term.pop(PERPETUAL, 0)
+	return {
+		"id": counterparty.id,
+		"name": counterparty.name,
+		"aliases": sorted(alias.name for alias in counterparty.aliases),
+		"contract_count": contracts,
+		"flag_count": stored["flag_count"],
+		"categories": sorted(
+			(
+				{"category": category, "contract_count": c, "flag_count": f, "share": share(c)}
+				for category, (c, f) in stored["categories"].items()
+			),
+			key=lambda row: (-row["contract_count"], -row["flag_count"], row["category"]),
+		),
+		"payment_days": {
+			"median": median(payment),
+			"min": min((float(v) for v in payment), default=None),
+			"max": max((float(v) for v in payment), default=None),
+			"contract_count": sum(payment.values()),
+		},
+		"term_days": {"median": median(term), "perpetual_share": share(perpetual), "contract_count": sum(term.values()) + perpetual},
+		"exclusivity_share": share(stored["exclusive"]),
+		"territories": [{"territory": name, "contract_count": n} for name, n in _top(stored["territories"])],
+		"updated_at": counterparty.updated_at,
+	}
@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
+from fastapi import Request
+from typing import Optional
 import os
+import time
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./contracts.db")
 
@@ -8,9 +11,23 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./contracts.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://", 1)
 
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite production mode, on by default for SQLite URLs:
+#   CG_SQLITE_TUNING=0 disables the connection pragmas below
+#   CG_SQLITE_WRITER=0 lets request sessions write directly instead of via app.writer
+#   CG_SQLITE_BUSY_TIMEOUT_MS / CG_SQLITE_MMAP_SIZE / CG_SQLITE_CACHE_SIZE tune the pragmas
+SQLITE_TUNING = IS_SQLITE and os.environ.get("CG_SQLITE_TUNING", "1") in ("1", "true", "True")
+SQLITE_WRITER = IS_SQLITE and os.environ.get("CG_SQLITE_WRITER", "1") in ("1", "true", "True")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("CG_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.environ.get("CG_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.environ.get("CG_SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, so 64 MB
+
 connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     connect_args = {"check_same_thread": False}
+    if SQLITE_TUNING:
+        connect_args["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
 
 engine = create_engine(
 	DATABASE_URL,
@@ -18,8 +35,69 @@ engine = create_engine(
 	future=True,
 )
 
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+	cursor = dbapi_connection.cursor()
+	try:
+		cursor.execute("PRAGMA journal_mode=WAL")
+		cursor.execute("PRAGMA synchronous=NORMAL")
+		cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+		cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+		cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+		cursor.execute("PRAGMA temp_store=MEMORY")
+	finally:
+		cursor.close()
+
+
+if SQLITE_TUNING:
+	event.listen(engine, "connect", _apply_sqlite_pragmas)
+
 SessionLocal = scoped_session(sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True))
 
+# Engine used only by the single writer thread (app.writer). Its transactions
+# start with BEGIN IMMEDIATE so the write lock is taken up front and waits on
+# busy_timeout, rather than failing when a deferred read upgrades to a write.
+writer_engine = None
+WriterSession = None
+if SQLITE_WRITER:
+	writer_engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True, pool_size=1, max_overflow=0)
+	if SQLITE_TUNING:
+		event.listen(writer_engine, "connect", _apply_sqlite_pragmas)
+
+	@event.listens_for(writer_engine, "connect")
+	def _disable_pysqlite_begin(dbapi_connection, connection_record):
+		dbapi_connection.isolation_level = None
+
+	@event.listens_for(writer_engine, "begin")
+	def _begin_immediate(conn):
+		conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+	WriterSession = sessionmaker(bind=writer_engine, autocommit=False, autoflush=False, future=True)
+
+# Optional read replica for read-only endpoints (see get_read_db):
+#   DATABASE_REPLICA_URL         replica URL; unset = everything uses the primary
+#   CG_REPLICA_MAX_LAG_SECONDS   fall back to the primary when the replica is further behind (default 5)
+#   CG_REPLICA_PIN_SECONDS       after a write, the client reads from the primary this long (default 10)
+#   CG_REPLICA_LAG_CHECK_SECONDS how long a lag measurement is reused (default 1)
+REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL") or None
+if REPLICA_URL and REPLICA_URL.startswith("postgres://"):
+	REPLICA_URL = REPLICA_URL.replace("postgres://", "postgresql+psycopg2://", 1)
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("CG_REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_PIN_SECONDS = int(os.environ.get("CG_REPLICA_PIN_SECONDS", "10"))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get("CG_REPLICA_LAG_CHECK_SECONDS", "1"))
+PRIMARY_PIN_COOKIE = "cg_primary_until"
+
+replica_engine = None
+ReplicaSessionLocal = None
+if REPLICA_URL:
+	replica_connect_args = {}
+	if REPLICA_URL.startswith("sqlite"):
+		replica_connect_args = {"check_same_thread": False}
+	replica_engine = create_engine(REPLICA_URL, connect_args=replica_connect_args, future=True)
+	if REPLICA_URL.startswith("sqlite") and SQLITE_TUNING:
+		event.listen(replica_engine, "connect", _apply_sqlite_pragmas)
+	ReplicaSessionLocal = sessionmaker(bind=replica_engine, autocommit=False, autoflush=False, future=True)
+
 Base = declarative_base()
 
 
@@ -31,43 +109,124 @@ def get_db():
 		db.close()
 
 
-def init_db() -> None:
-	from . import models  # noqa: F401
-	Base.metadata.create_all(bind=engine)
-	
-	# Ensure new columns/tables exist for both SQLite and Postgres deployments
+# Postgres standby: zero when everything received has been replayed, otherwise
+# the age of the last replayed transaction. Primaries return NULL (no lag).
+_PG_REPLICA_LAG_SQL = """
+	SELECT CASE
+		WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+		ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+	END
+"""
+
+_replica_lag = {"checked_at": 0.0, "lag": None}
+
+
+def replica_lag_seconds() -> Optional[float]:
+	"""Measured replica lag in seconds, cached briefly; None when the replica is unreachable."""
+	now = time.monotonic()
+	if now - _replica_lag["checked_at"] < REPLICA_LAG_CHECK_SECONDS:
+		return _replica_lag["lag"]
+	lag: Optional[float]
 	try:
-		with engine.begin() as conn:
-			if DATABASE_URL.startswith("sqlite"):
-				# SQLite column additions
-				res = conn.exec_driver_sql("PRAGMA table_info(contracts)").fetchall()
-				cols = {row[1] for row in res}
-				if 'production' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN production VARCHAR(255)")
-				if 'user_id' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN user_id INTEGER")
-				if 'status' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN status VARCHAR(20)")
-				if 'consent_notes' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN consent_notes TEXT")
+		with replica_engine.connect() as conn:
+			if replica_engine.dialect.name == "postgresql":
+				lag = float(conn.exec_driver_sql(_PG_REPLICA_LAG_SQL).scalar() or 0.0)
 			else:
-				# Postgres column additions
-				res = conn.exec_driver_sql("""
-					SELECT column_name 
-					FROM information_schema.columns 
-					WHERE table_name = 'contracts'
-				""").fetchall()
-				cols = {row[0] for row in res}
-				
-				if 'production' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN production VARCHAR(255)")
-				if 'user_id' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN user_id INTEGER")
-				if 'status' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN status VARCHAR(20)")
-				if 'consent_notes' not in cols:
-					conn.exec_driver_sql("ALTER TABLE contracts ADD COLUMN consent_notes TEXT")
+				# No replication metadata to inspect (e.g. a SQLite copy); just check it answers
+				conn.exec_driver_sql("SELECT 1")
+				lag = 0.0
 	except Exception as e:
-		# Best-effort column addition; ignore if not applicable
-		print(f"Database column addition warning: {e}")
-		pass 
\ No newline at end of file
+		print(f"Replica lag check failed, reading from primary: {e}")
+		lag = None
+	_replica_lag.update(checked_at=now, lag=lag)
+	return lag
+
+
+def _use_replica(request) -> bool:
+	if ReplicaSessionLocal is None:
+		return False
+	# Read-your-own-writes: clients that just wrote stay on the primary for a while
+	try:
+		if int(request.cookies.get(PRIMARY_PIN_COOKIE, "0")) > time.time():
+			return False
+	except ValueError:
+		pass
+	lag = replica_lag_seconds()
+	return lag is not None and lag <= REPLICA_MAX_LAG_SECONDS
+
+
+def get_read_db(request: Request):
+	"""Session for read-only endpoints: the replica when configured, healthy and
+	caught up, and the client has not written recently; otherwise the primary."""
+	if _use_replica(request):
+		db = ReplicaSessionLocal()
+	else:
+		db = SessionLocal()
+	try:
+		yield db
+	finally:
+		db.close()
+
+
+async def run_write(db, fn):
+	"""Run fn(session) in a transaction and return its result.
+
+	In SQLite mode the work is queued to the process-wide writer thread and
+	committed in a batch with other writes; otherwise it runs on the request
+	session. fn must return plain values (ids, dicts), not ORM instances.
+	"""
+	if SQLITE_WRITER:
+		from .writer import get_writer
+		return await get_writer().run(fn)
+	try:
+		result = fn(db)
+		db.commit()
+		return result
+	except Exception:
+		db.rollback()
+		raise
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Set CG_AUTO_MIGRATE=1 for local development to apply pending migrations on
+# startup. In production run `alembic upgrade head` once per deploy instead.
+AUTO_MIGRATE = os.environ.get("CG_AUTO_MIGRATE", "0") in ("1", "true", "True")
+
+
+def _alembic_config():
+	from alembic.config import Config
+	cfg = Config()
+	cfg.set_main_option("script_location", MIGRATIONS_DIR)
+	return cfg
+
+
+def init_db() -> None:
+	"""Verify the database schema is at the latest migration revision.
+
+	Schema changes live in app/migrations and are applied with
+	`alembic upgrade head`; workers only compare revisions on startup.
+	"""
+	from alembic import command
+	from alembic.runtime.migration import MigrationContext
+	from alembic.script import ScriptDirectory
+	from . import models  # noqa: F401
+
+	cfg = _alembic_config()
+	head = ScriptDirectory.from_config(cfg).get_current_head()
+	with engine.connect() as conn:
+		current = MigrationContext.configure(conn).get_current_revision()
+	if current == head:
+		return
+
+	if AUTO_MIGRATE:
+		print(f"[startup] Migrating database from {current or 'empty'} to {head}")
+		with engine.begin() as conn:
+			cfg.attributes["connection"] = conn
+			command.upgrade(cfg, "head")
+		return
+
+	raise RuntimeError(
+		f"Database schema is at revision {current or 'none'}, expected {head}. "
+		"Run `alembic upgrade head` (or set CG_AUTO_MIGRATE=1 for local development)."
+	)
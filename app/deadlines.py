@@ -0,0 +1,140 @@
+"""Contract deadlines derived from the extracted terms (see app.terms).
+
+Three kinds, each reminded CG_DEADLINE_LEAD_DAYS (default: 30) before it is due:
+
+- expiry: an expiry date stated in the contract, or derived from the
+  effective date and the term length;
+- renewal_notice: the last day to give notice before an expiry, from a
+  notice period ("sixty (60) days' written notice");
+- exclusivity_end: the effective date (or the contract date) plus a period
+  or term stated in a clause with an exclusivity flag.
+
+Deadlines already past are not stored. They are rows in contract_deadlines,
+fired by app.scheduler.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+import os
+import re
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .terms import DURATION, EFFECTIVE_DATE, EXPIRY_DATE, TERM_LENGTH
+
+LEAD_DAYS = int(os.environ.get("CG_DEADLINE_LEAD_DAYS", "30"))
+
+EXPIRY = "expiry"
+RENEWAL_NOTICE = "renewal_notice"
+EXCLUSIVITY_END = "exclusivity_end"
+
+PENDING, FIRED, FAILED, DISMISSED = "pending", "fired", "failed", "dismissed"
+
+# Around a period, marks it as a notice period
+_NOTICE = re.compile(r"\bnotice\b|\bnotif|\bnon-renewal\b", re.IGNORECASE)
+NOTICE_CONTEXT_CHARS = 60
+
+
+def _category(flag) -> str:
+	return flag["category"] if isinstance(flag, dict) else flag.category
+
+
+def _ordinal(flag) -> Optional[int]:
+	return flag.get("clause_ordinal") if isinstance(flag, dict) else flag.clause_ordinal
+
+
+def derive(text: str, terms: Iterable, flags: Iterable, contract_date: Optional[date] = None) -> List[Tuple[str, date, Optional[int], Optional[int]]]:
+	"""(kind, due date, start, end of the term it comes from) for a contract's
+	ContractTerm rows and flags, in due order."""
+	terms = list(terms)
+	found = set()
+	expiries = sorted({t.date_value for t in terms if t.kind == EXPIRY_DATE and t.date_value is not None})
+	for t in terms:
+		if t.kind == EXPIRY_DATE and t.date_value is not None:
+			found.add((EXPIRY, t.date_value, t.start_index, t.end_index))
+
+	notice_periods = []
+	exclusive_clauses = {_ordinal(f) for f in flags if "exclusiv" in _category(f).lower() and _ordinal(f) is not None}
+	effective = next((t.date_value for t in terms if t.kind == EFFECTIVE_DATE and t.date_value is not None), None) or contract_date
+	for t in terms:
+		if t.kind not in (DURATION, TERM_LENGTH) or t.number_value is None or t.start_index is None:
+			continue
+		around = text[max(0, t.start_index - NOTICE_CONTEXT_CHARS):t.end_index + NOTICE_CONTEXT_CHARS]
+		if t.kind == DURATION and _NOTICE.search(around):
+			notice_periods.append(t)
+		elif t.clause_ordinal in exclusive_clauses and effective is not None:
+			found.add((EXCLUSIVITY_END, effective + timedelta(days=t.number_value), t.start_index, t.end_index))
+	for expiry in expiries:
+		for t in notice_periods:
+			found.add((RENEWAL_NOTICE, expiry - timedelta(days=t.number_value), t.start_index, t.end_index))
+
+	# One deadline per kind and day
+	unique = {}
+	for kind, due, start, end in sorted(found, key=lambda d: (d[1], d[0], d[2] if d[2] is not None else -1)):
+		unique.setdefault((kind, due), (kind, due, start, end))
+	return list(unique.values())
+
+
+def remind_at(due: date, now: Optional[datetime] = None) -> datetime:
+	"""Start of the day LEAD_DAYS before due, or now when that has passed."""
+	now = now or datetime.utcnow()
+	return max(now, datetime.combine(due - timedelta(days=LEAD_DAYS), time()))
+
+
+def build(contract: models.Contract, flags: Iterable, skip: Set[Tuple[str, date]] = frozenset()) -> List[models.ContractDeadline]:
+	"""Deadline rows for a contract, leaving out those already past and (kind, due) pairs in skip."""
+	today = datetime.utcnow().date()
+	now = datetime.utcnow()
+	return [
+		models.ContractDeadline(
+			user_id=contract.user_id, kind=kind, due_date=due, remind_at=remind_at(due, now),
+			status=PENDING, attempts=0, start_index=start, end_index=end,
+		)
+		for kind, due, start, end in derive(contract.text, contract.terms, flags, contract.contract_date)
+		if due >= today and (kind, due) not in skip
+	]
+
+
+def schedule(contract: models.Contract, flags: Iterable) -> int:
+	"""Attach deadlines to a new contract; returns how many."""
+	contract.deadlines = build(contract, flags)
+	return len(contract.deadlines)
+
+
+def reschedule(db: Session, contract: models.Contract, flags: Iterable) -> int:
+	"""Replace a stored contract's pending deadlines after its terms or flags changed.
+	Deadlines already fired or dismissed are kept and not recreated."""
+	done = set()
+	for deadline in list(contract.deadlines):
+		if deadline.status == PENDING:
+			contract.deadlines.remove(deadline)
+		else:
+			done.add((deadline.kind, deadline.due_date))
+	added = build(contract, flags, skip=done)
+	contract.deadlines.extend(added)
+	return len(added)
+
+
+def supersede(db: Session, contract_id: int) -> None:
+	"""Dismiss a contract's pending deadlines, e.g. when a new version replaces it."""
+	db.query(models.ContractDeadline).filter_by(contract_id=contract_id, status=PENDING).update(
+		{"status": DISMISSED}, synchronize_session=False,
+	)
+
+
+def superseded(db: Session, contract_ids: Iterable[int]) -> Set[int]:
+	"""Those of contract_ids that a newer version replaces; their deadlines stay dismissed."""
+	return {
+		contract_id for (contract_id,) in
+		db.query(models.Contract.previous_version_id).filter(models.Contract.previous_version_id.in_(list(contract_ids)))
+	}
+
+
+def describe(kind: str, due: date, title: str) -> str:
+	if kind == EXPIRY:
+		return f'"{title}" expires on {due.isoformat()}. Decide now whether to renew or renegotiate.'
+	if kind == RENEWAL_NOTICE:
+		return f'Notice for "{title}" is due by {due.isoformat()}: after that it may renew on the same terms.'
+	if kind == EXCLUSIVITY_END:
+		return f'Exclusivity under "{title}" ends on {due.isoformat()}.'
+	return f'Deadline for "{title}" on {due.isoformat()}.'
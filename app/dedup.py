@@ -0,0 +1,152 @@
+"""Near-duplicate contracts: MinHash signatures and an LSH index.
+
+Performers get the same release form over and over with only a name and a
+date changed. Every contract gets a MinHash signature of its word 3-grams
+at ingest, and the signature's bands are stored in contract_lsh_bands. Any
+contract sharing a band bucket is a candidate. Candidates are ranked by how
+many of the 128 signature slots they share, which estimates the Jaccard
+similarity of the two texts.
+
+A new upload that is at least CG_DUP_THRESHOLD similar to one of the user's
+own contracts is reported as a near-duplicate of it. That contract's flags
+are carried over for the unchanged text (see app.diffing), and its GPT
+analysis is reused instead of calling GPT again. With CG_DUP_SCOPE=all,
+other users' contracts are used for boilerplate too, but only their rule
+flags: GPT text and contract ids never cross users.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from zlib import crc32
+import hashlib
+import os
+import re
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from . import models
+from .analyzer import get_gpt_analysis_from_contract
+from .diffing import can_carry_over, carry_over_flags
+from .normalize import normalize
+
+# Jaccard similarity from which a contract is a near-duplicate and its analysis is reused
+# (a one-page release form with a new name and date is about 0.85)
+DUP_THRESHOLD = float(os.environ.get("CG_DUP_THRESHOLD", "0.8"))
+# "user": look for duplicates among the user's own contracts; "all": across the corpus (flags only)
+DUP_SCOPE = os.environ.get("CG_DUP_SCOPE", "user")
+DUP_REUSE = os.environ.get("CG_DUP_REUSE", "1") not in ("0", "false", "False")
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+# 16 bands of 8 rows: texts 80% alike share a bucket with probability 0.95, 90% alike 0.9999, 50% alike 0.06
+BANDS, ROWS = 16, 8
+# Shingles hashed per block, bounding the (block x NUM_PERM) working array
+_BLOCK = 4096
+
+_PRIME = (1 << 32) + 15  # smallest prime above 2^32
+_rng = np.random.default_rng(20261019)
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def minhash(text: str) -> np.ndarray:
+	"""NUM_PERM uint32 minimums of (a * crc32(shingle) + b) mod p over the text's word 3-grams."""
+	words = _WORD.findall(normalize(text or "").text.lower())
+	if len(words) < SHINGLE_WORDS:
+		words = words + [""] * (SHINGLE_WORDS - len(words))
+	shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+	hashes = np.fromiter((crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+	signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+	for start in range(0, len(hashes), _BLOCK):
+		block = hashes[start:start + _BLOCK, None]
+		np.minimum(signature, ((block * _A + _B) % _PRIME).min(axis=0), out=signature)
+	return (signature & 0xFFFFFFFF).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+	"""Estimated Jaccard similarity of the texts behind two signatures."""
+	return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+	"""One signed 64-bit bucket key per band."""
+	rows = signature.reshape(BANDS, ROWS)
+	return [int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), "big", signed=True) for row in rows]
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+	return np.frombuffer(data, dtype=np.uint32)
+
+
+def index_contract(contract: models.Contract, signature: Optional[np.ndarray] = None) -> np.ndarray:
+	"""Store the contract's signature and LSH bands on the (unsaved or loaded) row."""
+	if signature is None:
+		signature = minhash(contract.text)
+	contract.minhash = signature.tobytes()
+	contract.lsh_bands = [models.ContractLSHBand(band=i, bucket=bucket) for i, bucket in enumerate(band_buckets(signature))]
+	return signature
+
+
+def find_similar(
+	db: Session,
+	signature: np.ndarray,
+	user_id: Optional[int],
+	threshold: float = DUP_THRESHOLD,
+	exclude_id: Optional[int] = None,
+	limit: int = 10,
+) -> List[Tuple[models.Contract, float]]:
+	"""Contracts (the user's, or everyone's with user_id None) at least threshold
+	similar to signature, most similar first."""
+	query = db.query(models.ContractLSHBand.contract_id).filter(
+		tuple_(models.ContractLSHBand.band, models.ContractLSHBand.bucket).in_(list(enumerate(band_buckets(signature))))
+	)
+	candidates = {contract_id for (contract_id,) in query.distinct() if contract_id != exclude_id}
+	if not candidates:
+		return []
+	rows = db.query(models.Contract.id, models.Contract.minhash).filter(models.Contract.id.in_(candidates))
+	if user_id is not None:
+		rows = rows.filter(models.Contract.user_id == user_id)
+	scored = sorted(
+		((contract_id, similarity(signature, from_bytes(data))) for contract_id, data in rows if data),
+		key=lambda item: -item[1],
+	)
+	scored = [(contract_id, score) for contract_id, score in scored if score >= threshold][:limit]
+	contracts = {c.id: c for c in db.query(models.Contract).filter(models.Contract.id.in_([cid for cid, _ in scored]))}
+	return [(contracts[contract_id], score) for contract_id, score in scored if contract_id in contracts]
+
+
+@dataclass
+class NearDuplicate:
+	"""The contract an upload is a near-duplicate of, and what can be reused from it."""
+	source: models.Contract
+	similarity: float
+	same_user: bool
+	gpt_analysis: Optional[dict] = None  # the source's stored GPT analysis, same user only
+
+
+def find_near_duplicate(db: Session, signature: np.ndarray, user_id: int) -> Optional[NearDuplicate]:
+	"""The most similar of the user's contracts above DUP_THRESHOLD, else with
+	CG_DUP_SCOPE=all the most similar of anyone's; None when there is none."""
+	found = find_similar(db, signature, user_id, limit=1)
+	if found:
+		source, score = found[0]
+		return NearDuplicate(source, score, True, get_gpt_analysis_from_contract(source) if DUP_REUSE else None)
+	if DUP_SCOPE == "all":
+		found = find_similar(db, signature, None, limit=1)
+		if found:
+			return NearDuplicate(found[0][0], found[0][1], False)
+	return None
+
+
+def reuse_flags(duplicate: NearDuplicate, text: str, ocr: bool, ruleset: str, language: Optional[str] = None) -> Optional[List[dict]]:
+	"""Flags for text carried over from the near-duplicate, with only the
+	changed text re-analyzed. None when they cannot be reused: reuse is off, or
+	the duplicate was analyzed with other rules or from another kind of source."""
+	source = duplicate.source
+	if not DUP_REUSE or not can_carry_over(source, ocr, ruleset):
+		return None
+	flags, analyzed = carry_over_flags(source.text, [flag.to_analysis() for flag in source.flags], text, ocr=ocr, language=language)
+	print(f"[dedup] {duplicate.similarity:.0%} similar to contract {source.id}: re-analyzed {analyzed} of {len(text)} chars")
+	return flags
@@ -0,0 +1,149 @@
+"""Text diffs between two versions of a contract, and flags carried across them.
+
+diff_spans() skips the lines both versions start and end with, then
+compares the remaining lines, so its cost follows the size of the change
+rather than the size of the contract. Small replaced blocks are then refined
+to characters, so a changed name touches only the name, not the whole line.
+
+carry_over_flags() re-runs the rules only around the changed text. It keeps
+the old flags that lie entirely in unchanged text and shifts them to their
+new offsets.
+"""
+from bisect import bisect_right
+from difflib import SequenceMatcher
+from itertools import accumulate
+from typing import Iterable, List, Optional, Tuple
+
+from .analyzer import analyze_text, merge_flags
+
+# Replaced blocks up to this size (on both sides) are diffed by character
+REFINE_CHARS = 2000
+# Text re-analyzed on each side of a change; longer than any expected rule match
+CONTEXT_CHARS = 300
+
+# (tag, old start, old end, new start, new end) in characters; tag as in difflib
+Span = Tuple[str, int, int, int, int]
+
+
+def diff_spans(old: str, new: str) -> List[Span]:
+	"""Opcodes turning old into new, in character offsets."""
+	old_lines = old.splitlines(keepends=True)
+	new_lines = new.splitlines(keepends=True)
+	old_at = [0, *accumulate(len(line) for line in old_lines)]
+	new_at = [0, *accumulate(len(line) for line in new_lines)]
+	head = 0
+	while head < min(len(old_lines), len(new_lines)) and old_lines[head] == new_lines[head]:
+		head += 1
+	tail = 0
+	while tail < min(len(old_lines), len(new_lines)) - head and old_lines[-1 - tail] == new_lines[-1 - tail]:
+		tail += 1
+	old_end, new_end = len(old_lines) - tail, len(new_lines) - tail
+	opcodes = [
+		(tag, i1 + head, i2 + head, j1 + head, j2 + head)
+		for tag, i1, i2, j1, j2 in SequenceMatcher(
+			None, old_lines[head:old_end], new_lines[head:new_end], autojunk=False,
+		).get_opcodes()
+	]
+	if head:
+		opcodes.insert(0, ("equal", 0, head, 0, head))
+	if tail:
+		opcodes.append(("equal", old_end, len(old_lines), new_end, len(new_lines)))
+	spans: List[Span] = []
+	for tag, i1, i2, j1, j2 in opcodes:
+		a1, a2, b1, b2 = old_at[i1], old_at[i2], new_at[j1], new_at[j2]
+		if tag == "replace" and a2 - a1 <= REFINE_CHARS and b2 - b1 <= REFINE_CHARS:
+			for sub, k1, k2, l1, l2 in SequenceMatcher(None, old[a1:a2], new[b1:b2], autojunk=False).get_opcodes():
+				_append(spans, (sub, a1 + k1, a1 + k2, b1 + l1, b1 + l2))
+		else:
+			_append(spans, (tag, a1, a2, b1, b2))
+	return spans
+
+
+def _append(spans: List[Span], span: Span) -> None:
+	"""Add span, joining it to the previous one when both are equal or both changes."""
+	if spans and (spans[-1][0] == "equal") == (span[0] == "equal"):
+		tag, a1, _, b1, _ = spans[-1]
+		spans[-1] = (tag if tag == span[0] else "replace", a1, span[2], b1, span[4])
+	else:
+		spans.append(span)
+
+
+def changed_size(spans: Iterable[Span]) -> int:
+	"""Characters removed plus characters added."""
+	return sum((a2 - a1) + (b2 - b1) for tag, a1, a2, b1, b2 in spans if tag != "equal")
+
+
+def map_span(spans: List[Span], starts: List[int], start: int, end: int) -> Tuple[int, int, bool]:
+	"""(new start, new end, whether the span lies in one unchanged block) for an
+	old [start, end) span; starts holds the spans' old starts. Ends in changed
+	text map to the edges of its replacement."""
+	first = spans[max(0, bisect_right(starts, start) - 1)]
+	last = spans[max(0, bisect_right(starts, max(start, end - 1)) - 1)]
+	new_start = first[3] + start - first[1] if first[0] == "equal" else first[3]
+	new_end = last[3] + end - last[1] if last[0] == "equal" else last[4]
+	return new_start, max(new_start, new_end), first is last and first[0] == "equal"
+
+
+def _merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+	merged: List[Tuple[int, int]] = []
+	for start, end in sorted(intervals):
+		if merged and start <= merged[-1][1]:
+			merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+		else:
+			merged.append((start, end))
+	return merged
+
+
+def _overlaps(start: int, end: int, intervals: List[Tuple[int, int]]) -> bool:
+	return any(start <= b and a <= end for a, b in intervals)
+
+
+def can_carry_over(source, ocr: bool, ruleset: str) -> bool:
+	"""Whether a stored contract's flags are valid for new text apart from the
+	changes: same ruleset version, and both texts from OCR or neither."""
+	return source.text is not None and source.ruleset_version == ruleset and bool(source.used_ocr) == ocr
+
+
+def carry_over_flags(
+	old_text: str,
+	old_flags: List[dict],
+	new_text: str,
+	ocr: bool = False,
+	spans: Optional[List[Span]] = None,
+	language: Optional[str] = None,
+) -> Tuple[List[dict], int]:
+	"""Flags for new_text, given the flags of old_text from the same rules:
+	(flags, characters re-analyzed).
+
+	The changed text, plus the new offsets of any old flag touching it (grown
+	until no other old flag touches it), is the dirty region. The rules run
+	on it with CONTEXT_CHARS on either side. Their flags that touch it replace
+	the old flags there, and all other old flags are shifted.
+	"""
+	spans = diff_spans(old_text, new_text) if spans is None else spans
+	dirty = [(b1, b2) for tag, _, _, b1, b2 in spans if tag != "equal"]
+	if not dirty:
+		return [dict(flag) for flag in old_flags], 0
+	starts = [span[1] for span in spans]
+	kept = [(flag, *map_span(spans, starts, flag["start_index"], flag["end_index"])) for flag in old_flags]
+	grew = True
+	while grew:
+		grew = False
+		for item in list(kept):
+			_, start, end, unchanged = item
+			if not unchanged or _overlaps(start, end, dirty):
+				kept.remove(item)
+				dirty.append((start, end))
+				grew = True
+		dirty = _merge_intervals(dirty)
+
+	flags = [dict(flag, start_index=start, end_index=end) for flag, start, end, _ in kept]
+	windows = _merge_intervals([(max(0, a - CONTEXT_CHARS), min(len(new_text), b + CONTEXT_CHARS)) for a, b in dirty])
+	analyzed = 0
+	for window_start, window_end in windows:
+		analyzed += window_end - window_start
+		for flag in analyze_text(new_text[window_start:window_end], ocr=ocr, language=language):
+			start, end = flag["start_index"] + window_start, flag["end_index"] + window_start
+			if _overlaps(start, end, dirty):
+				flags.append(dict(flag, start_index=start, end_index=end))
+	return merge_flags(flags, new_text), analyzed
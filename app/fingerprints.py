@@ -0,0 +1,167 @@
+"""Standard clauses: a curated library of recurring clauses, recognized by fingerprint.
+
+The same indemnification and likeness-release paragraphs turn up across many
+counterparties. A clause in the library carries curated guidance and cached
+GPT commentary, and every stored clause that matches it gets them with no
+GPT call.
+
+A clause's fingerprint is computed from its words: normalized, lowercased,
+without leading clause numbers. It has two parts:
+
+- exact: a 64-bit hash of the word sequence, for identical wording;
+- simhash: a 64-bit SimHash of the words, for wording that differs in a few
+  words. On clauses of a few dozen words, a one-word edit moves it by about
+  3 bits (at most 6 in 9 cases out of 10), while unrelated clauses are 15 or
+  more bits apart. Word 3-grams, the usual choice for whole documents, move
+  it by 7 bits per edit on texts this short.
+
+Both are indexed. A SimHash within MAX_DISTANCE bits of another agrees with
+it exactly in at least one of its BLOCKS = MAX_DISTANCE + 1 blocks
+(pigeonhole), so a lookup is one indexed query on the exact hashes and one on
+the blocks, whatever the size of the library.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib
+import os
+import re
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+from .normalize import normalize
+from .openai_service import get_openai_service
+from .segmenter import own_spans
+
+# Clauses shorter than this are not fingerprinted: headings and one-liners match too easily
+MIN_WORDS = 12
+# The SimHash is indexed in this many blocks (9 or 10 bits each)
+BLOCKS = 7
+# Largest SimHash distance (in bits, at most BLOCKS - 1) at which a clause is still recognized
+MAX_DISTANCE = min(BLOCKS - 1, int(os.environ.get("CG_CLAUSE_MAX_DISTANCE", "6")))
+
+_WORD = re.compile(r"[a-z0-9]+")
+COMMENTARY_QUESTION = (
+	"This clause appears in many performer contracts. Explain what it means for the performer, "
+	"what is unusual or risky about it, and what to ask for instead."
+)
+
+# Clause numbers and list markers at the start: "4", "2", "iv", "a"
+_NUMBERING = re.compile(r"^(?:\d+|[ivxlc]{1,6}|[a-z])$")
+_BITS = np.arange(64, dtype=np.uint64)
+# (shift, mask) of each block
+_BLOCK_SPANS = [(64 * i // BLOCKS, (1 << (64 * (i + 1) // BLOCKS - 64 * i // BLOCKS)) - 1) for i in range(BLOCKS)]
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+	exact: int  # signed 64-bit
+	simhash: int  # signed 64-bit
+
+	def blocks(self) -> Tuple[int, ...]:
+		unsigned = self.simhash & 0xFFFFFFFFFFFFFFFF
+		return tuple((unsigned >> shift) & mask for shift, mask in _BLOCK_SPANS)
+
+
+def _signed(value: int) -> int:
+	return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _hash64(data: str) -> int:
+	return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def clause_words(text: str) -> List[str]:
+	words = _WORD.findall(normalize(text).text.lower())
+	start = 0
+	while start < min(2, len(words)) and _NUMBERING.match(words[start]):
+		start += 1
+	return words[start:]
+
+
+def fingerprint(text: str) -> Optional[Fingerprint]:
+	"""The clause's fingerprint, or None when it has fewer than MIN_WORDS words."""
+	words = clause_words(text)
+	if len(words) < MIN_WORDS:
+		return None
+	hashes = np.array([_hash64(w) for w in words], dtype=np.uint64)
+	ones = ((hashes[:, None] >> _BITS) & np.uint64(1)).sum(axis=0)
+	simhash = int(sum(1 << int(i) for i in np.flatnonzero(ones * 2 > len(words))))
+	return Fingerprint(_signed(_hash64(" ".join(words))), _signed(simhash))
+
+
+def distance(a: int, b: int) -> int:
+	"""Bits in which two SimHashes differ."""
+	return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def lookup(db: Session, prints: Sequence[Optional[Fingerprint]]) -> List[Optional[Tuple[models.StandardClause, int]]]:
+	"""(library clause, SimHash distance) for each fingerprint, or None when no
+	clause is within MAX_DISTANCE. Identical wording has distance 0."""
+	wanted = [p for p in prints if p is not None]
+	if not wanted:
+		return [None] * len(prints)
+	exact: Dict[int, models.StandardClause] = {
+		clause.exact_hash: clause
+		for clause in db.query(models.StandardClause).filter(models.StandardClause.exact_hash.in_({p.exact for p in wanted}))
+	}
+	near: List[models.StandardClause] = []
+	rest = [p for p in wanted if p.exact not in exact]
+	if rest and MAX_DISTANCE > 0:
+		columns = models.StandardClause.simhash_blocks()
+		near = db.query(models.StandardClause).filter(or_(*(
+			column.in_({p.blocks()[i] for p in rest}) for i, column in enumerate(columns)
+		))).all()
+	found: List[Optional[Tuple[models.StandardClause, int]]] = []
+	for p in prints:
+		if p is None:
+			found.append(None)
+		elif p.exact in exact:
+			found.append((exact[p.exact], 0))
+		else:
+			best = min(((distance(p.simhash, c.simhash), c.id, c) for c in near), default=None, key=lambda item: item[:2])
+			found.append((best[2], best[0]) if best is not None and best[0] <= MAX_DISTANCE else None)
+	return found
+
+
+def recognize(db: Session, contract: models.Contract) -> int:
+	"""Link the contract's clauses to the library clauses they match; returns
+	how many matched. Only a clause's own text (up to its first child) counts."""
+	rows = {row.ordinal: row for row in contract.clauses}
+	spans = own_spans([row.to_clause() for row in contract.clauses])
+	matches = lookup(db, [fingerprint(contract.text[start:end]) for _, start, end in spans])
+	for row in rows.values():
+		row.standard_clause_id = row.standard_distance = None
+	recognized = 0
+	for (ordinal, _, _), match in zip(spans, matches):
+		if match is not None:
+			rows[ordinal].standard_clause_id = match[0].id
+			rows[ordinal].standard_distance = match[1]
+			recognized += 1
+	return recognized
+
+
+def new_standard_clause(db: Session, text: str, **fields) -> models.StandardClause:
+	"""A library row for text with its fingerprint. Raises ValueError when the
+	text is too short or the library already has the same wording."""
+	fp = fingerprint(text)
+	if fp is None:
+		raise ValueError(f"A standard clause needs at least {MIN_WORDS} words")
+	existing = db.query(models.StandardClause).filter_by(exact_hash=fp.exact).first()
+	if existing is not None:
+		raise ValueError(f"Standard clause {existing.id} ({existing.title}) has the same wording")
+	clause = models.StandardClause(text=text.strip(), exact_hash=fp.exact, simhash=fp.simhash, **fields)
+	for column, block in zip(models.StandardClause.simhash_blocks(), fp.blocks()):
+		setattr(clause, column.key, block)
+	return clause
+
+
+async def generate_commentary(clause: models.StandardClause) -> Optional[str]:
+	"""GPT commentary on a library clause, or None when GPT is unavailable. Callers
+	store it on the clause, so each clause costs one GPT call, ever."""
+	service = get_openai_service()
+	if not service.is_available():
+		return None
+	return await service.get_contract_advice(COMMENTARY_QUESTION, clause.text)
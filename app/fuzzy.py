@@ -0,0 +1,168 @@
+"""Approximate phrase matching for OCR text.
+
+Tesseract reads "in perpetuity" as "in perpetuitv" and "hold harmless" as
+"hold harm less", which the exact rule patterns miss. A rule can list key
+phrases ("fuzzy" in the rulebook) that are also matched within a small edit
+distance when the text came from OCR.
+
+Matching is filter-and-verify and stays linear in the text. A phrase allowed
+k errors is cut into k + 1 pieces, and at least one of them occurs unchanged
+in any match (pigeonhole). One regex pass over the pieces finds candidate
+windows. Each window is then verified with Myers' bit-parallel edit distance
+algorithm, which advances the whole dynamic-programming column of the phrase
+with a handful of integer operations per character.
+"""
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, Iterator, List, Optional, Tuple
+import re
+
+# Phrases shorter than this are never matched approximately: too many real words are that close
+MIN_FUZZY_LENGTH = 6
+# Pieces of the filter are at least this long, so they stay selective
+MIN_PIECE_LENGTH = 4
+
+
+def default_max_errors(phrase: str) -> int:
+	"""Edit distance allowed for a phrase: one error below 16 chars, two from there."""
+	if len(phrase) < MIN_FUZZY_LENGTH:
+		return 0
+	return 1 if len(phrase) < 16 else 2
+
+
+def _peq(pattern: str) -> Dict[str, int]:
+	"""Bit mask of the positions of each character in pattern."""
+	masks: Dict[str, int] = {}
+	for i, char in enumerate(pattern):
+		masks[char] = masks.get(char, 0) | (1 << i)
+	return masks
+
+
+def _myers(peq: Dict[str, int], m: int, text: str, positions: range, anchored: bool) -> Iterator[Tuple[int, int]]:
+	"""(position, distance) for each text position, where distance is the edit
+	distance between the pattern and the best substring ending there (search),
+	or the text read so far (anchored). Hyyrö's formulation of Myers (1999)."""
+	mask = (1 << m) - 1
+	high = 1 << (m - 1)
+	pv, mv, score = mask, 0, m
+	carry = 1 if anchored else 0
+	for j in positions:
+		eq = peq.get(text[j], 0)
+		xv = eq | mv
+		xh = (((eq & pv) + pv) ^ pv) | eq
+		ph = mv | (~(xh | pv) & mask)
+		mh = pv & xh
+		if ph & high:
+			score += 1
+		elif mh & high:
+			score -= 1
+		ph = ((ph << 1) | carry) & mask
+		mh = (mh << 1) & mask
+		pv = mh | (~(xv | ph) & mask)
+		mv = ph & xv
+		yield j, score
+
+
+def _split(phrase: str, pieces: int, sample: str) -> List[str]:
+	"""Cut phrase into pieces, choosing the cut that occurs least in sample text."""
+	best = None
+	counts: Dict[str, int] = {}
+	for cuts in combinations(range(MIN_PIECE_LENGTH, len(phrase) - MIN_PIECE_LENGTH + 1), pieces - 1):
+		bounds = (0,) + cuts + (len(phrase),)
+		parts = [phrase[a:b] for a, b in zip(bounds, bounds[1:])]
+		if any(len(p) < MIN_PIECE_LENGTH or not p.strip() for p in parts):
+			continue
+		for p in parts:
+			if p not in counts:
+				counts[p] = sample.count(p)
+		cost = (sum(counts[p] for p in parts), max(len(p) for p in parts) - min(len(p) for p in parts))
+		if best is None or cost < best[0]:
+			best = (cost, parts)
+	if best is None:
+		return [phrase]
+	return best[1]
+
+
+def _is_word_char(text: str, i: int) -> bool:
+	return 0 <= i < len(text) and text[i].isalnum()
+
+
+@dataclass(frozen=True)
+class FuzzyPhrase:
+	phrase: str  # lowercase
+	max_errors: int
+	pieces: Tuple[str, ...]
+	filter: re.Pattern  # any of the pieces
+	peq: Dict[str, int]
+	peq_reversed: Dict[str, int]
+
+	def find(self, text: str) -> Iterator[Tuple[int, int, int]]:
+		"""(start, end, distance) of whole-word approximate matches in lowercase text."""
+		m, k = len(self.phrase), self.max_errors
+		windows: List[List[int]] = []
+		for hit in self.filter.finditer(text):
+			start, end = max(0, hit.start() - m - k), min(len(text), hit.end() + m + k)
+			if windows and start <= windows[-1][1]:
+				windows[-1][1] = max(windows[-1][1], end)
+			else:
+				windows.append([start, end])
+		for start, end in windows:
+			run: List[Tuple[int, int]] = []
+			for j, distance in _myers(self.peq, m, text, range(start, end), anchored=False):
+				if distance <= k:
+					run.append((j, distance))
+					continue
+				if run:
+					match = self._best(text, run)
+					if match:
+						yield match
+					run = []
+			if run:
+				match = self._best(text, run)
+				if match:
+					yield match
+
+	def _best(self, text: str, run: List[Tuple[int, int]]) -> Optional[Tuple[int, int, int]]:
+		"""The match among consecutive end positions within the error budget:
+		ending at a word boundary, fewest errors, starting at a word boundary."""
+		m, k = len(self.phrase), self.max_errors
+		ends = [(j, d) for j, d in run if not _is_word_char(text, j + 1)]
+		for j, _ in sorted(ends, key=lambda item: (item[1], item[0])):
+			# Anchored at j, read backwards: distance of the phrase to text[i:j + 1] for every start i
+			starts = [
+				(distance, _is_word_char(text, i - 1), j - i, i)
+				for i, distance in _myers(self.peq_reversed, m, text, range(j, max(-1, j - m - k - 1), -1), anchored=True)
+				if distance <= k
+			]
+			if not starts:
+				continue
+			distance, inside_word, _, i = min(starts)
+			if not inside_word and text[i].isalnum():
+				return i, j + 1, distance
+		return None
+
+
+def compile_phrase(phrase: str, max_errors: Optional[int] = None, sample: str = "") -> FuzzyPhrase:
+	"""A FuzzyPhrase with its filter pieces chosen to be rare in sample.
+	Raises ValueError for phrases too short to match approximately."""
+	phrase = " ".join(phrase.lower().split())
+	k = default_max_errors(phrase) if max_errors is None else max_errors
+	if len(phrase) < MIN_FUZZY_LENGTH or k < 1:
+		raise ValueError(f"fuzzy phrase {phrase!r} must be at least {MIN_FUZZY_LENGTH} chars and allow an error")
+	if len(phrase) < (k + 1) * MIN_PIECE_LENGTH or k * 4 > len(phrase):
+		raise ValueError(f"fuzzy phrase {phrase!r} is too short for {k} errors")
+	pieces = tuple(_split(phrase, k + 1, sample.lower()))
+	return FuzzyPhrase(phrase, k, pieces, re.compile("|".join(re.escape(p) for p in pieces)), _peq(phrase), _peq(phrase[::-1]))
+
+
+def lowercase(text: str) -> str:
+	"""text.lower(), keeping offsets when a character lowercases to several."""
+	lowered = text.lower()
+	if len(lowered) == len(text):
+		return lowered
+	return "".join(c.lower()[0] for c in text)
+
+
+def confidence(phrase: FuzzyPhrase, distance: int) -> float:
+	"""1.0 for an exact match, less by the share of the phrase that had to be edited."""
+	return round(1.0 - distance / len(phrase.phrase), 3)
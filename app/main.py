@@ -1,13 +1,17 @@
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from .database import init_db, engine, get_db
-from .routers import contracts, auth
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
+from .database import init_db, engine, get_db, REPLICA_URL, REPLICA_PIN_SECONDS, PRIMARY_PIN_COOKIE
+from .routers import contracts, auth, admin, counterparties, alerts
 from .auth import get_current_user
+from .reanalysis import register_ruleset
+from .rulebook import add_listener, load_packs, active_rulebook
+from .metrics import RULE_PROFILING, rule_metrics
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,6 +24,9 @@ templates = Jinja2Templates(directory="app/templates")
 
 app.include_router(contracts.router, prefix="/contracts", tags=["contracts"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+app.include_router(counterparties.router, prefix="/counterparties", tags=["counterparties"])
+app.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
 
 async def get_auth_status(request: Request):
 	"""Check if user is authenticated, return user if authenticated, None if not"""
@@ -29,9 +36,31 @@ async def get_auth_status(request: Request):
 	except HTTPException:
 		return None
 
+@app.middleware("http")
+async def pin_writers_to_primary(request: Request, call_next):
+	"""After a successful write, send this client's reads to the primary for a
+	few seconds so it sees its own changes before the replica catches up."""
+	response = await call_next(request)
+	if REPLICA_URL and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+		response.set_cookie(
+			PRIMARY_PIN_COOKIE,
+			str(int(time.time()) + REPLICA_PIN_SECONDS),
+			max_age=REPLICA_PIN_SECONDS,
+			httponly=True,
+			samesite="lax",
+		)
+	return response
+
 @app.on_event("startup")
 async def on_startup() -> None:
 	init_db()
+	# Record every ruleset that becomes active, in any language, and compile the
+	# rulebooks now rather than in a request: a broken default one fails startup
+	add_listener(register_ruleset)
+	load_packs()
+	# Fire contract deadlines from this worker too; leases keep workers from doubling up
+	from .scheduler import start_scheduler
+	start_scheduler()
 	# Log which database backend is active (helps verify persistence on Render)
 	try:
 		driver = getattr(engine.url, "drivername", "unknown")
@@ -40,6 +69,16 @@ async def on_startup() -> None:
 	except Exception:
 		pass
 
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+	from .scheduler import stop_scheduler
+	await stop_scheduler()
+	# Flush queued SQLite writes before the worker exits
+	from .writer import stop_writer
+	stop_writer()
+	from .batch import stop_pool
+	stop_pool()
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
 	user = await get_auth_status(request)
@@ -71,6 +110,13 @@ async def register_page(request: Request):
 	user = await get_auth_status(request)
 	return templates.TemplateResponse("register.html", {"request": request, "user": user})
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+	"""Per-rule analyzer metrics of this worker (Prometheus text format)"""
+	if not RULE_PROFILING:
+		raise HTTPException(status_code=404, detail="Rule profiling is disabled (CG_RULE_PROFILING=0)")
+	return PlainTextResponse(rule_metrics.render(active_rulebook().rule_cost_ms), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
 	"""Health check endpoint for monitoring"""
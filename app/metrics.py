@@ -0,0 +1,69 @@
+import os
+import threading
+from typing import Dict, List
+
+# Per-rule timing of every analysis; cheap (a clock read per rule), on by default
+RULE_PROFILING = os.environ.get("CG_RULE_PROFILING", "1") not in ("0", "false", "False")
+
+
+class RuleMetrics:
+	"""Counters of this worker process, rendered in the Prometheus text format."""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.analyses = 0
+		self.analysis_seconds = 0.0
+		self.analysis_chars = 0
+		# rule id -> [runs, seconds, max seconds, matches, input chars, budget exceeded]
+		self.rules: Dict[str, List[float]] = {}
+
+	def record_rule(self, rule_id: str, seconds: float, matches: int, chars: int, exceeded: bool) -> None:
+		with self._lock:
+			row = self.rules.setdefault(rule_id, [0, 0.0, 0.0, 0, 0, 0])
+			row[0] += 1
+			row[1] += seconds
+			row[2] = max(row[2], seconds)
+			row[3] += matches
+			row[4] += chars
+			row[5] += 1 if exceeded else 0
+
+	def record_analysis(self, seconds: float, chars: int) -> None:
+		with self._lock:
+			self.analyses += 1
+			self.analysis_seconds += seconds
+			self.analysis_chars += chars
+
+	def render(self, calibration_ms: Dict[str, float]) -> str:
+		with self._lock:
+			rules = {rule_id: list(row) for rule_id, row in self.rules.items()}
+			totals = (self.analyses, self.analysis_seconds, self.analysis_chars)
+		lines = [
+			"# HELP cg_analyses_total Rule analyses run by this worker.",
+			"# TYPE cg_analyses_total counter",
+			f"cg_analyses_total {totals[0]}",
+			"# TYPE cg_analysis_seconds_total counter",
+			f"cg_analysis_seconds_total {totals[1]:.6f}",
+			"# TYPE cg_analysis_input_chars_total counter",
+			f"cg_analysis_input_chars_total {totals[2]}",
+		]
+		series = [
+			("cg_rule_runs_total", "counter", "Times each rule ran.", 0, "{:.0f}"),
+			("cg_rule_seconds_total", "counter", "Wall time spent matching each rule.", 1, "{:.6f}"),
+			("cg_rule_seconds_max", "gauge", "Slowest single run of each rule.", 2, "{:.6f}"),
+			("cg_rule_matches_total", "counter", "Matches (flags) produced by each rule.", 3, "{:.0f}"),
+			("cg_rule_input_chars_total", "counter", "Characters each rule scanned.", 4, "{:.0f}"),
+			("cg_rule_budget_exceeded_total", "counter", "Runs stopped by the per-rule time budget.", 5, "{:.0f}"),
+		]
+		for name, kind, help_text, index, fmt in series:
+			lines.append(f"# HELP {name} {help_text}")
+			lines.append(f"# TYPE {name} {kind}")
+			for rule_id in sorted(rules):
+				lines.append(f'{name}{{rule="{rule_id}"}} {fmt.format(rules[rule_id][index])}')
+		lines.append("# HELP cg_rule_calibration_ms Match cost per 100 KB of sample text, measured when the rulebook loaded.")
+		lines.append("# TYPE cg_rule_calibration_ms gauge")
+		for rule_id in sorted(calibration_ms):
+			lines.append(f'cg_rule_calibration_ms{{rule="{rule_id}"}} {calibration_ms[rule_id]:.3f}')
+		return "\n".join(lines) + "\n"
+
+
+rule_metrics = RuleMetrics()
@@ -0,0 +1,46 @@
+from logging.config import fileConfig
+from alembic import context
+from app.database import Base, DATABASE_URL, engine
+from app import models  # noqa: F401
+
+config = context.config
+
+if config.config_file_name is not None:
+	fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# SQLite cannot ALTER most things in place; batch mode rebuilds the table instead
+render_as_batch = DATABASE_URL.startswith("sqlite")
+
+
+def run_migrations_offline() -> None:
+	context.configure(
+		url=DATABASE_URL,
+		target_metadata=target_metadata,
+		literal_binds=True,
+		render_as_batch=render_as_batch,
+	)
+	with context.begin_transaction():
+		context.run_migrations()
+
+
+def run_migrations_online() -> None:
+	# init_db() hands us its own connection when CG_AUTO_MIGRATE is set
+	connection = config.attributes.get("connection")
+	if connection is not None:
+		context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=render_as_batch)
+		with context.begin_transaction():
+			context.run_migrations()
+		return
+
+	with engine.connect() as connection:
+		context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=render_as_batch)
+		with context.begin_transaction():
+			context.run_migrations()
+
+
+if context.is_offline_mode():
+	run_migrations_offline()
+else:
+	run_migrations_online()
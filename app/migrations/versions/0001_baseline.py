@@ -0,0 +1,85 @@
+"""Baseline schema: users, contracts, clause_flags
+
+Databases created before migrations existed (via create_all plus the old
+runtime ALTER TABLE probing in init_db) are adopted in place: missing tables
+are created and any columns that probing used to add are added once.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	bind = op.get_bind()
+	inspector = sa.inspect(bind)
+	tables = set(inspector.get_table_names())
+
+	if "users" not in tables:
+		op.create_table(
+			"users",
+			sa.Column("id", sa.Integer(), primary_key=True),
+			sa.Column("email", sa.String(255), nullable=False),
+			sa.Column("password_hash", sa.String(255), nullable=False),
+			sa.Column("password_salt", sa.String(255), nullable=False),
+			sa.Column("created_at", sa.DateTime(), nullable=False),
+		)
+		op.create_index("ix_users_id", "users", ["id"])
+		op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+	if "contracts" not in tables:
+		op.create_table(
+			"contracts",
+			sa.Column("id", sa.Integer(), primary_key=True),
+			sa.Column("title", sa.String(255), nullable=False),
+			sa.Column("counterparty", sa.String(255), nullable=True),
+			sa.Column("production", sa.String(255), nullable=True),
+			sa.Column("contract_date", sa.Date(), nullable=True),
+			sa.Column("stored_filename", sa.String(512), nullable=True),
+			sa.Column("text", sa.Text(), nullable=False),
+			sa.Column("status", sa.String(20), nullable=True),
+			sa.Column("consent_notes", sa.Text(), nullable=True),
+			sa.Column("created_at", sa.DateTime(), nullable=False),
+			sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+		)
+		op.create_index("ix_contracts_id", "contracts", ["id"])
+	else:
+		# Legacy databases: add the columns init_db() used to probe for on every startup
+		cols = {c["name"] for c in inspector.get_columns("contracts")}
+		if "production" not in cols:
+			op.add_column("contracts", sa.Column("production", sa.String(255), nullable=True))
+		if "user_id" not in cols:
+			op.add_column("contracts", sa.Column("user_id", sa.Integer(), nullable=True))
+		if "status" not in cols:
+			op.add_column("contracts", sa.Column("status", sa.String(20), nullable=True))
+		if "consent_notes" not in cols:
+			op.add_column("contracts", sa.Column("consent_notes", sa.Text(), nullable=True))
+
+	if "clause_flags" not in tables:
+		op.create_table(
+			"clause_flags",
+			sa.Column("id", sa.Integer(), primary_key=True),
+			sa.Column("contract_id", sa.Integer(), sa.ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+			sa.Column("category", sa.String(100), nullable=False),
+			sa.Column("severity", sa.String(20), nullable=False),
+			sa.Column("start_index", sa.Integer(), nullable=True),
+			sa.Column("end_index", sa.Integer(), nullable=True),
+			sa.Column("excerpt", sa.Text(), nullable=True),
+			sa.Column("explanation", sa.Text(), nullable=False),
+			sa.Column("guidance", sa.Text(), nullable=False),
+		)
+		op.create_index("ix_clause_flags_id", "clause_flags", ["id"])
+
+
+def downgrade() -> None:
+	op.drop_table("clause_flags")
+	op.drop_table("contracts")
+	op.drop_table("users")
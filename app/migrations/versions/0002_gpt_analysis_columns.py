@@ -0,0 +1,39 @@
+"""GPT analysis columns on contracts
+
+Replaces migrate_db.py, app/scripts/migrate_postgres.py and
+app/scripts/add_gpt_fields.py. Columns those scripts already added are skipped.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+GPT_COLUMNS = [
+	("gpt_summary", sa.Text()),
+	("gpt_key_risks", sa.Text()),
+	("gpt_recommendations", sa.Text()),
+	("gpt_overall_assessment", sa.Text()),
+	("gpt_confidence_score", sa.String(10)),
+	("gpt_analysis_date", sa.DateTime()),
+]
+
+
+def upgrade() -> None:
+	cols = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("contracts")}
+	for name, type_ in GPT_COLUMNS:
+		if name not in cols:
+			op.add_column("contracts", sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("contracts") as batch:
+		for name, _ in reversed(GPT_COLUMNS):
+			batch.drop_column(name)
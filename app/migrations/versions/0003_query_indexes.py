@@ -0,0 +1,27 @@
+"""Indexes for the contract list and flag lookups
+
+contracts(user_id, contract_date, created_at) matches the filter and sort of
+GET /contracts/list; clause_flags(contract_id, category, severity) serves
+loading a contract's flags and per-category/severity counts.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_index("ix_contracts_user_date_created", "contracts", ["user_id", "contract_date", "created_at"])
+	op.create_index("ix_clause_flags_contract_category_severity", "clause_flags", ["contract_id", "category", "severity"])
+
+
+def downgrade() -> None:
+	op.drop_index("ix_clause_flags_contract_category_severity", table_name="clause_flags")
+	op.drop_index("ix_contracts_user_date_created", table_name="contracts")
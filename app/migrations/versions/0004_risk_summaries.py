@@ -0,0 +1,59 @@
+"""Per-user risk summary counters
+
+Creates risk_summaries and fills it from the existing flags; from then on the
+counters are maintained incrementally by app.summary.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_table(
+		"risk_summaries",
+		sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+		sa.Column("status", sa.String(20), primary_key=True),
+		sa.Column("category", sa.String(100), primary_key=True),
+		sa.Column("severity", sa.String(20), primary_key=True),
+		sa.Column("flag_count", sa.Integer(), nullable=False),
+		sa.Column("contract_count", sa.Integer(), nullable=False),
+	)
+
+	status = "COALESCE(c.status, 'hold')"
+	# One row per category x severity
+	op.execute(f"""
+		INSERT INTO risk_summaries (user_id, status, category, severity, flag_count, contract_count)
+		SELECT c.user_id, {status}, f.category, f.severity, COUNT(*), COUNT(DISTINCT c.id)
+		FROM clause_flags f JOIN contracts c ON c.id = f.contract_id
+		WHERE c.user_id IS NOT NULL
+		GROUP BY c.user_id, {status}, f.category, f.severity
+	""")
+	# Severity rollups across categories
+	op.execute(f"""
+		INSERT INTO risk_summaries (user_id, status, category, severity, flag_count, contract_count)
+		SELECT c.user_id, {status}, '*', f.severity, COUNT(*), COUNT(DISTINCT c.id)
+		FROM clause_flags f JOIN contracts c ON c.id = f.contract_id
+		WHERE c.user_id IS NOT NULL
+		GROUP BY c.user_id, {status}, f.severity
+	""")
+	# Status totals, including contracts without flags
+	op.execute(f"""
+		INSERT INTO risk_summaries (user_id, status, category, severity, flag_count, contract_count)
+		SELECT c.user_id, {status}, '*', '*', COUNT(f.id), COUNT(DISTINCT c.id)
+		FROM contracts c LEFT JOIN clause_flags f ON f.contract_id = c.id
+		WHERE c.user_id IS NOT NULL
+		GROUP BY c.user_id, {status}
+	""")
+
+
+def downgrade() -> None:
+	op.drop_table("risk_summaries")
@@ -0,0 +1,23 @@
+"""Record the ruleset version each contract was analyzed with
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.add_column("contracts", sa.Column("ruleset_version", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_column("ruleset_version")
@@ -0,0 +1,37 @@
+"""Rule ids/versions on flags and the rulesets registry
+
+Existing flags keep NULL rule ids; the next backfill re-analyzes those
+contracts in full, after which re-analysis is incremental per rule.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.add_column("clause_flags", sa.Column("rule_id", sa.String(64), nullable=True))
+	op.add_column("clause_flags", sa.Column("rule_version", sa.String(16), nullable=True))
+	op.create_table(
+		"rulesets",
+		sa.Column("fingerprint", sa.String(64), primary_key=True),
+		sa.Column("rules", sa.Text(), nullable=False),
+		sa.Column("created_at", sa.DateTime(), nullable=False),
+	)
+	# Fingerprints stamped before rules had ids cannot be diffed against; forget them
+	op.execute("UPDATE contracts SET ruleset_version = NULL")
+
+
+def downgrade() -> None:
+	op.drop_table("rulesets")
+	with op.batch_alter_table("clause_flags") as batch:
+		batch.drop_column("rule_version")
+		batch.drop_column("rule_id")
@@ -0,0 +1,40 @@
+"""Contract clause tree and clause references on flags
+
+Existing contracts have no clauses yet: their ruleset version is cleared so
+the next backfill segments them and links their flags.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_table(
+		"contract_clauses",
+		sa.Column("contract_id", sa.Integer(), sa.ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True),
+		sa.Column("ordinal", sa.Integer(), primary_key=True),
+		sa.Column("parent_ordinal", sa.Integer(), nullable=True),
+		sa.Column("kind", sa.String(16), nullable=False),
+		sa.Column("depth", sa.Integer(), nullable=False),
+		sa.Column("number", sa.String(32), nullable=True),
+		sa.Column("heading", sa.String(255), nullable=True),
+		sa.Column("start_index", sa.Integer(), nullable=False),
+		sa.Column("end_index", sa.Integer(), nullable=False),
+	)
+	op.add_column("clause_flags", sa.Column("clause_ordinal", sa.Integer(), nullable=True))
+	op.execute("UPDATE contracts SET ruleset_version = NULL")
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("clause_flags") as batch:
+		batch.drop_column("clause_ordinal")
+	op.drop_table("contract_clauses")
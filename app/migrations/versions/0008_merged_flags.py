@@ -0,0 +1,28 @@
+"""Merged flags: contributing rule ids per flag
+
+Flags stored before merging are left as they are but their contracts get a
+NULL ruleset version, so the next backfill replaces them with merged flags.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.add_column("clause_flags", sa.Column("rule_ids", sa.String(1024), nullable=True))
+	op.execute("UPDATE clause_flags SET rule_ids = rule_id WHERE rule_id IS NOT NULL")
+	op.execute("UPDATE contracts SET ruleset_version = NULL")
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("clause_flags") as batch:
+		batch.drop_column("rule_ids")
@@ -0,0 +1,104 @@
+"""Rule text in a rules table; flag excerpts rendered from offsets
+
+Explanation and guidance move from every clause_flags row to one rules row
+per (rule id, rule version), and excerpts are no longer stored: they are
+sliced from the contract text by offset when a flag is read. Flags from
+before rule ids were recorded get a synthetic "legacy-..." rule holding
+their text, until the next backfill replaces them.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import hashlib
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+EXCERPT_CONTEXT_CHARS = 80
+
+
+def upgrade() -> None:
+	op.create_table(
+		"rules",
+		sa.Column("rule_id", sa.String(64), primary_key=True),
+		sa.Column("version", sa.String(16), primary_key=True),
+		sa.Column("category", sa.String(100), nullable=False),
+		sa.Column("severity", sa.String(20), nullable=False),
+		sa.Column("explanation", sa.Text(), nullable=False),
+		sa.Column("guidance", sa.Text(), nullable=False),
+		sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+	)
+	bind = op.get_bind()
+	flags, stored_chars = bind.execute(sa.text(
+		"SELECT COUNT(*), COALESCE(SUM(LENGTH(COALESCE(excerpt, '')) + LENGTH(explanation) + LENGTH(guidance)), 0) FROM clause_flags"
+	)).one()
+
+	rules = {}
+	legacy = {}
+	rows = bind.execute(sa.text(
+		"SELECT id, rule_id, rule_version, category, severity, explanation, guidance FROM clause_flags"
+	)).all()
+	for flag_id, rule_id, version, category, severity, explanation, guidance in rows:
+		if rule_id is None or version is None:
+			digest = hashlib.sha256(f"{category}\0{explanation}\0{guidance}".encode("utf-8")).hexdigest()[:12]
+			rule_id, version = f"legacy-{digest}", "legacy"
+			legacy.setdefault((rule_id, version), []).append(flag_id)
+		rules.setdefault((rule_id, version), (category, severity, explanation, guidance))
+
+	rules_table = sa.table(
+		"rules",
+		sa.column("rule_id", sa.String), sa.column("version", sa.String), sa.column("category", sa.String),
+		sa.column("severity", sa.String), sa.column("explanation", sa.Text), sa.column("guidance", sa.Text),
+	)
+	if rules:
+		op.bulk_insert(rules_table, [
+			{"rule_id": rule_id, "version": version, "category": c, "severity": s, "explanation": e, "guidance": g}
+			for (rule_id, version), (c, s, e, g) in rules.items()
+		])
+	for (rule_id, version), flag_ids in legacy.items():
+		for i in range(0, len(flag_ids), 500):
+			bind.execute(
+				sa.text("UPDATE clause_flags SET rule_id = :rule_id, rule_version = :version WHERE id IN :ids")
+				.bindparams(sa.bindparam("ids", expanding=True)),
+				{"rule_id": rule_id, "version": version, "ids": flag_ids[i:i + 500]},
+			)
+
+	with op.batch_alter_table("clause_flags") as batch:
+		batch.drop_column("excerpt")
+		batch.drop_column("explanation")
+		batch.drop_column("guidance")
+
+	rule_chars = sum(len(e) + len(g) for _, _, e, g in rules.values())
+	print(
+		f"[migration 0009] {flags} flags: removed {stored_chars} chars of excerpt/explanation/guidance, "
+		f"added {len(rules)} rules rows holding {rule_chars} chars ({len(legacy)} legacy); "
+		f"saved {stored_chars - rule_chars} chars (SQLite reuses the space, VACUUM to shrink the file)"
+	)
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("clause_flags") as batch:
+		batch.add_column(sa.Column("excerpt", sa.Text(), nullable=True))
+		batch.add_column(sa.Column("explanation", sa.Text(), nullable=False, server_default=""))
+		batch.add_column(sa.Column("guidance", sa.Text(), nullable=False, server_default=""))
+	op.execute(
+		"UPDATE clause_flags SET "
+		"explanation = COALESCE((SELECT r.explanation FROM rules r WHERE r.rule_id = clause_flags.rule_id AND r.version = clause_flags.rule_version), ''), "
+		"guidance = COALESCE((SELECT r.guidance FROM rules r WHERE r.rule_id = clause_flags.rule_id AND r.version = clause_flags.rule_version), '')"
+	)
+	bind = op.get_bind()
+	rows = bind.execute(sa.text(
+		"SELECT f.id, f.start_index, f.end_index, c.text FROM clause_flags f JOIN contracts c ON c.id = f.contract_id "
+		"WHERE f.start_index IS NOT NULL AND f.end_index IS NOT NULL"
+	)).all()
+	for flag_id, start, end, text in rows:
+		excerpt = text[max(0, start - EXCERPT_CONTEXT_CHARS): min(len(text), end + EXCERPT_CONTEXT_CHARS)]
+		bind.execute(sa.text("UPDATE clause_flags SET excerpt = :excerpt WHERE id = :id"), {"excerpt": excerpt, "id": flag_id})
+	op.execute("UPDATE clause_flags SET rule_id = NULL, rule_version = NULL WHERE rule_version = 'legacy'")
+	op.drop_table("rules")
@@ -0,0 +1,44 @@
+"""Structured contract terms
+
+Existing contracts have no terms yet: their ruleset version is cleared so
+the next backfill extracts them.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_table(
+		"contract_terms",
+		sa.Column("id", sa.Integer(), primary_key=True),
+		sa.Column("contract_id", sa.Integer(), sa.ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+		sa.Column("kind", sa.String(32), nullable=False),
+		sa.Column("value_text", sa.String(255), nullable=False),
+		sa.Column("number_value", sa.Float(), nullable=True),
+		sa.Column("unit", sa.String(16), nullable=True),
+		sa.Column("date_value", sa.Date(), nullable=True),
+		sa.Column("start_index", sa.Integer(), nullable=True),
+		sa.Column("end_index", sa.Integer(), nullable=True),
+		sa.Column("clause_ordinal", sa.Integer(), nullable=True),
+	)
+	op.create_index("ix_contract_terms_contract_id", "contract_terms", ["contract_id"])
+	op.create_index("ix_contract_terms_kind_date", "contract_terms", ["kind", "date_value", "contract_id"])
+	op.create_index("ix_contract_terms_kind_number", "contract_terms", ["kind", "number_value", "contract_id"])
+	op.execute("UPDATE contracts SET ruleset_version = NULL")
+
+
+def downgrade() -> None:
+	op.drop_index("ix_contract_terms_kind_number", table_name="contract_terms")
+	op.drop_index("ix_contract_terms_kind_date", table_name="contract_terms")
+	op.drop_index("ix_contract_terms_contract_id", table_name="contract_terms")
+	op.drop_table("contract_terms")
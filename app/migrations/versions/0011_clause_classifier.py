@@ -0,0 +1,30 @@
+"""Clause classifier scores
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.add_column("contracts", sa.Column("model_version", sa.String(16), nullable=True))
+	op.add_column("contracts", sa.Column("model_confidence", sa.Float(), nullable=True))
+	op.add_column("contract_clauses", sa.Column("risk_category", sa.String(100), nullable=True))
+	op.add_column("contract_clauses", sa.Column("risk_score", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("contract_clauses") as batch:
+		batch.drop_column("risk_score")
+		batch.drop_column("risk_category")
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_column("model_confidence")
+		batch.drop_column("model_version")
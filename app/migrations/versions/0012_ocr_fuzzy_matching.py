@@ -0,0 +1,28 @@
+"""OCR source and flag match confidence
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.add_column("contracts", sa.Column("used_ocr", sa.Boolean(), nullable=False, server_default=sa.false()))
+	op.add_column("clause_flags", sa.Column("confidence", sa.Float(), nullable=True))
+	# Existing flags all come from exact matches
+	op.execute("UPDATE clause_flags SET confidence = 1.0")
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("clause_flags") as batch:
+		batch.drop_column("confidence")
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_column("used_ocr")
@@ -0,0 +1,42 @@
+"""Near-duplicate detection: MinHash signatures and LSH bands
+
+Existing contracts get their signatures from the next backfill run, which
+visits every contract without one.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	with op.batch_alter_table("contracts") as batch:
+		batch.add_column(sa.Column("minhash", sa.LargeBinary(), nullable=True))
+		batch.add_column(sa.Column("duplicate_of_id", sa.Integer(), nullable=True))
+		batch.add_column(sa.Column("duplicate_similarity", sa.Float(), nullable=True))
+		batch.create_foreign_key("fk_contracts_duplicate_of_id", "contracts", ["duplicate_of_id"], ["id"], ondelete="SET NULL")
+	op.create_table(
+		"contract_lsh_bands",
+		sa.Column("contract_id", sa.Integer(), sa.ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True),
+		sa.Column("band", sa.Integer(), primary_key=True),
+		sa.Column("bucket", sa.BigInteger(), nullable=False),
+	)
+	op.create_index("ix_contract_lsh_bands_band_bucket", "contract_lsh_bands", ["band", "bucket"])
+
+
+def downgrade() -> None:
+	op.drop_index("ix_contract_lsh_bands_band_bucket", table_name="contract_lsh_bands")
+	op.drop_table("contract_lsh_bands")
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_constraint("fk_contracts_duplicate_of_id", type_="foreignkey")
+		batch.drop_column("duplicate_similarity")
+		batch.drop_column("duplicate_of_id")
+		batch.drop_column("minhash")
@@ -0,0 +1,30 @@
+"""Contract versions: link a renegotiated upload to the version it replaces
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	with op.batch_alter_table("contracts") as batch:
+		batch.add_column(sa.Column("previous_version_id", sa.Integer(), nullable=True))
+		batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+		batch.create_foreign_key("fk_contracts_previous_version_id", "contracts", ["previous_version_id"], ["id"], ondelete="SET NULL")
+	op.create_index("ix_contracts_previous_version_id", "contracts", ["previous_version_id"])
+
+
+def downgrade() -> None:
+	op.drop_index("ix_contracts_previous_version_id", table_name="contracts")
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_constraint("fk_contracts_previous_version_id", type_="foreignkey")
+		batch.drop_column("version")
+		batch.drop_column("previous_version_id")
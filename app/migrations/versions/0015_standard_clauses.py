@@ -0,0 +1,54 @@
+"""Standard clause library, and the library clause each stored clause matches
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015"
+down_revision = "0014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_table(
+		"standard_clauses",
+		sa.Column("id", sa.Integer(), primary_key=True),
+		sa.Column("title", sa.String(255), nullable=False),
+		sa.Column("category", sa.String(100), nullable=True),
+		sa.Column("severity", sa.String(20), nullable=True),
+		sa.Column("text", sa.Text(), nullable=False),
+		sa.Column("guidance", sa.Text(), nullable=False),
+		sa.Column("commentary", sa.Text(), nullable=True),
+		sa.Column("commentary_date", sa.DateTime(), nullable=True),
+		sa.Column("exact_hash", sa.BigInteger(), nullable=False, unique=True),
+		sa.Column("simhash", sa.BigInteger(), nullable=False),
+		sa.Column("block0", sa.Integer(), nullable=False),
+		sa.Column("block1", sa.Integer(), nullable=False),
+		sa.Column("block2", sa.Integer(), nullable=False),
+		sa.Column("block3", sa.Integer(), nullable=False),
+		sa.Column("block4", sa.Integer(), nullable=False),
+		sa.Column("block5", sa.Integer(), nullable=False),
+		sa.Column("block6", sa.Integer(), nullable=False),
+		sa.Column("created_at", sa.DateTime(), nullable=False),
+	)
+	for i in range(7):
+		op.create_index(f"ix_standard_clauses_block{i}", "standard_clauses", [f"block{i}"])
+	with op.batch_alter_table("contract_clauses") as batch:
+		batch.add_column(sa.Column("standard_clause_id", sa.Integer(), nullable=True))
+		batch.add_column(sa.Column("standard_distance", sa.Integer(), nullable=True))
+		batch.create_foreign_key("fk_contract_clauses_standard_clause_id", "standard_clauses", ["standard_clause_id"], ["id"], ondelete="SET NULL")
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("contract_clauses") as batch:
+		batch.drop_constraint("fk_contract_clauses_standard_clause_id", type_="foreignkey")
+		batch.drop_column("standard_distance")
+		batch.drop_column("standard_clause_id")
+	for i in range(7):
+		op.drop_index(f"ix_standard_clauses_block{i}", table_name="standard_clauses")
+	op.drop_table("standard_clauses")
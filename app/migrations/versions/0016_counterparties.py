@@ -0,0 +1,59 @@
+"""Counterparty entities, their aliases and risk profiles
+
+Existing contracts are linked and profiled by
+`python -m app.scripts.build_counterparties`.
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016"
+down_revision = "0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_table(
+		"counterparties",
+		sa.Column("id", sa.Integer(), primary_key=True),
+		sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+		sa.Column("name", sa.String(255), nullable=False),
+		sa.Column("contract_count", sa.Integer(), nullable=False, server_default="0"),
+		sa.Column("flag_count", sa.Integer(), nullable=False, server_default="0"),
+		sa.Column("exclusive_count", sa.Integer(), nullable=False, server_default="0"),
+		sa.Column("category_counts", sa.Text(), nullable=True),
+		sa.Column("payment_days", sa.Text(), nullable=True),
+		sa.Column("term_days", sa.Text(), nullable=True),
+		sa.Column("territories", sa.Text(), nullable=True),
+		sa.Column("created_at", sa.DateTime(), nullable=False),
+		sa.Column("updated_at", sa.DateTime(), nullable=False),
+	)
+	op.create_index("ix_counterparties_user_id", "counterparties", ["user_id"])
+	op.create_table(
+		"counterparty_aliases",
+		sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+		sa.Column("normalized_name", sa.String(255), primary_key=True),
+		sa.Column("name", sa.String(255), nullable=False),
+		sa.Column("counterparty_id", sa.Integer(), sa.ForeignKey("counterparties.id", ondelete="CASCADE"), nullable=False),
+	)
+	op.create_index("ix_counterparty_aliases_counterparty_id", "counterparty_aliases", ["counterparty_id"])
+	with op.batch_alter_table("contracts") as batch:
+		batch.add_column(sa.Column("counterparty_id", sa.Integer(), nullable=True))
+		batch.create_foreign_key("fk_contracts_counterparty_id", "counterparties", ["counterparty_id"], ["id"], ondelete="SET NULL")
+	op.create_index("ix_contracts_counterparty_id", "contracts", ["counterparty_id"])
+
+
+def downgrade() -> None:
+	op.drop_index("ix_contracts_counterparty_id", table_name="contracts")
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_constraint("fk_contracts_counterparty_id", type_="foreignkey")
+		batch.drop_column("counterparty_id")
+	op.drop_index("ix_counterparty_aliases_counterparty_id", table_name="counterparty_aliases")
+	op.drop_table("counterparty_aliases")
+	op.drop_index("ix_counterparties_user_id", table_name="counterparties")
+	op.drop_table("counterparties")
@@ -0,0 +1,61 @@
+"""Contract deadlines and in-app alerts
+
+Deadlines of existing contracts are scheduled by
+`python -m app.scripts.schedule_deadlines`.
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0017"
+down_revision = "0016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	op.create_table(
+		"contract_deadlines",
+		sa.Column("id", sa.Integer(), primary_key=True),
+		sa.Column("contract_id", sa.Integer(), sa.ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+		sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+		sa.Column("kind", sa.String(32), nullable=False),
+		sa.Column("due_date", sa.Date(), nullable=False),
+		sa.Column("remind_at", sa.DateTime(), nullable=False),
+		sa.Column("status", sa.String(16), nullable=False, server_default="pending"),
+		sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+		sa.Column("lease_owner", sa.String(64), nullable=True),
+		sa.Column("lease_until", sa.DateTime(), nullable=True),
+		sa.Column("fired_at", sa.DateTime(), nullable=True),
+		sa.Column("last_error", sa.Text(), nullable=True),
+		sa.Column("start_index", sa.Integer(), nullable=True),
+		sa.Column("end_index", sa.Integer(), nullable=True),
+	)
+	op.create_index("ix_contract_deadlines_contract_id", "contract_deadlines", ["contract_id"])
+	op.create_index("ix_contract_deadlines_status_remind_at", "contract_deadlines", ["status", "remind_at"])
+	op.create_index("ix_contract_deadlines_user_due", "contract_deadlines", ["user_id", "status", "due_date"])
+	op.create_table(
+		"alerts",
+		sa.Column("id", sa.Integer(), primary_key=True),
+		sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+		sa.Column("contract_id", sa.Integer(), sa.ForeignKey("contracts.id", ondelete="CASCADE"), nullable=True),
+		sa.Column("deadline_id", sa.Integer(), sa.ForeignKey("contract_deadlines.id", ondelete="SET NULL"), nullable=True, unique=True),
+		sa.Column("kind", sa.String(32), nullable=False),
+		sa.Column("message", sa.Text(), nullable=False),
+		sa.Column("created_at", sa.DateTime(), nullable=False),
+		sa.Column("read_at", sa.DateTime(), nullable=True),
+	)
+	op.create_index("ix_alerts_user_created", "alerts", ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+	op.drop_index("ix_alerts_user_created", table_name="alerts")
+	op.drop_table("alerts")
+	op.drop_index("ix_contract_deadlines_user_due", table_name="contract_deadlines")
+	op.drop_index("ix_contract_deadlines_status_remind_at", table_name="contract_deadlines")
+	op.drop_index("ix_contract_deadlines_contract_id", table_name="contract_deadlines")
+	op.drop_table("contract_deadlines")
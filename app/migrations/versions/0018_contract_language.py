@@ -0,0 +1,27 @@
+"""Contract language
+
+Existing contracts get theirs when `python -m app.scripts.backfill_reanalyze`
+next visits them.
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0018"
+down_revision = "0017"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+	with op.batch_alter_table("contracts") as batch:
+		batch.add_column(sa.Column("language", sa.String(8), nullable=True))
+
+
+def downgrade() -> None:
+	with op.batch_alter_table("contracts") as batch:
+		batch.drop_column("language")
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, Integer, LargeBinary, String, Text, DateTime, ForeignKey, Date, Float, Index, and_
+from sqlalchemy.orm import foreign, relationship
 from datetime import datetime
+from typing import Optional
 from .database import Base
+from .segmenter import Clause
+from .terms import Term
 
 
 class User(Base):
@@ -22,26 +25,46 @@ class Contract(Base):
 	id = Column(Integer, primary_key=True, index=True)
 	title = Column(String(255), nullable=False)
 	counterparty = Column(String(255), nullable=True)
+	counterparty_id = Column(Integer, ForeignKey("counterparties.id", ondelete="SET NULL"), nullable=True)  # normalized entity (see app.counterparties)
 	production = Column(String(255), nullable=True)
 	contract_date = Column(Date, nullable=True)
 	stored_filename = Column(String(512), nullable=True)
 	text = Column(Text, nullable=False)
+	used_ocr = Column(Boolean, nullable=False, default=False)  # text came from Tesseract; rules then also match approximately
+	language = Column(String(8), nullable=True)  # ISO 639-1, detected at ingest (see app.language); NULL = not yet detected
 	status = Column(String(20), nullable=True, default="hold")  # hold, negotiating, signed
 	consent_notes = Column(Text, nullable=True)  # Notes about consent/usage categories
 	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 	user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+	ruleset_version = Column(String(64), nullable=True)  # fingerprint of the ruleset the flags were produced with (see Ruleset)
+	model_version = Column(String(16), nullable=True)  # clause classifier model that scored the clauses (see app.classifier)
+	model_confidence = Column(Float, nullable=True)  # its confidence in the whole contract, 0-1
+	minhash = Column(LargeBinary, nullable=True)  # MinHash signature of the text, 128 uint32 (see app.dedup)
+	duplicate_of_id = Column(Integer, ForeignKey("contracts.id", ondelete="SET NULL"), nullable=True)  # the user's contract this one nearly duplicates
+	duplicate_similarity = Column(Float, nullable=True)  # estimated Jaccard similarity to it
+	previous_version_id = Column(Integer, ForeignKey("contracts.id", ondelete="SET NULL"), nullable=True)  # the version this one renegotiates (see app.versions)
+	version = Column(Integer, nullable=False, default=1, server_default="1")  # 1 for a first upload
 	
-	# GPT Analysis fields - temporarily commented out until database migration
-	# Uncomment these after running the database migration script
-	# gpt_summary = Column(Text, nullable=True, default=None)  # GPT-generated summary
-	# gpt_key_risks = Column(Text, nullable=True, default=None)  # JSON string of key risks
-	# gpt_recommendations = Column(Text, nullable=True, default=None)  # JSON string of recommendations
-	# gpt_overall_assessment = Column(Text, nullable=True, default=None)  # Overall assessment
-	# gpt_confidence_score = Column(String(10), nullable=True, default=None)  # Confidence score
-	# gpt_analysis_date = Column(DateTime, nullable=True, default=None)  # When GPT analysis was performed
+	# GPT Analysis fields (added by migration 0002)
+	gpt_summary = Column(Text, nullable=True, default=None)  # GPT-generated summary
+	gpt_key_risks = Column(Text, nullable=True, default=None)  # JSON string of key risks
+	gpt_recommendations = Column(Text, nullable=True, default=None)  # JSON string of recommendations
+	gpt_overall_assessment = Column(Text, nullable=True, default=None)  # Overall assessment
+	gpt_confidence_score = Column(String(10), nullable=True, default=None)  # Confidence score
+	gpt_analysis_date = Column(DateTime, nullable=True, default=None)  # When GPT analysis was performed
 
 	user = relationship("User", back_populates="contracts")
 	flags = relationship("ClauseFlag", back_populates="contract", cascade="all, delete-orphan")
+	clauses = relationship("ContractClause", back_populates="contract", cascade="all, delete-orphan", order_by="ContractClause.ordinal")
+	terms = relationship("ContractTerm", back_populates="contract", cascade="all, delete-orphan", order_by="ContractTerm.id")
+	lsh_bands = relationship("ContractLSHBand", cascade="all, delete-orphan")
+	deadlines = relationship("ContractDeadline", back_populates="contract", cascade="all, delete-orphan", order_by="ContractDeadline.due_date")
+
+	__table_args__ = (
+		Index("ix_contracts_user_date_created", "user_id", "contract_date", "created_at"),
+		Index("ix_contracts_previous_version_id", "previous_version_id"),
+		Index("ix_contracts_counterparty_id", "counterparty_id"),
+	)
 
 
 class ClauseFlag(Base):
@@ -49,12 +72,321 @@ class ClauseFlag(Base):
 
 	id = Column(Integer, primary_key=True, index=True)
 	contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False)
+	rule_id = Column(String(64), nullable=True)  # analyzer Rule.id that produced this flag (the highest-severity one if merged)
+	rule_ids = Column(String(1024), nullable=True)  # every rule merged into this flag, comma-separated
+	rule_version = Column(String(16), nullable=True)  # Rule.version at the time
 	category = Column(String(100), nullable=False)
 	severity = Column(String(20), nullable=False)
 	start_index = Column(Integer, nullable=True)
 	end_index = Column(Integer, nullable=True)
-	excerpt = Column(Text, nullable=True)
+	clause_ordinal = Column(Integer, nullable=True)  # ContractClause.ordinal the flag starts in
+	confidence = Column(Float, nullable=True)  # 1 for exact rule matches, lower for approximate ones on OCR text
+
+	contract = relationship("Contract", back_populates="flags")
+	# No FK constraint: rows are registered with the ruleset, not per flag.
+	# Many-to-one on the primary key, so repeated rules come from the identity map.
+	rule = relationship(
+		"RuleText",
+		primaryjoin=lambda: and_(foreign(ClauseFlag.rule_id) == RuleText.rule_id, foreign(ClauseFlag.rule_version) == RuleText.version),
+		viewonly=True,
+	)
+	clause = relationship(
+		"ContractClause",
+		primaryjoin=lambda: and_(foreign(ClauseFlag.contract_id) == ContractClause.contract_id, foreign(ClauseFlag.clause_ordinal) == ContractClause.ordinal),
+		viewonly=True,
+	)
+
+	__table_args__ = (
+		Index("ix_clause_flags_contract_category_severity", "contract_id", "category", "severity"),
+	)
+
+	# Text fields are rendered on read: the excerpt is sliced from the contract
+	# text by offset, explanation and guidance come from the rules table. In a
+	# recognized standard clause its curated guidance replaces the rule's.
+	EXCERPT_CONTEXT_CHARS = 80
+
+	@property
+	def excerpt(self) -> Optional[str]:
+		if self.start_index is None or self.end_index is None or self.contract is None:
+			return None
+		text = self.contract.text
+		return text[max(0, self.start_index - self.EXCERPT_CONTEXT_CHARS): min(len(text), self.end_index + self.EXCERPT_CONTEXT_CHARS)]
+
+	@property
+	def explanation(self) -> str:
+		return self.rule.explanation if self.rule is not None else ""
+
+	@property
+	def guidance(self) -> str:
+		standard = self.clause.standard_clause if self.clause is not None else None
+		if standard is not None and standard.guidance:
+			return standard.guidance
+		return self.rule.guidance if self.rule is not None else ""
+
+	@classmethod
+	def from_analysis(cls, flag: dict, **kwargs) -> "ClauseFlag":
+		"""Row for an analyzer flag dict, dropping the fields rendered on read."""
+		columns = cls.__table__.columns.keys()
+		return cls(**{k: v for k, v in flag.items() if k in columns}, **kwargs)
+
+	_ANALYSIS_FIELDS = ("rule_id", "rule_ids", "rule_version", "category", "severity", "start_index", "end_index", "confidence")
+
+	def to_analysis(self) -> dict:
+		"""The stored part of the analyzer flag dict this row was made from."""
+		return {field: getattr(self, field) for field in self._ANALYSIS_FIELDS}
+
+
+class RuleText(Base):
+	"""Category, severity and text of each rule version flags were produced
+	with, stored once instead of on every flag."""
+	__tablename__ = "rules"
+
+	rule_id = Column(String(64), primary_key=True)
+	version = Column(String(16), primary_key=True)  # Rule.version
+	category = Column(String(100), nullable=False)
+	severity = Column(String(20), nullable=False)
 	explanation = Column(Text, nullable=False)
 	guidance = Column(Text, nullable=False)
+	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ContractClause(Base):
+	"""A node of the contract's clause tree (see app.segmenter), stored at ingest.
+
+	Only offsets into contracts.text are kept, not the clause text.
+	"""
+	__tablename__ = "contract_clauses"
+
+	contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+	ordinal = Column(Integer, primary_key=True)  # document order, from 0
+	parent_ordinal = Column(Integer, nullable=True)
+	kind = Column(String(16), nullable=False)  # heading, section, paragraph, signature
+	depth = Column(Integer, nullable=False)
+	number = Column(String(32), nullable=True)  # "4.2", "IV", "a"
+	heading = Column(String(255), nullable=True)
+	start_index = Column(Integer, nullable=False)
+	end_index = Column(Integer, nullable=False)
+	risk_category = Column(String(100), nullable=True)  # classifier's top category, when likely enough
+	risk_score = Column(Float, nullable=True)
+	standard_clause_id = Column(Integer, ForeignKey("standard_clauses.id", ondelete="SET NULL"), nullable=True)  # library clause it matches (see app.fingerprints)
+	standard_distance = Column(Integer, nullable=True)  # SimHash bits from it, 0 for identical wording
+
+	contract = relationship("Contract", back_populates="clauses")
+	standard_clause = relationship("StandardClause")
+
+	@property
+	def standard_title(self) -> Optional[str]:
+		return self.standard_clause.title if self.standard_clause is not None else None
+
+	@property
+	def standard_guidance(self) -> Optional[str]:
+		return self.standard_clause.guidance if self.standard_clause is not None else None
+
+	@property
+	def standard_commentary(self) -> Optional[str]:
+		return self.standard_clause.commentary if self.standard_clause is not None else None
+
+	@classmethod
+	def from_clause(cls, clause: Clause) -> "ContractClause":
+		return cls(
+			ordinal=clause.ordinal, parent_ordinal=clause.parent, kind=clause.kind, depth=clause.depth,
+			number=clause.number, heading=clause.heading[:255] if clause.heading else None,
+			start_index=clause.start, end_index=clause.end,
+		)
+
+	def to_clause(self) -> Clause:
+		return Clause(self.ordinal, self.parent_ordinal, self.kind, self.depth, self.start_index, self.end_index, self.number, self.heading)
+
+
+class StandardClause(Base):
+	"""A recurring clause with curated guidance, matched by fingerprint (see app.fingerprints)."""
+	__tablename__ = "standard_clauses"
+
+	id = Column(Integer, primary_key=True)
+	title = Column(String(255), nullable=False)
+	category = Column(String(100), nullable=True)
+	severity = Column(String(20), nullable=True)
+	text = Column(Text, nullable=False)  # canonical wording
+	guidance = Column(Text, nullable=False)  # curated, replaces the rules' guidance on flags in matching clauses
+	commentary = Column(Text, nullable=True)  # GPT commentary, generated once and cached
+	commentary_date = Column(DateTime, nullable=True)
+	exact_hash = Column(BigInteger, nullable=False, unique=True)
+	simhash = Column(BigInteger, nullable=False)
+	# The SimHash's seven blocks (fingerprints.BLOCKS), each indexed for near matches
+	block0 = Column(Integer, nullable=False, index=True)
+	block1 = Column(Integer, nullable=False, index=True)
+	block2 = Column(Integer, nullable=False, index=True)
+	block3 = Column(Integer, nullable=False, index=True)
+	block4 = Column(Integer, nullable=False, index=True)
+	block5 = Column(Integer, nullable=False, index=True)
+	block6 = Column(Integer, nullable=False, index=True)
+	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+	@classmethod
+	def simhash_blocks(cls):
+		return (cls.block0, cls.block1, cls.block2, cls.block3, cls.block4, cls.block5, cls.block6)
+
+
+class ContractTerm(Base):
+	"""A typed value extracted from the contract text at ingest (see app.terms),
+	indexed so contracts can be filtered by it without scanning their text."""
+	__tablename__ = "contract_terms"
+
+	id = Column(Integer, primary_key=True)
+	contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False, index=True)
+	kind = Column(String(32), nullable=False)  # term_length, payment_days, duration, fee, effective_date, expiry_date, date, territory
+	value_text = Column(String(255), nullable=False)
+	number_value = Column(Float, nullable=True)  # days for periods, the amount for fees
+	unit = Column(String(16), nullable=True)  # "days", or the currency code
+	date_value = Column(Date, nullable=True)
+	start_index = Column(Integer, nullable=True)  # NULL for derived terms
+	end_index = Column(Integer, nullable=True)
+	clause_ordinal = Column(Integer, nullable=True)
+
+	contract = relationship("Contract", back_populates="terms")
+
+	__table_args__ = (
+		Index("ix_contract_terms_kind_date", "kind", "date_value", "contract_id"),
+		Index("ix_contract_terms_kind_number", "kind", "number_value", "contract_id"),
+	)
+
+	@classmethod
+	def from_term(cls, term: Term) -> "ContractTerm":
+		return cls(
+			kind=term.kind, value_text=term.value[:255], number_value=term.number, unit=term.unit,
+			date_value=term.date, start_index=term.start, end_index=term.end, clause_ordinal=term.clause_ordinal,
+		)
+
+
+class ContractLSHBand(Base):
+	"""One band of a contract's MinHash signature, hashed: contracts sharing any
+	(band, bucket) are near-duplicate candidates."""
+	__tablename__ = "contract_lsh_bands"
+
+	contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+	band = Column(Integer, primary_key=True)
+	bucket = Column(BigInteger, nullable=False)
+
+	__table_args__ = (
+		Index("ix_contract_lsh_bands_band_bucket", "band", "bucket"),
+	)
+
+
+class Ruleset(Base):
+	"""Every ruleset fingerprint contracts have been analyzed with, and its rules.
+
+	Re-analysis compares a contract's ruleset with the current one and only
+	re-runs rules that were added, changed or removed since.
+	"""
+	__tablename__ = "rulesets"
+
+	fingerprint = Column(String(64), primary_key=True)
+	rules = Column(Text, nullable=False)  # JSON object: rule id -> rule version
+	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Counterparty(Base):
+	"""A user's counterparty, with its risk profile maintained at ingest (see app.counterparties).
+
+	The JSON columns are counts: category_counts maps category -> [contracts,
+	flags]; payment_days and term_days map days (term_days also "perpetual")
+	-> contracts; territories maps territory -> contracts.
+	"""
+	__tablename__ = "counterparties"
+
+	id = Column(Integer, primary_key=True)
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+	name = Column(String(255), nullable=False)  # as first seen
+	contract_count = Column(Integer, nullable=False, default=0)
+	flag_count = Column(Integer, nullable=False, default=0)
+	exclusive_count = Column(Integer, nullable=False, default=0)  # contracts with an exclusivity flag
+	category_counts = Column(Text, nullable=True)
+	payment_days = Column(Text, nullable=True)
+	term_days = Column(Text, nullable=True)
+	territories = Column(Text, nullable=True)
+	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+	updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+	aliases = relationship("CounterpartyAlias", cascade="all, delete-orphan", order_by="CounterpartyAlias.name")
+
+
+class CounterpartyAlias(Base):
+	"""A normalized spelling of a counterparty's name; every counterparty has at least its own."""
+	__tablename__ = "counterparty_aliases"
+
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+	normalized_name = Column(String(255), primary_key=True)
+	name = Column(String(255), nullable=False)  # as entered
+	counterparty_id = Column(Integer, ForeignKey("counterparties.id", ondelete="CASCADE"), nullable=False, index=True)
+
+
+class ContractDeadline(Base):
+	"""A date the contract's owner must act by, derived from its terms at ingest
+	(see app.deadlines) and fired by app.scheduler.
+
+	status is pending until fired (or failed after too many attempts), or
+	dismissed when a new version of the contract replaces it. A worker firing
+	a deadline holds a lease on it (lease_owner until lease_until).
+	"""
+	__tablename__ = "contract_deadlines"
+
+	id = Column(Integer, primary_key=True)
+	contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False, index=True)
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+	kind = Column(String(32), nullable=False)  # expiry, renewal_notice, exclusivity_end
+	due_date = Column(Date, nullable=False)
+	remind_at = Column(DateTime, nullable=False)
+	status = Column(String(16), nullable=False, default="pending")
+	attempts = Column(Integer, nullable=False, default=0)
+	lease_owner = Column(String(64), nullable=True)
+	lease_until = Column(DateTime, nullable=True)
+	fired_at = Column(DateTime, nullable=True)
+	last_error = Column(Text, nullable=True)
+	start_index = Column(Integer, nullable=True)  # the term it was derived from
+	end_index = Column(Integer, nullable=True)
+
+	contract = relationship("Contract", back_populates="deadlines")
+
+	@property
+	def contract_title(self) -> str:
+		return self.contract.title
+
+	__table_args__ = (
+		Index("ix_contract_deadlines_status_remind_at", "status", "remind_at"),
+		Index("ix_contract_deadlines_user_due", "user_id", "status", "due_date"),
+	)
+
+
+class Alert(Base):
+	"""An in-app notification, e.g. for a fired deadline."""
+	__tablename__ = "alerts"
+
+	id = Column(Integer, primary_key=True)
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+	contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), nullable=True)
+	deadline_id = Column(Integer, ForeignKey("contract_deadlines.id", ondelete="SET NULL"), nullable=True, unique=True)
+	kind = Column(String(32), nullable=False)
+	message = Column(Text, nullable=False)
+	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+	read_at = Column(DateTime, nullable=True)
+
+	__table_args__ = (
+		Index("ix_alerts_user_created", "user_id", "created_at"),
+	)
+
+
+class RiskSummary(Base):
+	"""Per-user flag counters, maintained incrementally by app.summary.
+
+	Rows are keyed by user x status x category x severity. category "*" rolls up
+	all categories for a severity, and category = severity = "*" holds the
+	status totals (every contract counts there, flagged or not).
+	"""
+	__tablename__ = "risk_summaries"
 
-	contract = relationship("Contract", back_populates="flags") 
\ No newline at end of file
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+	status = Column(String(20), primary_key=True)
+	category = Column(String(100), primary_key=True)
+	severity = Column(String(20), primary_key=True)
+	flag_count = Column(Integer, nullable=False, default=0)
+	contract_count = Column(Integer, nullable=False, default=0)
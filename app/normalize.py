@@ -0,0 +1,77 @@
+from array import array
+from dataclasses import dataclass
+from typing import Tuple
+import re
+
+# Bump whenever normalize() output changes; it is part of every rule version,
+# so stored flags are re-analyzed when the normalization changes.
+NORMALIZER_VERSION = "1"
+
+_CHAR_MAP = {
+	"\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl", "\ufb05": "st", "\ufb06": "st",
+	"\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'",
+	"\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"',
+	"\u2010": "-", "\u2011": "-", "\u2013": "-", "\u2014": "-",
+	"\u00ad": "",  # soft hyphen
+}
+
+# Page furniture on a line of its own: "Page 3", "Page 3 of 10", "- 3 -"
+_PAGE_LINE = r"(?:page[ \t]+\d+(?:[ \t]+of[ \t]+\d+)?|-[ \t]*\d+[ \t]*-)"
+
+_TOKEN = re.compile(
+	# word-<newline>continuation split by the extractor: "perpe-\ntuity" -> "perpetuity"
+	r"(?P<hyph>-(?<=[A-Za-z]-)[ \t]*[\r\n\f]\s*(?=(?-i:[a-z])))"
+	# whitespace runs other than a lone space (already canonical, so copied as
+	# is), swallowing any page-number lines inside them
+	r"|(?P<ws>(?:\s*[\r\n\f][ \t]*" + _PAGE_LINE + r"[ \t]*(?=[\r\n\f]|\Z))+\s*| ?[^\S ]\s*| {2,})"
+	r"|(?P<char>[" + "".join(_CHAR_MAP) + r"])",
+	re.IGNORECASE,
+)
+
+
+@dataclass
+class NormalizedText:
+	"""Canonical text plus, for every character, its index in the original."""
+	text: str
+	offsets: array
+
+	def to_original(self, start: int, end: int) -> Tuple[int, int]:
+		"""Map a [start, end) span of the normalized text back to the original."""
+		if start >= end:
+			pos = self.offsets[start] if start < len(self.offsets) else (self.offsets[-1] + 1 if self.offsets else 0)
+			return pos, pos
+		return self.offsets[start], self.offsets[end - 1] + 1
+
+
+def normalize(text: str) -> NormalizedText:
+	"""Single pass over extractor output: join hyphenated line breaks, expand
+	ligatures, straighten quotes and dashes, drop page-number lines and collapse
+	whitespace to single spaces. Unchanged stretches are copied in bulk."""
+	pieces = []
+	offsets = array("l")
+	last_space = True  # also trims leading whitespace
+	pos = 0
+	for m in _TOKEN.finditer(text):
+		start = m.start()
+		if start > pos:
+			pieces.append(text[pos:start])
+			offsets.extend(range(pos, start))
+			last_space = False
+		kind = m.lastgroup
+		if kind == "ws":
+			if not last_space:
+				pieces.append(" ")
+				offsets.append(start)
+				last_space = True
+		elif kind == "char":
+			replacement = _CHAR_MAP[m.group()]
+			if replacement:
+				pieces.append(replacement)
+				offsets.extend([start] * len(replacement))
+				last_space = False
+		# "hyph" emits nothing
+		pos = m.end()
+	if pos < len(text):
+		pieces.append(text[pos:])
+		offsets.extend(range(pos, len(text)))
+	return NormalizedText("".join(pieces), offsets)
@@ -0,0 +1,65 @@
+"""Channels that deliver fired deadlines (see app.scheduler).
+
+CG_DEADLINE_NOTIFIERS is a comma-separated list of:
+
+- inapp: an Alert row, read through GET /alerts (the default);
+- email: printed for now, until the app has a mail service;
+- webhook: a JSON POST to CG_DEADLINE_WEBHOOK_URL.
+
+An event is a dict: deadline_id, kind, due_date (ISO), contract_id,
+contract_title, user_id, email and message.
+"""
+from typing import List
+import asyncio
+import json
+import os
+import urllib.request
+
+INAPP = "inapp"
+NOTIFIERS = [name.strip() for name in os.environ.get("CG_DEADLINE_NOTIFIERS", INAPP).split(",") if name.strip()]
+WEBHOOK_URL = os.environ.get("CG_DEADLINE_WEBHOOK_URL") or None
+WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get("CG_DEADLINE_WEBHOOK_TIMEOUT_SECONDS", "5"))
+
+
+class EmailNotifier:
+	name = "email"
+
+	async def send(self, event: dict) -> None:
+		if event["email"]:
+			print(f"[notify] Email to {event['email']}: {event['message']}")
+
+
+class WebhookNotifier:
+	name = "webhook"
+
+	def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT_SECONDS):
+		self.url = url
+		self.timeout = timeout
+
+	def _post(self, event: dict) -> None:
+		request = urllib.request.Request(
+			self.url, data=json.dumps(event).encode("utf-8"), method="POST",
+			headers={"Content-Type": "application/json", "User-Agent": "contract-guardian"},
+		)
+		# Raises for 4xx/5xx answers, so the scheduler retries
+		with urllib.request.urlopen(request, timeout=self.timeout) as response:
+			response.read()
+
+	async def send(self, event: dict) -> None:
+		await asyncio.to_thread(self._post, event)
+
+
+def external_notifiers() -> List:
+	"""The configured channels other than inapp, which the scheduler writes itself."""
+	notifiers = []
+	for name in NOTIFIERS:
+		if name == "email":
+			notifiers.append(EmailNotifier())
+		elif name == "webhook":
+			if WEBHOOK_URL is None:
+				print("[notify] CG_DEADLINE_WEBHOOK_URL is not set; webhook notifications are off")
+			else:
+				notifiers.append(WebhookNotifier(WEBHOOK_URL))
+		elif name != INAPP:
+			print(f"[notify] Unknown notifier {name!r} in CG_DEADLINE_NOTIFIERS, ignored")
+	return notifiers
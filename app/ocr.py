@@ -1,14 +1,197 @@
-from typing import Tuple
+from typing import Iterable, Optional, Set, Tuple
+import ctypes
+import gc
 import io
+import os
+import time
 from PyPDF2 import PdfReader
 from pdfminer.high_level import extract_text as pdfminer_extract_text
-from pdf2image import convert_from_bytes
 import pytesseract
 from PIL import Image
+from . import tesseract_engine
+from .language import detect_language, tesseract_code
+from .pdf_render import render_pages
+from .ocr_preprocess import PREPROCESS, PreparedPage, choose_dpi, prepare
 
+# Tesseract page segmentation mode; "auto" picks one per page (see segmentation_mode)
+PSM = os.environ.get("CG_OCR_PSM", "auto")
+# Tesseract engine on 4.x and later: 1 is the LSTM recognizer, more accurate than
+# the legacy one (0), which tessdata_fast packs do not include
+OEM = os.environ.get("CG_OCR_OEM", "1")
+# Preprocessed pages have an x-height of X_HEIGHT px, which is body text at 300 DPI
+PREPARED_DPI = 300
+RENDER_DPI = 150  # PDF pages when preprocessing is off
+PROBE_DPI = 100  # the first PDF page is rendered at this to choose the DPI
+# Pages of a scanned PDF that are OCR'd (0: all). Pages are rendered and read
+# one at a time, so this bounds the time taken, not the memory; uploads also
+# pass a deadline, after which the pages read so far are returned
+OCR_PAGES = int(os.environ.get("CG_OCR_MAX_PAGES", "20"))
+# Allocations of at least this many bytes get their own mapping, given back to
+# the system when freed (0: glibc's default, see _fix_mmap_threshold)
+MMAP_THRESHOLD = int(os.environ.get("CG_OCR_MMAP_THRESHOLD", str(1 << 20)))
+M_MMAP_THRESHOLD = -3  # mallopt parameter, from glibc's malloc.h
+# Fewer text lines than this is sparse text: labels, a signature block, a photo of a card
+SPARSE_LINES = 3
 
-def extract_text_from_pdf_bytes(data: bytes) -> Tuple[str, bool]:
-	"""Return (text, used_ocr). Attempts text extraction first; OCR fallback if needed."""
+_installed: Optional[Set[str]] = None
+_lstm: Optional[bool] = None
+
+
+def _fix_mmap_threshold() -> None:
+	"""By default glibc raises its mmap threshold to the size of the largest
+	mapping freed. After the first page, page-sized buffers (the render, the
+	preprocessing arrays, Tesseract's copies) then come from the heap, which
+	keeps them: the process stayed about 35 MB larger after a scan. A fixed
+	threshold keeps them mapped and returned as each page is let go.
+	MALLOC_MMAP_THRESHOLD_ in the environment wins; elsewhere than glibc this
+	does nothing."""
+	if not MMAP_THRESHOLD or "MALLOC_MMAP_THRESHOLD_" in os.environ:
+		return
+	try:
+		ctypes.CDLL(None).mallopt(M_MMAP_THRESHOLD, MMAP_THRESHOLD)
+	except (OSError, AttributeError):
+		pass
+
+
+_fix_mmap_threshold()
+
+
+def tesseract_languages() -> Set[str]:
+	"""Tesseract language packs installed here (asked once; empty when Tesseract cannot be asked).
+	With libtesseract they are asked of it, as the tesseract program may not be installed."""
+	global _installed
+	if _installed is None:
+		try:
+			if tesseract_engine.available():
+				_installed = tesseract_engine.languages()
+			else:
+				_installed = set(pytesseract.get_languages(config=""))
+		except Exception as e:
+			print(f"[ocr] Could not list Tesseract languages: {e}")
+			_installed = set()
+	return _installed
+
+
+def _tesseract_lang(language: str) -> Optional[str]:
+	"""Tesseract's pack for language, or None (Tesseract's default, English) when not installed."""
+	code = tesseract_code(language)
+	if code is None or code == "eng":
+		return None
+	if code not in tesseract_languages():
+		print(f"[ocr] No Tesseract pack for {language} (install tesseract-ocr-{code}); reading it as English")
+		return None
+	return code
+
+
+def _has_lstm() -> bool:
+	"""Whether Tesseract is 4.x or later, whose --oem selects the LSTM recognizer."""
+	global _lstm
+	if _lstm is None:
+		try:
+			if tesseract_engine.available():
+				_lstm = int(tesseract_engine.version().split(".")[0]) >= 4
+			else:
+				_lstm = pytesseract.get_tesseract_version().major >= 4
+		except Exception:
+			_lstm = False
+	return _lstm
+
+
+def engine_mode() -> int:
+	"""Tesseract engine mode for preprocessed pages: OEM on 4.x and later, else the default."""
+	return int(OEM) if _has_lstm() else tesseract_engine.OEM_DEFAULT
+
+
+def segmentation_mode(page: PreparedPage) -> int:
+	"""Tesseract --psm for a page: 11 (sparse text, in no particular order) for
+	fewer than SPARSE_LINES lines, 3 (fully automatic, which finds columns) for
+	several columns, else 4 (one column of text of variable sizes: headings,
+	numbered clauses and body text), which skips the column analysis."""
+	if PSM != "auto":
+		return int(PSM)
+	if page.layout.lines < SPARSE_LINES:
+		return 11
+	if page.columns > 1:
+		return 3
+	return 4
+
+
+def tesseract_config(page: Optional[PreparedPage]) -> str:
+	"""Tesseract options for a preprocessed page ("" for an image as it came)."""
+	if page is None:
+		return ""
+	options = [f"--psm {segmentation_mode(page)}", f"--dpi {PREPARED_DPI}"]
+	if _has_lstm():
+		options.insert(0, f"--oem {OEM}")
+	return " ".join(options)
+
+
+def _read(img: Image.Image, lang: Optional[str], page: Optional[PreparedPage]) -> str:
+	"""Text of one page image: by a pooled Tesseract engine (see app.tesseract_engine)
+	when libtesseract is there, else by a tesseract process with tesseract_config."""
+	if not tesseract_engine.available():
+		return pytesseract.image_to_string(img, lang=lang, config=tesseract_config(page))
+	if page is None:
+		return tesseract_engine.read(img, lang or "eng")
+	return tesseract_engine.read(img, lang or "eng", psm=segmentation_mode(page), dpi=PREPARED_DPI, oem=engine_mode())
+
+
+def _prepare(img: Image.Image) -> Optional[PreparedPage]:
+	if not PREPROCESS:
+		return None
+	try:
+		return prepare(img)
+	except Exception as e:
+		print(f"[ocr] Preprocessing failed, reading the page as is: {type(e).__name__}: {e}")
+		return None
+
+
+def _ocr_images(images: Iterable[Image.Image], language: Optional[str] = None, skip_errors: bool = True, deadline: Optional[float] = None) -> str:
+	"""OCR page images, preprocessed (see app.ocr_preprocess), with the Tesseract
+	pack of language. Without a language, the first page is read with the
+	default pack and its text's language detected; a page in another language
+	is read again with that language's pack.
+	With skip_errors, a page Tesseract fails on reads as empty. images may be a
+	generator: each page is let go before the next is taken, and the generator
+	is closed at the end. Past deadline (time.monotonic()), no page after the
+	first is started and the text of the pages read so far is returned."""
+	lang = _tesseract_lang(language) if language else None
+	parts = []
+	try:
+		for i, img in enumerate(images):
+			if i and deadline is not None and time.monotonic() > deadline:
+				print(f"[ocr] Out of time after {i} pages; returning their text")
+				break
+			try:
+				page = _prepare(img)
+				if page is not None:
+					img = page.image
+				text = _read(img, lang, page)
+				if i == 0 and not language:
+					detected = detect_language(text)
+					lang = _tesseract_lang(detected)
+					if lang is not None:
+						print(f"[ocr] Text looks {detected}: reading with Tesseract pack {lang}")
+						text = _read(img, lang, page)
+			except Exception:
+				if not skip_errors:
+					raise
+				text = ""
+			parts.append(text)
+			img = page = None
+	finally:
+		# Stops pdftoppm when pages are left
+		close = getattr(images, "close", None)
+		if close is not None:
+			close()
+	return "\n".join(parts)
+
+
+def extract_text_from_pdf_bytes(data: bytes, language: Optional[str] = None, deadline: Optional[float] = None) -> Tuple[str, bool]:
+	"""Return (text, used_ocr). Attempts text extraction first; OCR fallback if needed,
+	in language (ISO 639-1) when given, else in the language detected on the first page.
+	OCR starts no page after the first past deadline (time.monotonic()) and returns
+	the text of the pages it read."""
 	text = ""
 	used_ocr = False
 	# Try fast extract via PyPDF2
@@ -33,27 +216,31 @@ def extract_text_from_pdf_bytes(data: bytes) -> Tuple[str, bool]:
 	if text and text.strip():
 		return text, used_ocr
 
-	# OCR fallback (limit pages and DPI to avoid timeouts/memory on PaaS)
+	# PyPDF2 and pdfminer leave the document's parsed objects, about the size of
+	# the PDF, in reference cycles; free them before the pages take their memory
+	reader = page = None
+	gc.collect()
+
+	# OCR fallback, up to OCR_PAGES pages. Pages are rendered and OCR'd one at a
+	# time (see app.pdf_render), so the memory for pages does not grow with the
+	# length. With preprocessing, a small render of the first page picks the DPI
+	# that brings its text to the x-height Tesseract reads best, instead of a fixed 150.
 	try:
-		images = convert_from_bytes(
-			data,
-			dpi=150,
-			fmt="png",
-			first_page=1,
-			last_page=3,
-		)
+		dpi = RENDER_DPI
+		if PREPROCESS:
+			probe = next(render_pages(data, PROBE_DPI, 1, 1), None)
+			if probe is not None:
+				dpi = choose_dpi(probe, PROBE_DPI)
+				print(f"[ocr] Rendering at {dpi} DPI")
+			probe = None
+		text = _ocr_images(render_pages(data, dpi, 1, OCR_PAGES or None), language, deadline=deadline)
 	except Exception as e:
 		raise RuntimeError(f"OCR backend unavailable: {e}")
-	ocr_text_parts = []
-	for img in images:
-		try:
-			ocr_text_parts.append(pytesseract.image_to_string(img))
-		except Exception as e:
-			ocr_text_parts.append("")
 	used_ocr = True
-	return "\n".join(ocr_text_parts), used_ocr
+	return text, used_ocr
 
 
-def extract_text_from_image_bytes(data: bytes) -> str:
+def extract_text_from_image_bytes(data: bytes, language: Optional[str] = None) -> Tuple[str, bool]:
+	"""Return (text, used_ocr) like extract_text_from_pdf_bytes; images always go through OCR."""
 	img = Image.open(io.BytesIO(data))
-	return pytesseract.image_to_string(img) 
\ No newline at end of file
+	return _ocr_images([img], language, skip_errors=False), True 
\ No newline at end of file
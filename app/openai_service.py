@@ -7,6 +7,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Contract text sent for analysis; longer texts are cut (callers may pre-select clauses to fit)
+MAX_CONTRACT_CHARS = 8000
+
 @dataclass
 class GPTAnalysisResult:
     """Result from GPT analysis of a contract"""
@@ -45,9 +48,8 @@ class OpenAIService:
         
         try:
             # Truncate text if too long to stay within token limits
-            max_chars = 8000  # Conservative limit for GPT-4
-            if len(contract_text) > max_chars:
-                contract_text = contract_text[:max_chars] + "\n\n[Text truncated for analysis...]"
+            if len(contract_text) > MAX_CONTRACT_CHARS:
+                contract_text = contract_text[:MAX_CONTRACT_CHARS] + "\n\n[Text truncated for analysis...]"
             
             system_prompt = """You are Contract Guardian, an expert contract analyst specializing in protecting creators, influencers, and content producers from unfair contract terms. 
 
@@ -0,0 +1,82 @@
+"""PDF pages rendered one at a time, for OCR of documents of any length.
+
+pdf2image's convert_from_bytes returns every requested page as an image in
+one list, so memory grows with the page count. Here a single pdftoppm
+process renders the pages in order as raw PGM to a pipe, and render_pages
+yields them one by one. pdftoppm blocks on the full pipe until the previous
+page has been taken, so at any time there is about one page in pdftoppm and
+one with the caller, however many pages the document has.
+"""
+from typing import IO, Iterator, Optional, Tuple
+import os
+import subprocess
+import tempfile
+
+from PIL import Image
+
+_MODES = {b"P5": ("L", 1), b"P6": ("RGB", 3)}
+
+
+def _read_header(stream: IO[bytes]) -> Optional[Tuple[str, int, int]]:
+	"""(mode, width, height) of the next PNM image on stream, or None at its end."""
+	tokens, token = [], b""
+	while len(tokens) < 4:
+		c = stream.read(1)
+		if not c:
+			if tokens or token:
+				raise RuntimeError("pdftoppm output ended inside a page header")
+			return None
+		if c.isspace():
+			if token:
+				tokens.append(token)
+				token = b""
+		else:
+			token += c
+	magic, width, height, maxval = tokens
+	if magic not in _MODES or maxval != b"255":
+		raise RuntimeError(f"Unexpected pdftoppm output: {magic!r} with maximum value {maxval!r}")
+	return _MODES[magic][0], int(width), int(height)
+
+
+def _read_page(stream: IO[bytes], mode: str, width: int, height: int) -> Image.Image:
+	size = width * height * (3 if mode == "RGB" else 1)
+	pixels = stream.read(size)
+	if len(pixels) != size:
+		raise RuntimeError("pdftoppm output ended inside a page")
+	return Image.frombytes(mode, (width, height), pixels)
+
+
+def render_pages(data: bytes, dpi: int, first_page: int = 1, last_page: Optional[int] = None, grayscale: bool = True) -> Iterator[Image.Image]:
+	"""The pages first_page to last_page (default: the last) of a PDF, rendered at
+	dpi one at a time. Raises RuntimeError when pdftoppm is missing or fails.
+	Closing the iterator early stops pdftoppm."""
+	with tempfile.TemporaryDirectory(prefix="cg-pdf-") as tmp:
+		path = os.path.join(tmp, "document.pdf")
+		with open(path, "wb") as f:
+			f.write(data)
+		args = ["pdftoppm", "-r", str(dpi), "-f", str(first_page)]
+		if last_page is not None:
+			args += ["-l", str(last_page)]
+		if grayscale:
+			args.append("-gray")
+		args.append(path)
+		with open(os.path.join(tmp, "stderr"), "w+b") as stderr:
+			try:
+				proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+			except OSError as e:
+				raise RuntimeError(f"pdftoppm not available: {e}")
+			try:
+				while True:
+					header = _read_header(proc.stdout)
+					if header is None:
+						break
+					yield _read_page(proc.stdout, *header)
+				if proc.wait() != 0:
+					stderr.seek(0)
+					message = stderr.read().decode(errors="replace").strip()
+					raise RuntimeError(f"pdftoppm exited with status {proc.returncode}: {message or 'no message'}")
+			finally:
+				if proc.poll() is None:
+					proc.kill()
+				proc.stdout.close()
+				proc.wait()
@@ -0,0 +1,108 @@
+import json
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models, summary
+from .database import SessionLocal
+from .rulebook import CompiledRulebook, active_rulebook
+
+_FLAG_FIELDS = ("rule_id", "rule_ids", "rule_version", "severity", "clause_ordinal", "confidence")
+
+
+def register_current_ruleset(language: Optional[str] = None) -> str:
+	"""register_ruleset() for the rules in effect for language (default: the default language)."""
+	return register_ruleset(active_rulebook(language))
+
+
+def register_ruleset(book: CompiledRulebook) -> str:
+	"""Record a ruleset's rules under its fingerprint, and the text of
+	any rule versions not yet in the rules table (idempotent)."""
+	db = SessionLocal()
+	try:
+		if db.get(models.Ruleset, book.fingerprint) is None:
+			db.add(models.Ruleset(fingerprint=book.fingerprint, rules=json.dumps(book.ruleset, sort_keys=True)))
+			db.commit()
+	except IntegrityError:
+		# Another worker registered it first
+		db.rollback()
+	try:
+		known = set(
+			db.query(models.RuleText.rule_id, models.RuleText.version)
+			.filter(models.RuleText.rule_id.in_([rule.id for rule in book.rules]))
+			.all()
+		)
+		for rule in book.rules:
+			if (rule.id, rule.version) not in known:
+				db.add(models.RuleText(
+					rule_id=rule.id, version=rule.version, category=rule.category,
+					severity=rule.severity, explanation=rule.explanation, guidance=rule.guidance,
+				))
+		db.commit()
+	except IntegrityError:
+		db.rollback()
+	finally:
+		db.close()
+	return book.fingerprint
+
+
+def load_rulesets(db: Session) -> Dict[str, Dict[str, str]]:
+	return {row.fingerprint: json.loads(row.rules) for row in db.query(models.Ruleset).all()}
+
+
+def rules_to_rerun(old: Optional[Dict[str, str]], new: Dict[str, str]) -> Optional[Set[str]]:
+	"""Rule ids whose flags may differ between two rulesets: added, changed or
+	removed rules. None means the old ruleset is unknown and everything must run."""
+	if old is None:
+		return None
+	changed = {rule_id for rule_id, version in new.items() if old.get(rule_id) != version}
+	return changed | (set(old) - set(new))
+
+
+def categories_to_rerun(changed: Set[str], categories: Dict[str, str], stored: Iterable[Tuple[str, Optional[str]]]) -> Set[str]:
+	"""Categories whose flags must be recomputed for one contract.
+
+	Flags are merged per category, so a changed rule invalidates its whole
+	category: the category it has now, and any category where the contract
+	has a stored flag it contributed to (it may have moved or been removed).
+	categories maps current rule ids to categories; stored holds the
+	contract's (category, rule_ids) pairs.
+	"""
+	result = {categories[rule_id] for rule_id in changed if rule_id in categories}
+	for category, rule_ids in stored:
+		if rule_ids is None or not changed.isdisjoint(rule_ids.split(",")):
+			result.add(category)
+	return result
+
+
+def apply_flag_diff(db: Session, contract: models.Contract, new_flags: Iterable[dict], categories: Optional[Set[str]]) -> Tuple[int, int, int]:
+	"""Reconcile a contract's stored flags with fresh analyzer output in place.
+
+	Only flags of the given categories are in scope (all flags when None). A
+	flag matching an existing one on (category, start, end) -- unique, as
+	flags are merged per category -- is kept and updated, new ones are added
+	and in-scope flags that no longer match are deleted. Risk summary counters
+	move with the flags. Returns (kept, added, removed).
+	"""
+	summary.apply_contract(db, contract.user_id, contract.status, contract.flags, sign=-1)
+
+	existing = {
+		(f.category, f.start_index, f.end_index): f
+		for f in contract.flags
+		if categories is None or f.category in categories
+	}
+	kept = added = 0
+	for flag in new_flags:
+		row = existing.pop((flag["category"], flag["start_index"], flag["end_index"]), None)
+		if row is None:
+			contract.flags.append(models.ClauseFlag.from_analysis(flag))
+			added += 1
+			continue
+		for field in _FLAG_FIELDS:
+			if field in flag and getattr(row, field) != flag[field]:
+				setattr(row, field, flag[field])
+		kept += 1
+	for row in existing.values():
+		contract.flags.remove(row)
+
+	summary.apply_contract(db, contract.user_id, contract.status, contract.flags)
+	return kept, added, len(existing)
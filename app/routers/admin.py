@@ -0,0 +1,95 @@
+from datetime import datetime
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from .. import models, schemas
+from ..auth import require_admin
+from ..database import get_db, run_write
+from ..fingerprints import generate_commentary, new_standard_clause
+from ..rulebook import get_loader, loaded_languages
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/rules")
+async def get_rules(language: Optional[str] = None):
+	"""Report on the rulebook active in this worker (of the default language,
+	or of language), and which languages' packs it has loaded"""
+	loader = get_loader(language)
+	return {"path": loader.path, **loader.active().report(), "loaded_languages": loaded_languages()}
+
+
+@router.post("/rules/reload")
+async def reload_rules(language: Optional[str] = None):
+	"""Re-read the rulebook (of the default language, or of language) now. Only
+	this worker reloads here; the others notice the file change within
+	CG_RULEBOOK_CHECK_SECONDS. Compiled in a thread, so this worker keeps
+	serving with the previous rules meanwhile."""
+	loader = get_loader(language)
+	try:
+		book = await asyncio.to_thread(loader.reload)
+	except (OSError, ValueError) as e:
+		raise HTTPException(status_code=400, detail=f"Rulebook not reloaded: {e}")
+	return {"path": loader.path, **book.report()}
+
+
+@router.get("/clauses", response_model=List[schemas.StandardClauseRead])
+async def list_standard_clauses(db: Session = Depends(get_db)):
+	"""The standard clause library"""
+	return db.query(models.StandardClause).order_by(models.StandardClause.id).all()
+
+
+@router.post("/clauses", response_model=schemas.StandardClauseRead)
+async def add_standard_clause(payload: schemas.StandardClauseCreate, db: Session = Depends(get_db)):
+	"""Add a clause to the library. New uploads are matched against it at once;
+	stored contracts after `python -m app.scripts.standard_clauses apply`."""
+	def _add(session: Session) -> int:
+		try:
+			clause = new_standard_clause(session, **payload.model_dump())
+		except ValueError as e:
+			raise HTTPException(status_code=400, detail=str(e))
+		if clause.commentary:
+			clause.commentary_date = datetime.utcnow()
+		session.add(clause)
+		session.flush()
+		return clause.id
+
+	clause_id = await run_write(db, _add)
+	return db.query(models.StandardClause).filter_by(id=clause_id).first()
+
+
+@router.post("/clauses/{clause_id}/commentary", response_model=schemas.StandardClauseRead)
+async def refresh_standard_clause_commentary(clause_id: int, db: Session = Depends(get_db)):
+	"""Generate and cache GPT commentary for a library clause"""
+	clause = db.query(models.StandardClause).filter_by(id=clause_id).first()
+	if not clause:
+		raise HTTPException(status_code=404, detail="Not found")
+	commentary = await generate_commentary(clause)
+	if not commentary:
+		raise HTTPException(status_code=503, detail="GPT analysis is not available")
+
+	def _save(session: Session) -> None:
+		session.query(models.StandardClause).filter_by(id=clause_id).update(
+			{"commentary": commentary, "commentary_date": datetime.utcnow()}, synchronize_session=False,
+		)
+
+	await run_write(db, _save)
+	db.expire_all()
+	return db.query(models.StandardClause).filter_by(id=clause_id).first()
+
+
+@router.delete("/clauses/{clause_id}")
+async def delete_standard_clause(clause_id: int, db: Session = Depends(get_db)):
+	def _delete(session: Session) -> None:
+		clause = session.query(models.StandardClause).filter_by(id=clause_id).first()
+		if not clause:
+			raise HTTPException(status_code=404, detail="Not found")
+		# ON DELETE SET NULL, also where SQLite does not enforce foreign keys
+		session.query(models.ContractClause).filter_by(standard_clause_id=clause_id).update(
+			{"standard_clause_id": None, "standard_distance": None}, synchronize_session=False,
+		)
+		session.delete(clause)
+
+	await run_write(db, _delete)
+	return {"ok": True}
@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from ..database import get_db, get_read_db, run_write
+from .. import models, schemas
+from ..auth import get_current_user
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[schemas.AlertRead])
+async def list_alerts(
+	unread: bool = False,
+	limit: int = Query(50, ge=1, le=500),
+	db: Session = Depends(get_read_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""The user's in-app alerts (fired deadlines), newest first"""
+	query = db.query(models.Alert).filter(models.Alert.user_id == user.id)
+	if unread:
+		query = query.filter(models.Alert.read_at.is_(None))
+	return query.order_by(models.Alert.created_at.desc(), models.Alert.id.desc()).limit(limit).all()
+
+
+@router.post("/{alert_id}/read", response_model=schemas.AlertRead)
+async def mark_alert_read(alert_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+	def _read(session: Session) -> None:
+		alert = session.query(models.Alert).filter_by(id=alert_id, user_id=user.id).first()
+		if not alert:
+			raise HTTPException(status_code=404, detail="Not found")
+		if alert.read_at is None:
+			alert.read_at = datetime.utcnow()
+
+	await run_write(db, _read)
+	return db.query(models.Alert).filter_by(id=alert_id).first()
@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import date
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import AsyncIterator, List, Optional, Union
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from pydantic import ValidationError
+import json
 import os
 import time
 import uuid
 import asyncio
 import psutil
-from fastapi.responses import FileResponse
-from ..database import get_db
-from .. import models, schemas
+from fastapi.responses import FileResponse, StreamingResponse
+from ..database import SessionLocal, get_db, get_read_db, run_write
+from ..batch import BATCH_LOOKAHEAD, Analysis, analyze_one, batch_workers, get_pool, stop_pool
+from .. import counterparties, deadlines, models, schemas, summary
 from ..ocr import extract_text_from_pdf_bytes, extract_text_from_image_bytes
-from ..analyzer import analyze_text, analyze_contract_comprehensive, save_gpt_analysis_to_contract, get_gpt_analysis_from_contract
+from ..analyzer import analyze_text, ruleset_version, analyze_contract_comprehensive, gpt_context, save_gpt_analysis_to_contract, get_gpt_analysis_from_contract
+from ..segmenter import segment, question_scores, select_context
+from ..terms import EXPIRY_DATE, PAYMENT_DAYS, extract_terms
+from ..dedup import DUP_THRESHOLD, find_near_duplicate, find_similar, from_bytes, index_contract, minhash, reuse_flags
+from ..diffing import can_carry_over, carry_over_flags, changed_size, diff_spans
+from ..versions import changed_clauses, compare_flags, next_version, version_chain
+from ..fingerprints import recognize
+from ..language import detect_language, supported_languages
+from ..rulebook import active_rulebook
+from ..scheduler import wake_scheduler
 from ..openai_service import get_openai_service
 from ..auth import get_current_user
 
@@ -27,17 +41,52 @@ ALLOWED_CONTENT_TYPES = {
     "image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp", "image/bmp",
     "text/plain", "text/csv"
 }
-
-
-async def _extract_text_with_timeout(data: bytes, content_type: str, filename: str):
-	"""Extract text from file data with proper error handling"""
+ASK_CONTEXT_CHARS = 2000  # contract text sent along with an ask-gpt question
+ANALYSIS_MAX_CHARS = 50000  # uploads are analyzed up to here
+BATCH_MAX_DOCUMENTS = int(os.environ.get("CG_BATCH_MAX_DOCUMENTS", "1000"))
+EXTRACTION_TIMEOUT_SECONDS = 60.0
+# OCR of a long scan starts no new page after this, and returns the pages it
+# read, well before the extraction timeout (a page can take several seconds)
+OCR_BUDGET_SECONDS = float(os.environ.get("CG_OCR_BUDGET_SECONDS", "40"))
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+
+async def _extract_text_with_timeout(data: bytes, content_type: str, filename: str, language: Optional[str] = None):
+	"""Extract text from file data with proper error handling. OCR runs in a worker
+	thread, so the event loop keeps serving and the caller's timeout applies."""
 	if content_type in ("application/pdf",) or filename.lower().endswith(".pdf"):
-		return extract_text_from_pdf_bytes(data)
+		deadline = time.monotonic() + OCR_BUDGET_SECONDS
+		return await asyncio.to_thread(extract_text_from_pdf_bytes, data, language, deadline)
 	elif content_type.startswith("image/"):
-		return extract_text_from_image_bytes(data)
+		return await asyncio.to_thread(extract_text_from_image_bytes, data, language)
 	else:
 		# Assume text
-		return data.decode("utf-8", errors="ignore"), None
+		return data.decode("utf-8", errors="ignore"), False
+
+
+# ContractRead renders each flag's explanation and guidance from its rule and
+# clause (and the clause's standard clause): load them per contract, not per flag
+_CONTRACT_READ_OPTIONS = (
+	selectinload(models.Contract.flags).selectinload(models.ClauseFlag.clause).selectinload(models.ContractClause.standard_clause),
+	selectinload(models.Contract.flags).selectinload(models.ClauseFlag.rule),
+)
+
+
+def _contract_for_read(db: Session, contract_id: int, user_id: Optional[int] = None) -> Optional[models.Contract]:
+	query = db.query(models.Contract).options(*_CONTRACT_READ_OPTIONS).filter_by(id=contract_id)
+	if user_id is not None:
+		query = query.filter_by(user_id=user_id)
+	return query.first()
+
+
+def _check_language(language: Optional[str]) -> Optional[str]:
+	"""A language given with a contract, lowercased; 400 when no rules or detection know it."""
+	if language is None:
+		return None
+	language = language.strip().lower()
+	if language not in supported_languages():
+		raise HTTPException(status_code=400, detail=f"Unsupported language {language!r} (supported: {', '.join(supported_languages())})")
+	return language
 
 
 async def _analyze_text_with_timeout(text: str):
@@ -51,6 +100,8 @@ async def upload_contract(
 	counterparty: Optional[str] = Form(None),
 	production: Optional[str] = Form(None),
 	contract_date: Optional[date] = Form(None),
+	previous_version_id: Optional[int] = Form(None),
+	language: Optional[str] = Form(None),
 	file: UploadFile = File(...),
 	db: Session = Depends(get_db),
 	user: models.User = Depends(get_current_user),
@@ -72,6 +123,9 @@ async def upload_contract(
 		if content_type not in ALLOWED_CONTENT_TYPES and not any(filename.lower().endswith(ext) for ext in ['.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.txt', '.csv']):
 			print(f"[{request_id}] Unsupported content type: {content_type}")
 			raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
+
+		previous = _previous_version(db, previous_version_id, user.id)
+		language = _check_language(language)
 		
 		# Read file data
 		filename = file.filename or "uploaded"
@@ -93,14 +147,14 @@ async def upload_contract(
 		
 		try:
 			# Add timeout for text extraction
-			extraction_task = asyncio.create_task(_extract_text_with_timeout(data, content_type, filename))
-			text, _ = await asyncio.wait_for(extraction_task, timeout=60.0)  # 60 second timeout
+			extraction_task = asyncio.create_task(_extract_text_with_timeout(data, content_type, filename, language))
+			text, used_ocr = await asyncio.wait_for(extraction_task, timeout=EXTRACTION_TIMEOUT_SECONDS)
 			
 			extraction_time = time.time() - extraction_start
-			print(f"[{request_id}] Text extraction complete in {extraction_time:.2f}s, extracted {len(text)} chars")
+			print(f"[{request_id}] Text extraction complete in {extraction_time:.2f}s, extracted {len(text)} chars{' (OCR)' if used_ocr else ''}")
 			
 		except asyncio.TimeoutError:
-			print(f"[{request_id}] Text extraction timed out after 60s")
+			print(f"[{request_id}] Text extraction timed out after {EXTRACTION_TIMEOUT_SECONDS:.0f}s")
 			raise HTTPException(status_code=408, detail="Text extraction timed out. Please try a smaller file.")
 		except Exception as e:
 			print(f"[{request_id}] Text extraction failed: {str(e)}")
@@ -109,6 +163,9 @@ async def upload_contract(
 		if not text or not text.strip():
 			print(f"[{request_id}] No text extracted from file")
 			raise HTTPException(status_code=400, detail="No text could be extracted from the file.")
+		if language is None:
+			language = detect_language(text)
+			print(f"[{request_id}] Detected language: {language}")
 
 		# File saving with error handling
 		print(f"[{request_id}] Saving file to disk...")
@@ -133,15 +190,39 @@ async def upload_contract(
 		
 		try:
 			# Limit text size for analysis to prevent memory issues
-			analysis_text = text[:50000] if len(text) > 50000 else text
-			if len(text) > 50000:
+			analysis_text = text[:ANALYSIS_MAX_CHARS] if len(text) > ANALYSIS_MAX_CHARS else text
+			if len(text) > ANALYSIS_MAX_CHARS:
 				print(f"[{request_id}] Text truncated to 50k chars for analysis (original: {len(text)} chars)")
 			
+			clauses = segment(text)
+			terms = extract_terms(text, clauses)
+			# Taken before analyzing: if the rulebook is reloaded meanwhile, an older
+			# stamp only makes the backfill re-check the changed rules
+			analyzed_with = ruleset_version(language)
+
+			# A new version re-analyzes only what changed; a near-duplicate of an
+			# earlier contract reuses its flags and GPT analysis
+			signature = minhash(text)
+			duplicate = None
+			reused_flags = reused_gpt = None
+			focus = set()
+			if previous is not None:
+				reused_flags, reused_gpt, focus = _analyze_version(request_id, previous, analysis_text, clauses, used_ocr, analyzed_with, language)
+			else:
+				duplicate = find_near_duplicate(db, signature, user.id)
+			if duplicate is not None:
+				print(f"[{request_id}] Near-duplicate of contract {duplicate.source.id} ({duplicate.similarity:.0%} similar)")
+				reused_flags = reuse_flags(duplicate, analysis_text, used_ocr, analyzed_with, language)
+				reused_gpt = duplicate.gpt_analysis
+
 			# Use comprehensive analysis (rule-based + GPT)
-			analysis_task = asyncio.create_task(analyze_contract_comprehensive(analysis_text, title))
+			analysis_task = asyncio.create_task(analyze_contract_comprehensive(
+				analysis_text, title, clauses, ocr=used_ocr, rule_flags=reused_flags, reused_gpt=reused_gpt, focus=focus, language=language,
+			))
 			analysis_result = await asyncio.wait_for(analysis_task, timeout=60.0)  # 60 second timeout for GPT
 			
 			flags = analysis_result["rule_based_flags"]
+			clause_scores = analysis_result.get("clause_scores")
 			gpt_analysis = analysis_result.get("gpt_analysis")
 			
 			analysis_time = time.time() - analysis_start
@@ -157,45 +238,68 @@ async def upload_contract(
 		# Database operations with transaction safety
 		print(f"[{request_id}] Saving to database...")
 		try:
-			# Create contract with basic fields first
-			contract_data = {
-				"title": title,
-				"counterparty": counterparty,
-				"production": production,
-				"contract_date": contract_date,
-				"stored_filename": stored_filename,
-				"text": text,
-				"user_id": user.id,
-			}
-			
-			contract = models.Contract(**contract_data)
-			db.add(contract)
-			db.flush()
-
-			# Save rule-based flags
-			for flag in flags:
-				cf = models.ClauseFlag(contract_id=contract.id, **flag)
-				db.add(cf)
-			
-			# Save GPT analysis if available (only if columns exist)
-			if gpt_analysis:
-				try:
-					from ..openai_service import GPTAnalysisResult
-					gpt_result = GPTAnalysisResult(
-						summary=gpt_analysis["summary"],
-						key_risks=gpt_analysis["key_risks"],
-						recommendations=gpt_analysis["recommendations"],
-						overall_assessment=gpt_analysis["overall_assessment"],
-						confidence_score=gpt_analysis["confidence_score"]
-					)
-					save_gpt_analysis_to_contract(contract, gpt_result)
-					print(f"[{request_id}] GPT analysis saved successfully")
-				except Exception as e:
-					print(f"[{request_id}] Warning: Could not save GPT analysis (columns may not exist): {e}")
-
-			db.commit()
-			db.refresh(contract)
-			
+			def _save(session: Session) -> int:
+				# Create contract with basic fields first
+				contract_data = {
+					"title": title,
+					"counterparty": counterparty,
+					"production": production,
+					"contract_date": contract_date,
+					"stored_filename": stored_filename,
+					"text": text,
+					"used_ocr": used_ocr,
+					"language": language,
+					"user_id": user.id,
+					"ruleset_version": analyzed_with,
+				}
+
+				contract = models.Contract(**contract_data)
+				index_contract(contract, signature)
+				if duplicate is not None and duplicate.same_user:
+					contract.duplicate_of_id = duplicate.source.id
+					contract.duplicate_similarity = duplicate.similarity
+				if previous is not None:
+					contract.previous_version_id = previous.id
+					contract.version = next_version(previous)
+				contract.clauses = [models.ContractClause.from_clause(c) for c in clauses]
+				contract.terms = [models.ContractTerm.from_term(t) for t in terms]
+				if clause_scores is not None:
+					clause_scores.apply(contract)
+				session.add(contract)
+				recognize(session, contract)
+				session.flush()
+
+				# Save rule-based flags
+				for flag in flags:
+					cf = models.ClauseFlag.from_analysis(flag, contract_id=contract.id)
+					session.add(cf)
+				summary.apply_contract(session, contract.user_id, contract.status, flags)
+				counterparties.add_contract(session, contract, flags)
+				deadlines.schedule(contract, flags)
+				if previous is not None:
+					deadlines.supersede(session, previous.id)
+
+				# Save GPT analysis if available
+				if gpt_analysis:
+					try:
+						from ..openai_service import GPTAnalysisResult
+						gpt_result = GPTAnalysisResult(
+							summary=gpt_analysis["summary"],
+							key_risks=gpt_analysis["key_risks"],
+							recommendations=gpt_analysis["recommendations"],
+							overall_assessment=gpt_analysis["overall_assessment"],
+							confidence_score=gpt_analysis["confidence_score"]
+						)
+						save_gpt_analysis_to_contract(contract, gpt_result)
+						print(f"[{request_id}] GPT analysis saved successfully")
+					except Exception as e:
+						print(f"[{request_id}] Warning: Could not save GPT analysis: {e}")
+				return contract.id
+
+			contract_id = await run_write(db, _save)
+			wake_scheduler()
+			contract = _contract_for_read(db, contract_id)
+
 			total_time = time.time() - start_time
 			print(f"[{request_id}] Upload complete in {total_time:.2f}s, Memory: {psutil.Process().memory_info().rss / 1024 / 1024:.1f}MB")
 			
@@ -216,63 +320,475 @@ async def upload_contract(
 		raise HTTPException(status_code=500, detail=f"Unexpected server error: {str(e)}")
 
 
+def _previous_version(db: Session, contract_id: Optional[int], user_id: int) -> Optional[models.Contract]:
+	"""The user's contract a new upload is the next version of; 404 if it is not theirs."""
+	if contract_id is None:
+		return None
+	previous = db.query(models.Contract).filter_by(id=contract_id, user_id=user_id).first()
+	if not previous:
+		raise HTTPException(status_code=404, detail="Previous version not found")
+	return previous
+
+
+def _analyze_version(request_id: str, previous: models.Contract, text: str, clauses, ocr: bool, ruleset: str, language: str):
+	"""(rule flags, reused GPT analysis or None, changed clause ordinals) for the
+	next version of previous. The rules re-run only around the changed text when
+	the previous flags came from the same rules, and the GPT analysis is reused
+	when no flag was introduced or resolved."""
+	spans = diff_spans(previous.text[:ANALYSIS_MAX_CHARS], text)
+	focus = changed_clauses(spans, clauses)
+	if can_carry_over(previous, ocr, ruleset):
+		flags, analyzed = carry_over_flags(
+			previous.text[:ANALYSIS_MAX_CHARS], [flag.to_analysis() for flag in previous.flags], text, ocr=ocr, spans=spans, language=language,
+		)
+	else:
+		flags, analyzed = analyze_text(text, ocr=ocr, language=language), len(text)
+	changes = compare_flags(spans, previous.flags, flags)
+	print(
+		f"[{request_id}] Version {next_version(previous)} of contract {previous.id}: {len(focus)} clauses changed, "
+		f"re-analyzed {analyzed} of {len(text)} chars, flags +{len(changes.introduced)} -{len(changes.resolved)} ={len(changes.unchanged)}"
+	)
+	reused_gpt = None
+	if not changes.introduced and not changes.resolved:
+		reused_gpt = get_gpt_analysis_from_contract(previous)
+	return flags, reused_gpt, focus
+
+
+def _new_contract(user_id: int, doc, analysis: Analysis, title: Optional[str] = None) -> models.Contract:
+	"""Contract row for a ContractCreate/BatchDocument with its clause tree, flags, terms,
+	clause scores and near-duplicate signature."""
+	contract = models.Contract(
+		title=title or doc.title,
+		counterparty=doc.counterparty,
+		production=doc.production,
+		contract_date=doc.contract_date,
+		stored_filename=getattr(doc, "stored_filename", None),
+		text=doc.text,
+		language=analysis.language,
+		user_id=user_id,
+		ruleset_version=analysis.ruleset_version,
+	)
+	contract.clauses = [models.ContractClause.from_clause(c) for c in analysis.clauses]
+	contract.flags = [models.ClauseFlag.from_analysis(flag) for flag in analysis.flags]
+	contract.terms = [models.ContractTerm.from_term(t) for t in analysis.terms]
+	if analysis.clause_scores is not None:
+		analysis.clause_scores.apply(contract)
+	index_contract(contract)
+	return contract
+
+
 @router.post("/create", response_model=schemas.ContractRead)
 async def create_contract(
 	payload: schemas.ContractCreate,
 	db: Session = Depends(get_db),
 	user: models.User = Depends(get_current_user),
 ):
-	flags = analyze_text(payload.text)
-	contract = models.Contract(
-		title=payload.title,
-		counterparty=payload.counterparty,
-		production=payload.production,
-		contract_date=payload.contract_date,
-		stored_filename=payload.stored_filename,
-		text=payload.text,
-		user_id=user.id,
+	previous = _previous_version(db, payload.previous_version_id, user.id)
+	analysis = analyze_one(payload.text, _check_language(payload.language))
+	duplicate = find_near_duplicate(db, minhash(payload.text), user.id) if previous is None else None
+
+	def _save(session: Session) -> int:
+		contract = _new_contract(user.id, payload, analysis)
+		if duplicate is not None and duplicate.same_user:
+			contract.duplicate_of_id = duplicate.source.id
+			contract.duplicate_similarity = duplicate.similarity
+		if previous is not None:
+			contract.previous_version_id = previous.id
+			contract.version = next_version(previous)
+		session.add(contract)
+		recognize(session, contract)
+		session.flush()
+		summary.apply_contract(session, contract.user_id, contract.status, analysis.flags)
+		counterparties.add_contract(session, contract, analysis.flags)
+		deadlines.schedule(contract, analysis.flags)
+		if previous is not None:
+			deadlines.supersede(session, previous.id)
+		return contract.id
+
+	contract_id = await run_write(db, _save)
+	wake_scheduler()
+	return _contract_for_read(db, contract_id)
+
+
+def _parse_batch_document(raw: Union[bytes, dict]) -> Union[schemas.BatchDocument, str]:
+	"""The document, or why it was rejected."""
+	try:
+		if isinstance(raw, (bytes, str)):
+			doc = schemas.BatchDocument.model_validate_json(raw)
+		else:
+			doc = schemas.BatchDocument.model_validate(raw)
+	except ValidationError as e:
+		error = e.errors()[0]
+		where = ".".join(str(part) for part in error["loc"])
+		return f"Invalid document: {where + ': ' if where else ''}{error['msg']}"
+	if len(doc.text) > MAX_UPLOAD_BYTES:
+		return "Text too long (max 10 MB)"
+	try:
+		doc.language = _check_language(doc.language)
+	except HTTPException as e:
+		return e.detail
+	return doc
+
+
+async def _ndjson_documents(request: Request) -> List[Union[schemas.BatchDocument, str]]:
+	"""Documents of an NDJSON body, parsed line by line as it arrives.
+
+	The body is read before the response starts: StreamingResponse listens
+	for the client disconnecting on the same receive channel.
+	"""
+	documents = []
+	buffer = b""
+	async for chunk in request.stream():
+		buffer += chunk
+		*lines, buffer = buffer.split(b"\n")
+		if len(buffer) > MAX_UPLOAD_BYTES:
+			documents.append("Line too long (max 10 MB)")
+			return documents
+		for line in lines:
+			if line.strip():
+				documents.append(_parse_batch_document(line))
+		if len(documents) > BATCH_MAX_DOCUMENTS:
+			raise HTTPException(status_code=413, detail=f"Too many documents (max {BATCH_MAX_DOCUMENTS} per batch)")
+	if buffer.strip():
+		documents.append(_parse_batch_document(buffer))
+	if len(documents) > BATCH_MAX_DOCUMENTS:
+		raise HTTPException(status_code=413, detail=f"Too many documents (max {BATCH_MAX_DOCUMENTS} per batch)")
+	return documents
+
+
+async def _stream_batch(documents: List[Union[schemas.BatchDocument, str]], user_id: int, persist: bool, commit_every: int) -> AsyncIterator[str]:
+	"""Analyze documents across the batch pool and yield one NDJSON line per
+	document in input order, then a summary line. When persisting, contracts
+	are saved in one transaction per commit_every documents and their lines
+	are sent after the commit."""
+	loop = asyncio.get_running_loop()
+	pool = get_pool()
+	window = batch_workers() * BATCH_LOOKAHEAD
+	pending = deque()  # (index, document or error, analysis future)
+	ready = []  # (index, document or error, analysis or None), waiting for the next commit
+	session = SessionLocal() if persist else None
+	started = time.perf_counter()
+	totals = {"documents": 0, "errors": 0, "flags": 0, "persisted": 0}
+
+	async def flush():
+		to_save = [(doc, analysis) for _, doc, analysis in ready if analysis is not None]
+		ids = []
+		if to_save:
+			# Load (and so register) the rule packs the pool processes used, before the write
+			for language in {analysis.language for _, analysis in to_save}:
+				active_rulebook(language)
+
+			def _save(session: Session) -> List[int]:
+				saved = []
+				for doc, analysis in to_save:
+					contract = _new_contract(user_id, doc, analysis, title=doc.title or doc.ref or "Untitled")
+					session.add(contract)
+					recognize(session, contract)
+					session.flush()
+					summary.apply_contract(session, user_id, contract.status, analysis.flags)
+					counterparties.add_contract(session, contract, analysis.flags)
+					deadlines.schedule(contract, analysis.flags)
+					saved.append(contract.id)
+				return saved
+			ids = await run_write(session, _save)
+			wake_scheduler()
+			totals["persisted"] += len(ids)
+		saved = iter(ids)
+		lines = [_batch_line(index, doc, analysis, next(saved) if analysis is not None else None) for index, doc, analysis in ready]
+		ready.clear()
+		return lines
+
+	async def finish(index, doc, future):
+		analysis = None
+		if future is not None:
+			try:
+				analysis = await future
+			except Exception as e:
+				print(f"[batch] Analysis of document {index} failed: {e}")
+				doc = f"Analysis failed: {e}"
+				if isinstance(e, BrokenProcessPool):
+					stop_pool()  # the next batch starts a fresh pool
+		totals["documents"] += 1
+		if analysis is None:
+			totals["errors"] += 1
+		else:
+			totals["flags"] += len(analysis.flags)
+		if not persist:
+			return [_batch_line(index, doc, analysis)]
+		ready.append((index, doc, analysis))
+		return await flush() if sum(1 for r in ready if r[2] is not None) >= commit_every else []
+
+	try:
+		for index, doc in enumerate(documents):
+			future = None if isinstance(doc, str) else loop.run_in_executor(pool, analyze_one, doc.text, doc.language)
+			pending.append((index, doc, future))
+			while len(pending) >= window:
+				for line in await finish(*pending.popleft()):
+					yield line
+		while pending:
+			for line in await finish(*pending.popleft()):
+				yield line
+		if ready:
+			for line in await flush():
+				yield line
+		totals["seconds"] = round(time.perf_counter() - started, 3)
+		yield json.dumps({"done": True, **totals}) + "\n"
+	finally:
+		for _, _, future in pending:
+			if future is not None:
+				future.cancel()
+		if session is not None:
+			session.close()
+
+
+def _batch_line(index: int, doc, analysis, contract_id: Optional[int] = None) -> str:
+	if isinstance(doc, str):
+		return schemas.BatchResult(index=index, error=doc).model_dump_json(exclude_unset=True) + "\n"
+	result = schemas.BatchResult(
+		index=index, ref=doc.ref, language=analysis.language, ruleset_version=analysis.ruleset_version, flags=analysis.flags,
+		terms=[models.ContractTerm.from_term(t) for t in analysis.terms],
 	)
-	db.add(contract)
-	db.flush()
-	for flag in flags:
-		db.add(models.ClauseFlag(contract_id=contract.id, **flag))
-	db.commit()
-	db.refresh(contract)
-	return contract
+	if analysis.clause_scores is not None:
+		result.model_confidence = analysis.clause_scores.confidence
+	if contract_id is not None:
+		result.contract_id = contract_id
+	return result.model_dump_json(exclude_unset=True) + "\n"
+
+
+@router.post("/analyze-batch")
+async def analyze_batch(
+	request: Request,
+	persist: bool = False,
+	commit_every: int = Query(100, ge=1, le=1000),
+	user: models.User = Depends(get_current_user),
+):
+	"""Run the rules over many documents in one request.
+
+	The body is JSON ({"documents": [...]} or a bare list) or NDJSON, one
+	document per line. Each document is
+	{"text", "title"?, "ref"?, "counterparty"?, "production"?, "contract_date"?,
+	"language"?}; without a language, each document's is detected.
+	Results stream back as NDJSON: one schemas.BatchResult line per document
+	in input order, then {"done": true, ...} totals. With ?persist=true the
+	documents are also saved as contracts, commit_every per transaction.
+	"""
+	content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+	if content_type in NDJSON_CONTENT_TYPES:
+		documents = await _ndjson_documents(request)
+	else:
+		try:
+			body = await request.json()
+		except ValueError:
+			raise HTTPException(status_code=400, detail="Body must be JSON or NDJSON (Content-Type: application/x-ndjson)")
+		items = body.get("documents") if isinstance(body, dict) else body
+		if not isinstance(items, list):
+			raise HTTPException(status_code=400, detail='Expected {"documents": [...]} or a list of documents')
+		if len(items) > BATCH_MAX_DOCUMENTS:
+			raise HTTPException(status_code=413, detail=f"Too many documents (max {BATCH_MAX_DOCUMENTS} per batch)")
+		documents = [_parse_batch_document(item) for item in items]
+	return StreamingResponse(_stream_batch(documents, user.id, persist, commit_every), media_type="application/x-ndjson")
 
 
 @router.get("/list", response_model=List[schemas.ContractListItem])
 async def list_contracts(
 	q: Optional[str] = None,
-	db: Session = Depends(get_db),
+	expiring_within_days: Optional[int] = Query(None, ge=0),
+	min_payment_days: Optional[int] = Query(None, ge=0),
+	counterparty_id: Optional[int] = None,
+	db: Session = Depends(get_read_db),
 	user: models.User = Depends(get_current_user),
 ):
 	query = db.query(models.Contract).filter(models.Contract.user_id == user.id)
 	if q:
 		like = f"%{q}%"
 		query = query.filter((models.Contract.title.ilike(like)) | (models.Contract.text.ilike(like)))
+	if counterparty_id is not None:
+		query = query.filter(models.Contract.counterparty_id == counterparty_id)
+	# Term filters are index lookups on contract_terms (kind, value, contract_id)
+	if expiring_within_days is not None:
+		today = date.today()
+		query = query.filter(models.Contract.terms.any(
+			(models.ContractTerm.kind == EXPIRY_DATE)
+			& models.ContractTerm.date_value.between(today, today + timedelta(days=expiring_within_days))
+		))
+	if min_payment_days is not None:
+		query = query.filter(models.Contract.terms.any(
+			(models.ContractTerm.kind == PAYMENT_DAYS) & (models.ContractTerm.number_value >= min_payment_days)
+		))
 	query = query.order_by(models.Contract.contract_date.desc().nullslast(), models.Contract.created_at.desc())
 	rows = query.all()
 	return rows
 
 
+@router.get("/summary", response_model=schemas.RiskSummaryRead)
+async def get_risk_summary(db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
+	"""Flag and contract counts per status, category and severity for the current user"""
+	return summary.get_user_summary(db, user.id)
+
+
+@router.get("/deadlines", response_model=List[schemas.ContractDeadlineRead])
+async def list_deadlines(
+	within_days: int = Query(90, ge=0),
+	db: Session = Depends(get_read_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""The user's pending deadlines due in the next within_days days, soonest first"""
+	today = date.today()
+	return (
+		db.query(models.ContractDeadline)
+		.options(joinedload(models.ContractDeadline.contract).load_only(models.Contract.title))
+		.filter(
+			models.ContractDeadline.user_id == user.id,
+			models.ContractDeadline.status == deadlines.PENDING,
+			models.ContractDeadline.due_date.between(today, today + timedelta(days=within_days)),
+		)
+		.order_by(models.ContractDeadline.due_date, models.ContractDeadline.id)
+		.all()
+	)
+
+
 @router.get("/{contract_id}", response_model=schemas.ContractRead)
-async def get_contract(contract_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+async def get_contract(contract_id: int, db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
+	contract = _contract_for_read(db, contract_id, user.id)
 	if not contract:
 		raise HTTPException(status_code=404, detail="Not found")
 	return contract
 
 
-@router.delete("/{contract_id}")
-async def delete_contract(contract_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+@router.get("/{contract_id}/clauses", response_model=List[schemas.ContractClauseRead])
+async def get_contract_clauses(
+	contract_id: int,
+	include_text: bool = False,
+	db: Session = Depends(get_read_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""Clause tree of a contract in document order; offsets index the contract text"""
+	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+	if not contract:
+		raise HTTPException(status_code=404, detail="Not found")
+	# Contracts not yet backfilled are segmented on the fly
+	clauses = contract.clauses or [models.ContractClause.from_clause(c) for c in segment(contract.text)]
+	result = []
+	for clause in clauses:
+		item = schemas.ContractClauseRead.model_validate(clause)
+		if include_text:
+			item.text = contract.text[clause.start_index:clause.end_index]
+		result.append(item)
+	return result
+
+
+@router.get("/{contract_id}/terms", response_model=List[schemas.ContractTermRead])
+async def get_contract_terms(contract_id: int, db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
+	"""Durations, payment days, fees, dates and territory extracted from the contract"""
+	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+	if not contract:
+		raise HTTPException(status_code=404, detail="Not found")
+	if contract.terms:
+		return contract.terms
+	# Contracts not yet backfilled are extracted on the fly
+	clauses = [c.to_clause() for c in contract.clauses] or segment(contract.text)
+	return [models.ContractTerm.from_term(t) for t in extract_terms(contract.text, clauses)]
+
+
+@router.get("/{contract_id}/deadlines", response_model=List[schemas.ContractDeadlineRead])
+async def get_contract_deadlines(contract_id: int, db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
+	"""Every deadline derived from the contract, whatever its status"""
+	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+	if not contract:
+		raise HTTPException(status_code=404, detail="Not found")
+	return contract.deadlines
+
+
+@router.get("/{contract_id}/similar", response_model=List[schemas.SimilarContract])
+async def get_similar_contracts(
+	contract_id: int,
+	min_similarity: float = Query(DUP_THRESHOLD, ge=0.5, le=1.0),
+	db: Session = Depends(get_read_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""The user's other contracts with nearly the same text, most similar first"""
+	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+	if not contract:
+		raise HTTPException(status_code=404, detail="Not found")
+	signature = from_bytes(contract.minhash) if contract.minhash else minhash(contract.text)
+	return [
+		schemas.SimilarContract(id=other.id, title=other.title, created_at=other.created_at, similarity=score)
+		for other, score in find_similar(db, signature, user.id, threshold=min_similarity, exclude_id=contract.id)
+	]
+
+
+@router.get("/{contract_id}/versions", response_model=List[schemas.ContractVersion])
+async def get_contract_versions(contract_id: int, db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
+	"""Every version of the contract, oldest first"""
 	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
 	if not contract:
 		raise HTTPException(status_code=404, detail="Not found")
-	stored_filename = contract.stored_filename
-	# Delete DB record (flags cascade via relationship)
-	db.delete(contract)
-	db.commit()
+	return version_chain(db, contract)
+
+
+@router.get("/{contract_id}/diff", response_model=schemas.ContractDiff)
+async def get_contract_diff(
+	contract_id: int,
+	against: Optional[int] = Query(None, description="Contract to compare with; defaults to the previous version"),
+	db: Session = Depends(get_read_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""Changed text, changed clauses, and the flags resolved, introduced and unchanged since another version"""
+	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+	if not contract:
+		raise HTTPException(status_code=404, detail="Not found")
+	previous_id = against if against is not None else contract.previous_version_id
+	if previous_id is None:
+		raise HTTPException(status_code=400, detail="Contract has no previous version; pass ?against=<contract id>")
+	previous = db.query(models.Contract).filter_by(id=previous_id, user_id=user.id).first()
+	if not previous:
+		raise HTTPException(status_code=404, detail="Not found")
+	spans = diff_spans(previous.text, contract.text)
+	clauses = [c.to_clause() for c in contract.clauses] or segment(contract.text)
+	changes = compare_flags(spans, previous.flags, contract.flags)
+	return schemas.ContractDiff(
+		contract_id=contract.id,
+		previous_id=previous.id,
+		version=contract.version,
+		previous_version=previous.version,
+		changed_chars=changed_size(spans),
+		hunks=[
+			schemas.DiffHunk(
+				tag=tag, old_start=a1, old_end=a2, new_start=b1, new_end=b2,
+				old_text=previous.text[a1:a2], new_text=contract.text[b1:b2],
+			)
+			for tag, a1, a2, b1, b2 in spans if tag != "equal"
+		],
+		changed_clauses=sorted(changed_clauses(spans, clauses)),
+		resolved=changes.resolved,
+		introduced=changes.introduced,
+		unchanged=changes.unchanged,
+	)
+
+
+@router.delete("/{contract_id}")
+async def delete_contract(contract_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+	def _delete(session: Session) -> Optional[str]:
+		contract = session.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+		if not contract:
+			raise HTTPException(status_code=404, detail="Not found")
+		stored_filename = contract.stored_filename
+		# Delete DB record (flags cascade via relationship)
+		summary.apply_contract(session, contract.user_id, contract.status, contract.flags, sign=-1)
+		counterparties.apply_contract(session, contract, contract.flags, sign=-1)
+		# ON DELETE SET NULL, also where SQLite does not enforce foreign keys
+		session.query(models.Contract).filter_by(duplicate_of_id=contract.id).update(
+			{"duplicate_of_id": None, "duplicate_similarity": None}, synchronize_session=False,
+		)
+		session.query(models.Alert).filter_by(contract_id=contract.id).delete(synchronize_session=False)
+		# Later versions skip the deleted one
+		session.query(models.Contract).filter_by(previous_version_id=contract.id).update(
+			{"previous_version_id": contract.previous_version_id}, synchronize_session=False,
+		)
+		session.delete(contract)
+		return stored_filename
+
+	stored_filename = await run_write(db, _delete)
 	# Safely remove uploaded file if it exists and is within the uploads directory
 	try:
 		if stored_filename:
@@ -289,7 +805,7 @@ async def delete_contract(contract_id: int, db: Session = Depends(get_db), user:
 
 
 @router.get("/file/{contract_id}")
-async def get_contract_file(contract_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+async def get_contract_file(contract_id: int, db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
 	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
 	if not contract or not contract.stored_filename:
 		raise HTTPException(status_code=404, detail="File not found")
@@ -315,20 +831,21 @@ async def update_contract_status(
 	db: Session = Depends(get_db), 
 	user: models.User = Depends(get_current_user)
 ):
-	contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
-	if not contract:
-		raise HTTPException(status_code=404, detail="Contract not found")
-	
 	# Validate status
 	valid_statuses = ["hold", "negotiating", "signed"]
 	if status_update.status not in valid_statuses:
 		raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
-	
-	contract.status = status_update.status
-	contract.consent_notes = status_update.consent_notes
-	db.commit()
-	db.refresh(contract)
-	return contract
+
+	def _update(session: Session) -> None:
+		contract = session.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+		if not contract:
+			raise HTTPException(status_code=404, detail="Contract not found")
+		summary.move_contract(session, contract, contract.status, status_update.status)
+		contract.status = status_update.status
+		contract.consent_notes = status_update.consent_notes
+
+	await run_write(db, _update)
+	return _contract_for_read(db, contract_id)
 
 
 @router.post("/{contract_id}/analyze-gpt")
@@ -348,13 +865,18 @@ async def analyze_contract_with_gpt(
 	
 	try:
 		# Perform GPT analysis
-		gpt_analysis = await openai_service.analyze_contract_with_gpt(contract.text, contract.title)
+		clauses = [c.to_clause() for c in contract.clauses] or segment(contract.text)
+		gpt_text = gpt_context(contract.text, clauses, contract.flags)
+		gpt_analysis = await openai_service.analyze_contract_with_gpt(gpt_text, contract.title)
 		
 		if gpt_analysis:
 			# Save to database
-			save_gpt_analysis_to_contract(contract, gpt_analysis)
-			db.commit()
-			db.refresh(contract)
+			def _save(session: Session) -> None:
+				row = session.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
+				if row:
+					save_gpt_analysis_to_contract(row, gpt_analysis)
+
+			await run_write(db, _save)
 			
 			return {
 				"success": True,
@@ -376,7 +898,7 @@ async def analyze_contract_with_gpt(
 @router.get("/{contract_id}/gpt-analysis")
 async def get_gpt_analysis(
 	contract_id: int,
-	db: Session = Depends(get_db),
+	db: Session = Depends(get_read_db),
 	user: models.User = Depends(get_current_user)
 ):
 	"""Get GPT analysis for a contract"""
@@ -407,7 +929,10 @@ async def ask_gpt_question(
 	if contract_id:
 		contract = db.query(models.Contract).filter_by(id=contract_id, user_id=user.id).first()
 		if contract:
-			contract_context = f"Contract: {contract.title}\nText: {contract.text[:2000]}..."
+			# The clauses most relevant to the question rather than the first page
+			clauses = [c.to_clause() for c in contract.clauses] or segment(contract.text)
+			excerpt = select_context(contract.text, clauses, question_scores(contract.text, clauses, question), ASK_CONTEXT_CHARS)
+			contract_context = f"Contract: {contract.title}\nText: {excerpt}"
 	
 	try:
 		advice = await openai_service.get_contract_advice(question, contract_context)
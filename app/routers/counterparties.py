@@ -0,0 +1,62 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from ..database import get_db, get_read_db, run_write
+from .. import counterparties, models, schemas
+from ..auth import get_current_user
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[schemas.CounterpartyListItem])
+async def list_counterparties(
+	q: Optional[str] = None,
+	db: Session = Depends(get_read_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""The user's counterparties, most contracts first; q matches the start of any alias"""
+	query = db.query(models.Counterparty).filter(models.Counterparty.user_id == user.id)
+	key = counterparties.normalize_name(q) if q else None
+	if key:
+		# Range on the (user_id, normalized_name) primary key
+		matching = db.query(models.CounterpartyAlias.counterparty_id).filter(
+			models.CounterpartyAlias.user_id == user.id,
+			models.CounterpartyAlias.normalized_name >= key,
+			models.CounterpartyAlias.normalized_name < key + "\uffff",
+		)
+		query = query.filter(models.Counterparty.id.in_(matching))
+	return query.order_by(models.Counterparty.contract_count.desc(), models.Counterparty.name).all()
+
+
+@router.get("/{counterparty_id}/profile", response_model=schemas.CounterpartyProfile)
+async def get_counterparty_profile(counterparty_id: int, db: Session = Depends(get_read_db), user: models.User = Depends(get_current_user)):
+	"""What the counterparty's contracts usually contain, from the precomputed profile"""
+	counterparty = db.query(models.Counterparty).filter_by(id=counterparty_id, user_id=user.id).first()
+	if not counterparty:
+		raise HTTPException(status_code=404, detail="Not found")
+	return counterparties.profile(counterparty)
+
+
+@router.post("/{counterparty_id}/aliases", response_model=schemas.CounterpartyProfile)
+async def add_counterparty_alias(
+	counterparty_id: int,
+	payload: schemas.CounterpartyAliasCreate,
+	db: Session = Depends(get_db),
+	user: models.User = Depends(get_current_user),
+):
+	"""Add another spelling of the counterparty's name. A counterparty already
+	known by that name is merged into this one."""
+	def _add(session: Session) -> None:
+		counterparty = session.query(models.Counterparty).filter_by(id=counterparty_id, user_id=user.id).first()
+		if not counterparty:
+			raise HTTPException(status_code=404, detail="Not found")
+		try:
+			merged = counterparties.add_alias(session, counterparty, payload.name)
+		except ValueError as e:
+			raise HTTPException(status_code=400, detail=str(e))
+		if merged is not None:
+			print(f"[counterparties] Merged counterparty {merged.id} into {counterparty.id}")
+
+	await run_write(db, _add)
+	db.expire_all()
+	return counterparties.profile(db.query(models.Counterparty).filter_by(id=counterparty_id).first())
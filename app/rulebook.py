@@ -0,0 +1,336 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from .fuzzy import FuzzyPhrase, compile_phrase
+from .normalize import NORMALIZER_VERSION
+from .rulecheck import check_pattern
+
+RULEBOOK_PATH = os.environ.get("CG_RULEBOOK", os.path.join(os.path.dirname(__file__), "rules", "rulebook.json"))
+# Language of RULEBOOK_PATH; other languages' packs sit next to it as rulebook.<code>.json
+DEFAULT_LANGUAGE = "en"
+# How often analyses stat() the rulebook for changes; 0 disables hot reload
+RULEBOOK_CHECK_SECONDS = float(os.environ.get("CG_RULEBOOK_CHECK_SECONDS", "2"))
+# Time each new pattern on adversarial inputs before accepting it (see app.rulecheck)
+RULE_FUZZ = os.environ.get("CG_RULE_FUZZ", "1") not in ("0", "false", "False")
+
+SEVERITIES = ("high", "medium", "low")
+_REGEX_FLAGS = {"IGNORECASE": re.IGNORECASE, "MULTILINE": re.MULTILINE, "DOTALL": re.DOTALL}
+
+# Text the per-rule match cost is measured on when a rulebook is compiled
+_CALIBRATION_TEXT = (
+	"1. Grant of Rights. The Artist hereby grants to the Producer the exclusive right to use the Artist's name, "
+	"voice and likeness in connection with the Production and its advertising, throughout the world.\n"
+	"2. Compensation. Producer shall pay the Artist the fee set out in Schedule A within thirty days of invoice. "
+	"Expenses are reimbursed only if approved in writing beforehand.\n"
+	"3. Term. This agreement starts on the date signed and ends twelve months later unless renewed in writing.\n"
+	"4. Governing Law. Disputes shall first be discussed in good faith between the parties.\n\n"
+) * 60
+
+
+@dataclass
+class Rule:
+	id: str
+	category: str
+	severity: str
+	pattern: re.Pattern
+	explanation: str
+	guidance: str
+	fuzzy: Tuple[FuzzyPhrase, ...] = ()  # key phrases also matched approximately in OCR text
+
+	@property
+	def version(self) -> str:
+		"""Content hash; changes whenever anything that affects this rule's flags changes."""
+		h = hashlib.sha256()
+		for part in (NORMALIZER_VERSION, self.category, self.severity, self.pattern.pattern, str(self.pattern.flags), self.explanation, self.guidance):
+			h.update(part.encode("utf-8"))
+			h.update(b"\0")
+		# Only rules with fuzzy phrases hash them, so the others keep their versions
+		for phrase in self.fuzzy:
+			h.update(f"~{phrase.phrase}/{phrase.max_errors}\0".encode("utf-8"))
+		return h.hexdigest()[:12]
+
+
+def ruleset_fingerprint(ruleset: Dict[str, str]) -> str:
+	h = hashlib.sha256()
+	for rule_id in sorted(ruleset):
+		h.update(f"{rule_id}={ruleset[rule_id]}\0".encode("utf-8"))
+	return h.hexdigest()[:16]
+
+
+@dataclass
+class CompiledRulebook:
+	"""A rulebook file compiled into Rules. Immutable once built: reloading
+	swaps in a new instance, so analyses already holding one finish with it."""
+	rules: List[Rule]
+	content_hash: str
+	version: Optional[object]  # the rulebook's own "version" field
+	ruleset: Dict[str, str]  # rule id -> rule version
+	fingerprint: str
+	compile_ms: float
+	rule_cost_ms: Dict[str, float] = field(default_factory=dict)  # per 100 KB of calibration text
+	language: str = DEFAULT_LANGUAGE
+
+	def report(self) -> dict:
+		return {
+			"language": self.language,
+			"version": self.version,
+			"content_hash": self.content_hash,
+			"fingerprint": self.fingerprint,
+			"rules": len(self.rules),
+			"compile_ms": round(self.compile_ms, 2),
+			"rule_cost_ms_per_100kb": {rule_id: round(ms, 3) for rule_id, ms in self.rule_cost_ms.items()},
+		}
+
+
+def _measure(rules: List[Rule]) -> Dict[str, float]:
+	per_100kb = 100_000 / len(_CALIBRATION_TEXT)
+	costs = {}
+	for rule in rules:
+		start = time.perf_counter()
+		for _ in rule.pattern.finditer(_CALIBRATION_TEXT):
+			pass
+		costs[rule.id] = (time.perf_counter() - start) * 1000 * per_100kb
+	return costs
+
+
+def compile_rulebook(data: bytes, language: str = DEFAULT_LANGUAGE) -> CompiledRulebook:
+	"""Validate and compile rulebook JSON. Raises ValueError describing the first problem."""
+	start = time.perf_counter()
+	try:
+		book = json.loads(data)
+	except json.JSONDecodeError as e:
+		raise ValueError(f"Rulebook is not valid JSON: {e}")
+	if not isinstance(book, dict) or not isinstance(book.get("rules"), list):
+		raise ValueError("Rulebook must be an object with a 'rules' list")
+
+	rules = []
+	seen = set()
+	for i, entry in enumerate(book["rules"]):
+		where = f"rule {entry.get('id', i)!r}" if isinstance(entry, dict) else f"rule {i}"
+		if not isinstance(entry, dict):
+			raise ValueError(f"{where}: must be an object")
+		missing = [k for k in ("id", "category", "severity", "patterns", "explanation", "guidance") if not entry.get(k)]
+		if missing:
+			raise ValueError(f"{where}: missing {', '.join(missing)}")
+		if entry["id"] in seen:
+			raise ValueError(f"{where}: duplicate id")
+		seen.add(entry["id"])
+		if entry["severity"] not in SEVERITIES:
+			raise ValueError(f"{where}: severity must be one of {', '.join(SEVERITIES)}")
+		patterns = entry["patterns"]
+		if isinstance(patterns, str):
+			patterns = [patterns]
+		flags = 0
+		for name in entry.get("flags", []):
+			if name not in _REGEX_FLAGS:
+				raise ValueError(f"{where}: unknown flag {name!r}")
+			flags |= _REGEX_FLAGS[name]
+		source = patterns[0] if len(patterns) == 1 else "(" + "|".join(patterns) + ")"
+		try:
+			pattern = re.compile(source, flags)
+		except re.error as e:
+			raise ValueError(f"{where}: bad pattern: {e}")
+		problem = check_pattern(pattern, fuzz=RULE_FUZZ)
+		if problem:
+			raise ValueError(f"{where}: pattern rejected, {problem}")
+		phrases = entry.get("fuzzy", [])
+		if not isinstance(phrases, list) or not all(isinstance(p, str) for p in phrases):
+			raise ValueError(f"{where}: fuzzy must be a list of phrases")
+		try:
+			fuzzy = tuple(compile_phrase(p, sample=_CALIBRATION_TEXT) for p in phrases)
+		except ValueError as e:
+			raise ValueError(f"{where}: {e}")
+		rules.append(Rule(entry["id"], entry["category"], entry["severity"], pattern, entry["explanation"], entry["guidance"], fuzzy))
+
+	ruleset = {rule.id: rule.version for rule in rules}
+	compile_ms = (time.perf_counter() - start) * 1000
+	return CompiledRulebook(
+		rules=rules,
+		content_hash=hashlib.sha256(data).hexdigest()[:16],
+		version=book.get("version"),
+		ruleset=ruleset,
+		fingerprint=ruleset_fingerprint(ruleset),
+		compile_ms=compile_ms,
+		rule_cost_ms=_measure(rules),
+		language=language,
+	)
+
+
+def _print_report(book: CompiledRulebook, path: str) -> None:
+	print(f"[rules] Loaded {book.language} rulebook {path} version {book.version} ({len(book.rules)} rules, ruleset {book.fingerprint}), compiled in {book.compile_ms:.1f} ms")
+	for rule_id, ms in sorted(book.rule_cost_ms.items(), key=lambda item: -item[1]):
+		print(f"[rules]   {rule_id:<32} {ms:8.3f} ms/100KB")
+
+
+class RulebookLoader:
+	"""Keeps the active compiled rulebook of one language in this process.
+
+	Compiled rulebooks are cached by content hash, so touching the file or
+	reverting to an earlier version does not recompile. A reload that fails
+	validation keeps the previous rulebook active.
+
+	Compiling takes a second or more (the fuzz check and cost measurement), so
+	a changed file is compiled in a background thread while analyses keep the
+	previous rulebook, which is swapped for the new one when it is ready. Only
+	the first load of a language compiles in the caller (see load_packs).
+	"""
+
+	def __init__(self, path: str = RULEBOOK_PATH, check_seconds: float = RULEBOOK_CHECK_SECONDS, language: str = DEFAULT_LANGUAGE):
+		self.path = path
+		self.language = language
+		self.check_seconds = check_seconds
+		self._cache: Dict[str, CompiledRulebook] = {}
+		self._active: Optional[CompiledRulebook] = None
+		self._mtime: Optional[float] = None
+		self._next_check = 0.0
+		self._lock = threading.Lock()
+		self._reloading: Optional[threading.Thread] = None
+		self._reloading_lock = threading.Lock()  # not _lock, which is held while compiling
+		self._listeners: List[Callable[[CompiledRulebook], None]] = []
+
+	def add_listener(self, fn: Callable[[CompiledRulebook], None]) -> None:
+		"""Call fn(rulebook) whenever a different rulebook becomes active, the first one included."""
+		self._listeners.append(fn)
+
+	def pin(self) -> None:
+		"""Stop watching the file (e.g. for a backfill that must not change rules midway)."""
+		self.check_seconds = 0
+
+	def active(self) -> CompiledRulebook:
+		book = self._active
+		if book is None:
+			return self.reload()
+		if self.check_seconds > 0 and time.monotonic() >= self._next_check:
+			self._next_check = time.monotonic() + self.check_seconds
+			try:
+				mtime = os.stat(self.path).st_mtime
+			except OSError:
+				return book
+			if mtime != self._mtime:
+				self.reload_in_background()
+		return book
+
+	def reload_in_background(self) -> threading.Thread:
+		"""Start reload() in a thread, unless one is running; the thread doing it."""
+		with self._reloading_lock:
+			thread = self._reloading
+			if thread is None or not thread.is_alive():
+				thread = self._reloading = threading.Thread(target=self._reload_quietly, name=f"rulebook-{self.language}", daemon=True)
+				thread.start()
+		return thread
+
+	def _reload_quietly(self) -> None:
+		try:
+			self.reload()
+		except (OSError, ValueError) as e:
+			print(f"[rules] Keeping ruleset {self._active.fingerprint}: {e}")
+
+	def reload(self) -> CompiledRulebook:
+		"""Read the rulebook file and make it active (compiling unless cached)."""
+		with self._lock:
+			with open(self.path, "rb") as f:
+				data = f.read()
+			self._mtime = os.stat(self.path).st_mtime
+			key = hashlib.sha256(data).hexdigest()[:16]
+			book = self._cache.get(key)
+			if book is None:
+				try:
+					book = compile_rulebook(data, self.language)
+				except ValueError as e:
+					raise ValueError(f"{self.path}: {e}") from None
+				self._cache[key] = book
+				_print_report(book, self.path)
+			previous, self._active = self._active, book
+		if previous is None or previous.fingerprint != book.fingerprint:
+			for fn in self._listeners + _listeners:
+				try:
+					fn(book)
+				except Exception as e:
+					print(f"[rules] Reload listener failed: {e}")
+		return book
+
+
+def rulebook_path(language: str) -> str:
+	if language == DEFAULT_LANGUAGE:
+		return RULEBOOK_PATH
+	root, ext = os.path.splitext(RULEBOOK_PATH)
+	return f"{root}.{language}{ext}"
+
+
+def pack_languages() -> List[str]:
+	"""Languages with a rulebook: the default one and every rulebook.<code>.json next to it."""
+	root, ext = os.path.splitext(os.path.basename(RULEBOOK_PATH))
+	found = {DEFAULT_LANGUAGE}
+	for name in os.listdir(os.path.dirname(RULEBOOK_PATH) or "."):
+		parts = name.split(".")
+		if len(parts) == 3 and parts[0] == root and "." + parts[2] == ext:
+			found.add(parts[1])
+	return sorted(found)
+
+
+def rules_language(language: Optional[str]) -> str:
+	"""The language whose rules apply to text in language: its own when it has a pack, else the default."""
+	if not language or language == DEFAULT_LANGUAGE:
+		return DEFAULT_LANGUAGE
+	return language if os.path.isfile(rulebook_path(language)) else DEFAULT_LANGUAGE
+
+
+# One loader per language, created on first use: a worker only compiles the packs its contracts need
+_loaders: Dict[str, RulebookLoader] = {DEFAULT_LANGUAGE: RulebookLoader()}
+_loaders_lock = threading.Lock()
+_listeners: List[Callable[[CompiledRulebook], None]] = []
+_pinned = False
+
+
+def add_listener(fn: Callable[[CompiledRulebook], None]) -> None:
+	"""Call fn(rulebook) whenever a rulebook of any language, loaded now or later, becomes active."""
+	_listeners.append(fn)
+
+
+def get_loader(language: Optional[str] = None) -> RulebookLoader:
+	language = rules_language(language)
+	loader = _loaders.get(language)
+	if loader is None:
+		with _loaders_lock:
+			loader = _loaders.get(language)
+			if loader is None:
+				loader = _loaders[language] = RulebookLoader(rulebook_path(language), language=language)
+				if _pinned:
+					loader.pin()
+	return loader
+
+
+def pin_all() -> None:
+	"""Stop watching every language's rulebook, including those loaded later
+	(and in processes forked afterwards)."""
+	global _pinned
+	with _loaders_lock:
+		_pinned = True
+		for loader in _loaders.values():
+			loader.pin()
+
+
+def loaded_languages() -> List[str]:
+	return sorted(language for language, loader in _loaders.items() if loader._active is not None)
+
+
+def load_packs() -> None:
+	"""Compile every language's rulebook now (at startup), so no request compiles
+	one on first use. A broken default rulebook raises; a broken pack is
+	reported and left to fail on first use."""
+	get_loader(DEFAULT_LANGUAGE).active()
+	for language in pack_languages():
+		if language != DEFAULT_LANGUAGE:
+			try:
+				get_loader(language).active()
+			except (OSError, ValueError) as e:
+				print(f"[rules] {language} rulebook not loaded: {e}")
+
+
+def active_rulebook(language: Optional[str] = None) -> CompiledRulebook:
+	return get_loader(language).active()
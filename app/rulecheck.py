@@ -0,0 +1,156 @@
+"""Checks that reject rule patterns prone to catastrophic backtracking.
+
+Python's re is a backtracking engine and a running match cannot be
+interrupted, so a bad pattern has to be caught before it is activated:
+
+- statically, nested unbounded quantifiers such as (a+)+ or (\\s*\\w+)*;
+- empirically, by timing the pattern on growing synthetic inputs built from
+  its own literals and whitespace and rejecting super-linear growth.
+"""
+import math
+import random
+import re
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .normalize import normalize
+
+try:
+	from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+	import sre_parse
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+# Fuzz inputs grow through these sizes (fine steps first, so an exponential
+# pattern is caught after a few chars instead of hanging the check)
+FUZZ_SIZES = (4, 8, 12, 16, 20, 24, 32, 48, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# Time grows like size ** exponent; linear patterns have ~1, (\s+\s+)-like ones 2
+MAX_GROWTH_EXPONENT = 1.5
+# Timings below this are noise whatever their ratio; above STOP the input stops growing
+MIN_SIGNIFICANT_SECONDS = 0.005
+STOP_SECONDS = 0.05
+
+
+def _children(op, av) -> Iterator[list]:
+	if op in _REPEATS:
+		yield av[2]
+	elif op == sre_parse.SUBPATTERN:
+		yield av[3]
+	elif op == sre_parse.BRANCH:
+		yield from av[1]
+	elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+		yield av[1]
+
+
+def _has_repeat(items) -> bool:
+	for op, av in items:
+		if op in _REPEATS and av[1] > 1:
+			return True
+		if any(_has_repeat(child) for child in _children(op, av)):
+			return True
+	return False
+
+
+def _nested_quantifier(items) -> bool:
+	for op, av in items:
+		if op in _REPEATS and av[1] == sre_parse.MAXREPEAT and _has_repeat(av[2]):
+			return True
+		if any(_nested_quantifier(child) for child in _children(op, av)):
+			return True
+	return False
+
+
+def _literal_words(items, out: List[str], current: List[str]) -> None:
+	"""Runs of literal characters in the pattern ("owns", "all", "rights")."""
+	for op, av in items:
+		if op == sre_parse.LITERAL:
+			current.append(chr(av))
+			continue
+		if current:
+			out.append("".join(current))
+			current.clear()
+		for child in _children(op, av):
+			_literal_words(child, out, current)
+			if current:
+				out.append("".join(current))
+				current.clear()
+
+
+def static_problem(pattern: re.Pattern) -> Optional[str]:
+	if _nested_quantifier(sre_parse.parse(pattern.pattern, pattern.flags)):
+		return "nested unbounded quantifier"
+	return None
+
+
+def _fuzz_generators(pattern: re.Pattern) -> List[Callable[[int], str]]:
+	words: List[str] = []
+	_literal_words(sre_parse.parse(pattern.pattern, pattern.flags), words, [])
+	words = [w for w in words if w.strip()] or ["a"]
+	alphabet = "".join(sorted(set("".join(words)))) + " \t\n"
+	in_order = "".join(f"{w}   " for w in words)
+	# every word but the last, so the match keeps failing at the end
+	all_but_last = "".join(f"{w} " for w in words[:-1]) or words[0]
+
+	def repeat(unit: str) -> Callable[[int], str]:
+		return lambda size: (unit * (size // len(unit) + 1))[:size]
+
+	generators = [repeat(" "), repeat(" \n"), repeat(in_order), repeat(all_but_last)]
+	generators.append(lambda size: "".join(random.Random(size).choices(alphabet, k=size)))
+	generators.extend(repeat(c) for c in sorted({w[0].lower() for w in words}))
+	return generators
+
+
+def _time(pattern: re.Pattern, text: str, runs: int = 2) -> float:
+	"""Best of runs timings (stops early once a run is significant)."""
+	best = None
+	for _ in range(runs):
+		start = time.perf_counter()
+		for _ in pattern.finditer(text):
+			pass
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+		if elapsed >= STOP_SECONDS:
+			break
+	return best
+
+
+def _exponent(small: Tuple[int, float], large: Tuple[int, float]) -> float:
+	return math.log(large[1] / max(small[1], 1e-7)) / math.log(large[0] / small[0])
+
+
+def fuzz_problem(pattern: re.Pattern) -> Optional[str]:
+	for generate in _fuzz_generators(pattern):
+		history = []
+		for size in FUZZ_SIZES:
+			# Rules only ever see normalized text (e.g. no whitespace runs)
+			text = normalize(generate(size)).text
+			elapsed = _time(pattern, text)
+			if history and elapsed >= MIN_SIGNIFICANT_SECONDS:
+				# compare with an input ~4x smaller: less sensitive to timing noise
+				ref_size, ref_elapsed, ref_text = next((h for h in reversed(history) if h[0] * 4 <= size), history[0])
+				if _exponent((ref_size, ref_elapsed), (size, elapsed)) > MAX_GROWTH_EXPONENT:
+					# a scheduling hiccup looks the same; only a repeatable slowdown counts
+					confirmed = (size, _time(pattern, text, runs=5))
+					exponent = _exponent((ref_size, _time(pattern, ref_text, runs=5)), confirmed)
+					if exponent > MAX_GROWTH_EXPONENT:
+						return f"runtime grows super-linearly (~size^{exponent:.1f}, {confirmed[1] * 1000:.0f} ms at {size} chars)"
+			if elapsed >= STOP_SECONDS:
+				break
+			history.append((size, elapsed, text))
+	return None
+
+
+_checked: Dict[Tuple[str, int], Optional[str]] = {}
+
+
+def check_pattern(pattern: re.Pattern, fuzz: bool = True) -> Optional[str]:
+	"""Why the pattern is unsafe to run on untrusted text, or None. Results are
+	cached per pattern, so reloading a rulebook only re-checks edited rules."""
+	key = (pattern.pattern, pattern.flags)
+	if key not in _checked:
+		problem = static_problem(pattern)
+		if problem is None and not fuzz:
+			return None
+		_checked[key] = problem or fuzz_problem(pattern)
+	return _checked[key]
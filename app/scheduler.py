@@ -0,0 +1,232 @@
+"""Fires contract deadlines (see app.deadlines) when their reminders come due.
+
+Every server worker runs one DeadlineScheduler task. It keeps a min-heap of
+the next HEAP_SIZE pending reminders, refilled by one query on the
+(status, remind_at) index, and sleeps until the earliest of them, for at
+most CG_SCHEDULER_POLL_SECONDS; ingesting a contract wakes it early. Nothing
+scans the deadlines table.
+
+Workers share the table through leases: a worker claims a deadline with one
+conditional UPDATE (pending, due, lease free or expired), delivers it and
+then marks it fired. The UPDATE is atomic, so exactly one worker claims each
+deadline. A worker that dies mid-delivery leaves the lease to expire after
+CG_SCHEDULER_LEASE_SECONDS, and another one fires it again: external
+notifications are delivered at least once, while the in-app alert is written
+with the fired status, once. Failed deliveries are retried with exponential
+backoff, up to MAX_ATTEMPTS.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import asyncio
+import heapq
+import os
+import socket
+import uuid
+
+from sqlalchemy import or_
+
+from . import models
+from .database import SessionLocal, run_write
+from .deadlines import FAILED, FIRED, PENDING, describe
+from .notifiers import INAPP, NOTIFIERS, external_notifiers
+
+SCHEDULER_ENABLED = os.environ.get("CG_SCHEDULER", "1") in ("1", "true", "True")
+POLL_SECONDS = float(os.environ.get("CG_SCHEDULER_POLL_SECONDS", "60"))
+LEASE_SECONDS = float(os.environ.get("CG_SCHEDULER_LEASE_SECONDS", "300"))
+HEAP_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 60  # doubled after each failed attempt
+
+
+class DeadlineScheduler:
+	def __init__(self, session_factory=None, notifiers: Optional[List] = None, inapp: Optional[bool] = None):
+		self.session_factory = session_factory or SessionLocal
+		self.notifiers = external_notifiers() if notifiers is None else notifiers
+		self.inapp = INAPP in NOTIFIERS if inapp is None else inapp
+		self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:64]
+		self._heap: List[Tuple[datetime, int]] = []
+		self._wake: Optional[asyncio.Event] = None
+		self._task: Optional[asyncio.Task] = None
+		self.fired = 0
+
+	def start(self) -> None:
+		if self._task is None:
+			self._wake = asyncio.Event()
+			self._task = asyncio.get_running_loop().create_task(self._run())
+
+	async def stop(self) -> None:
+		task, self._task = self._task, None
+		if task is not None:
+			task.cancel()
+			try:
+				await task
+			except asyncio.CancelledError:
+				pass
+
+	def wake(self) -> None:
+		"""Re-read the next deadlines now, e.g. after new ones were stored."""
+		if self._wake is not None:
+			self._wake.set()
+
+	async def _run(self) -> None:
+		while True:
+			try:
+				await self.run_due()
+			except Exception as e:
+				print(f"[scheduler] Firing deadlines failed: {e}")
+			delay = POLL_SECONDS
+			if self._heap:
+				delay = min(delay, max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds()))
+			try:
+				await asyncio.wait_for(self._wake.wait(), timeout=delay)
+			except asyncio.TimeoutError:
+				pass
+			self._wake.clear()
+
+	def _refill(self) -> None:
+		now = datetime.utcnow()
+		db = self.session_factory()
+		try:
+			rows = (
+				db.query(models.ContractDeadline.remind_at, models.ContractDeadline.id)
+				.filter(
+					models.ContractDeadline.status == PENDING,
+					or_(models.ContractDeadline.lease_until.is_(None), models.ContractDeadline.lease_until < now),
+				)
+				.order_by(models.ContractDeadline.remind_at, models.ContractDeadline.id)
+				.limit(HEAP_SIZE)
+				.all()
+			)
+		finally:
+			db.close()
+		self._heap = [(remind_at, deadline_id) for remind_at, deadline_id in rows]
+		heapq.heapify(self._heap)
+
+	async def run_due(self) -> int:
+		"""Fire every deadline due now; returns how many fired."""
+		fired = 0
+		while True:
+			self._refill()
+			now = datetime.utcnow()
+			due = []
+			while self._heap and self._heap[0][0] <= now:
+				due.append(heapq.heappop(self._heap)[1])
+			if not due:
+				return fired
+			done = 0
+			for deadline_id in due:
+				done += await self.fire(deadline_id)
+			fired += done
+			# Claimed elsewhere or failing: leave them to the next poll
+			if not done:
+				return fired
+
+	async def _write(self, fn):
+		db = self.session_factory()
+		try:
+			return await run_write(db, fn)
+		finally:
+			db.close()
+
+	async def fire(self, deadline_id: int) -> bool:
+		now = datetime.utcnow()
+		claimed = await self._write(lambda db: self._claim(db, deadline_id, now))
+		if not claimed:
+			return False
+		event = self._event(deadline_id)
+		if event is None:
+			return False
+		try:
+			for notifier in self.notifiers:
+				await notifier.send(event)
+		except Exception as e:
+			print(f"[scheduler] Deadline {deadline_id}: {type(e).__name__}: {e}")
+			await self._write(lambda db: self._fail(db, deadline_id, f"{type(e).__name__}: {e}"))
+			return False
+		fired = await self._write(lambda db: self._complete(db, event))
+		self.fired += fired
+		return fired
+
+	def _claim(self, db, deadline_id: int, now: datetime) -> bool:
+		claimed = (
+			db.query(models.ContractDeadline)
+			.filter(
+				models.ContractDeadline.id == deadline_id,
+				models.ContractDeadline.status == PENDING,
+				models.ContractDeadline.remind_at <= now,
+				or_(models.ContractDeadline.lease_until.is_(None), models.ContractDeadline.lease_until < now),
+			)
+			.update({"lease_owner": self.owner, "lease_until": now + timedelta(seconds=LEASE_SECONDS)}, synchronize_session=False)
+		)
+		return claimed == 1
+
+	def _event(self, deadline_id: int) -> Optional[dict]:
+		db = self.session_factory()
+		try:
+			deadline = db.get(models.ContractDeadline, deadline_id)
+			if deadline is None:
+				return None
+			contract = deadline.contract
+			return {
+				"deadline_id": deadline.id,
+				"kind": deadline.kind,
+				"due_date": deadline.due_date.isoformat(),
+				"contract_id": contract.id,
+				"contract_title": contract.title,
+				"user_id": deadline.user_id,
+				"email": contract.user.email if contract.user is not None else None,
+				"message": describe(deadline.kind, deadline.due_date, contract.title),
+			}
+		finally:
+			db.close()
+
+	def _complete(self, db, event: dict) -> bool:
+		fired = (
+			db.query(models.ContractDeadline)
+			.filter_by(id=event["deadline_id"], status=PENDING, lease_owner=self.owner)
+			.update({"status": FIRED, "fired_at": datetime.utcnow(), "lease_owner": None, "lease_until": None}, synchronize_session=False)
+		)
+		if fired != 1:
+			# The lease expired and another worker took over
+			return False
+		if self.inapp and event["user_id"] is not None:
+			db.add(models.Alert(
+				user_id=event["user_id"], contract_id=event["contract_id"], deadline_id=event["deadline_id"],
+				kind=event["kind"], message=event["message"],
+			))
+		return True
+
+	def _fail(self, db, deadline_id: int, error: str) -> None:
+		deadline = db.get(models.ContractDeadline, deadline_id)
+		if deadline is None or deadline.lease_owner != self.owner:
+			return
+		deadline.attempts = (deadline.attempts or 0) + 1
+		deadline.last_error = error[:1000]
+		deadline.lease_owner = deadline.lease_until = None
+		if deadline.attempts >= MAX_ATTEMPTS:
+			deadline.status = FAILED
+		else:
+			deadline.remind_at = datetime.utcnow() + timedelta(seconds=RETRY_SECONDS * 2 ** (deadline.attempts - 1))
+
+
+_scheduler: Optional[DeadlineScheduler] = None
+
+
+def start_scheduler() -> None:
+	"""Start this worker's scheduler on the running event loop (unless CG_SCHEDULER=0)."""
+	global _scheduler
+	if SCHEDULER_ENABLED and _scheduler is None:
+		_scheduler = DeadlineScheduler()
+		_scheduler.start()
+
+
+async def stop_scheduler() -> None:
+	global _scheduler
+	scheduler, _scheduler = _scheduler, None
+	if scheduler is not None:
+		await scheduler.stop()
+
+
+def wake_scheduler() -> None:
+	if _scheduler is not None:
+		_scheduler.wake()
@@ -1,17 +1,29 @@
 from datetime import date, datetime
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
 
 class ClauseFlagBase(BaseModel):
+	rule_id: Optional[str] = None
+	rule_ids: List[str] = []  # all rules merged into this flag
 	category: str
 	severity: str
 	start_index: Optional[int] = None
 	end_index: Optional[int] = None
+	clause_ordinal: Optional[int] = None
+	confidence: Optional[float] = None  # below 1 when matched approximately in OCR text
 	excerpt: Optional[str] = None
 	explanation: str
 	guidance: str
 
+	@field_validator("rule_ids", mode="before")
+	@classmethod
+	def _split_rule_ids(cls, value):
+		# Stored comma-separated; flags from before merging have none
+		if value is None:
+			return []
+		return value.split(",") if isinstance(value, str) else value
+
 
 class ClauseFlagRead(ClauseFlagBase):
 	id: int
@@ -20,16 +32,171 @@ class ClauseFlagRead(ClauseFlagBase):
 		from_attributes = True
 
 
+class ContractClauseRead(BaseModel):
+	ordinal: int
+	parent_ordinal: Optional[int] = None
+	kind: str
+	depth: int
+	number: Optional[str] = None
+	heading: Optional[str] = None
+	start_index: int
+	end_index: int
+	risk_category: Optional[str] = None  # clause classifier's category, when it has a model
+	risk_score: Optional[float] = None
+	standard_clause_id: Optional[int] = None  # library clause it matches, with its curated guidance
+	standard_distance: Optional[int] = None  # 0 for identical wording
+	standard_title: Optional[str] = None
+	standard_guidance: Optional[str] = None
+	standard_commentary: Optional[str] = None
+	text: Optional[str] = None  # only with ?include_text=true
+
+	class Config:
+		from_attributes = True
+
+
+class ContractTermRead(BaseModel):
+	kind: str
+	value_text: str
+	number_value: Optional[float] = None
+	unit: Optional[str] = None
+	date_value: Optional[date] = None
+	start_index: Optional[int] = None
+	end_index: Optional[int] = None
+	clause_ordinal: Optional[int] = None
+
+	class Config:
+		from_attributes = True
+
+
+class ContractDeadlineRead(BaseModel):
+	id: int
+	contract_id: int
+	contract_title: str
+	kind: str  # expiry, renewal_notice, exclusivity_end
+	due_date: date
+	remind_at: datetime
+	status: str  # pending, fired, failed, dismissed
+	fired_at: Optional[datetime] = None
+	start_index: Optional[int] = None
+	end_index: Optional[int] = None
+
+	class Config:
+		from_attributes = True
+
+
+class AlertRead(BaseModel):
+	id: int
+	contract_id: Optional[int] = None
+	kind: str
+	message: str
+	created_at: datetime
+	read_at: Optional[datetime] = None
+
+	class Config:
+		from_attributes = True
+
+
+class SimilarContract(BaseModel):
+	id: int
+	title: str
+	created_at: datetime
+	similarity: float  # estimated share of identical word 3-grams
+
+
+class ContractVersion(BaseModel):
+	id: int
+	title: str
+	version: int
+	status: Optional[str] = None
+	created_at: datetime
+
+	class Config:
+		from_attributes = True
+
+
+class DiffHunk(BaseModel):
+	tag: str  # replace, delete or insert
+	old_start: int
+	old_end: int
+	new_start: int
+	new_end: int
+	old_text: str
+	new_text: str
+
+
+class ContractDiff(BaseModel):
+	"""What changed from previous_id to contract_id. Resolved flags are the
+	previous version's, introduced and unchanged ones the contract's."""
+	contract_id: int
+	previous_id: int
+	version: int
+	previous_version: int
+	changed_chars: int  # removed plus added
+	hunks: List[DiffHunk] = []
+	changed_clauses: List[int] = []  # ordinals in the contract's clause tree
+	resolved: List[ClauseFlagRead] = []
+	introduced: List[ClauseFlagRead] = []
+	unchanged: List[ClauseFlagRead] = []
+
+
+class StandardClauseCreate(BaseModel):
+	title: str
+	text: str
+	guidance: str
+	category: Optional[str] = None
+	severity: Optional[str] = None
+	commentary: Optional[str] = None  # generated with GPT later when left out
+
+
+class StandardClauseRead(BaseModel):
+	id: int
+	title: str
+	text: str
+	guidance: str
+	category: Optional[str] = None
+	severity: Optional[str] = None
+	commentary: Optional[str] = None
+	commentary_date: Optional[datetime] = None
+	created_at: datetime
+
+	class Config:
+		from_attributes = True
+
+
 class ContractBase(BaseModel):
 	title: str
 	counterparty: Optional[str] = None
 	production: Optional[str] = None
 	contract_date: Optional[date] = None
+	language: Optional[str] = None  # ISO 639-1 code; detected from the text when not given
 
 
 class ContractCreate(ContractBase):
 	text: str
 	stored_filename: Optional[str] = None
+	previous_version_id: Optional[int] = None  # the contract this text renegotiates
+
+
+class BatchDocument(ContractBase):
+	title: Optional[str] = None  # when persisting, defaults to ref
+	text: str
+	ref: Optional[str] = None  # caller's own id, echoed back in the result
+
+
+class BatchResult(BaseModel):
+	"""One NDJSON line of POST /contracts/analyze-batch."""
+	index: int  # position in the request
+	ref: Optional[str] = None
+	language: Optional[str] = None
+	ruleset_version: Optional[str] = None
+	flags: List[ClauseFlagBase] = []
+	terms: List[ContractTermRead] = []
+	model_confidence: Optional[float] = None  # with a clause classifier model
+	contract_id: Optional[int] = None  # with ?persist=true
+	error: Optional[str] = None
+
+	class Config:
+		protected_namespaces = ()  # model_confidence
 
 
 class ContractRead(ContractBase):
@@ -38,18 +205,25 @@ class ContractRead(ContractBase):
 	text: str
 	status: Optional[str] = None
 	consent_notes: Optional[str] = None
-	# GPT Analysis fields - temporarily commented out until database migration
-	# gpt_summary: Optional[str] = None
-	# gpt_key_risks: Optional[str] = None  # JSON string
-	# gpt_recommendations: Optional[str] = None  # JSON string
-	# gpt_overall_assessment: Optional[str] = None
-	# gpt_confidence_score: Optional[str] = None
-	# gpt_analysis_date: Optional[datetime] = None
+	gpt_summary: Optional[str] = None
+	gpt_key_risks: Optional[str] = None  # JSON string
+	gpt_recommendations: Optional[str] = None  # JSON string
+	gpt_overall_assessment: Optional[str] = None
+	gpt_confidence_score: Optional[str] = None
+	gpt_analysis_date: Optional[datetime] = None
+	model_confidence: Optional[float] = None
+	used_ocr: bool = False
+	duplicate_of_id: Optional[int] = None  # the user's earlier contract this one nearly duplicates
+	duplicate_similarity: Optional[float] = None
+	previous_version_id: Optional[int] = None
+	version: int = 1
+	counterparty_id: Optional[int] = None
 	created_at: datetime
 	flags: List[ClauseFlagRead] = []
 
 	class Config:
 		from_attributes = True
+		protected_namespaces = ()  # model_confidence
 
 
 class ContractListItem(BaseModel):
@@ -62,6 +236,9 @@ class ContractListItem(BaseModel):
 	consent_notes: Optional[str] = None
 	created_at: datetime
 	stored_filename: Optional[str] = None
+	version: int = 1
+	counterparty_id: Optional[int] = None
+	language: Optional[str] = None
 
 	class Config:
 		from_attributes = True
@@ -72,6 +249,74 @@ class ContractStatusUpdate(BaseModel):
 	consent_notes: Optional[str] = None
 
 
+class RiskSummaryCount(BaseModel):
+	flag_count: int
+	contract_count: int
+
+
+class RiskSummaryCell(RiskSummaryCount):
+	category: str
+	severity: str
+
+
+class RiskSummaryStatus(RiskSummaryCount):
+	status: str
+	by_severity: Dict[str, RiskSummaryCount] = {}
+	by_category: List[RiskSummaryCell] = []
+
+
+class RiskSummaryRead(BaseModel):
+	statuses: List[RiskSummaryStatus] = []
+
+
+class CounterpartyListItem(BaseModel):
+	id: int
+	name: str
+	contract_count: int
+	flag_count: int
+
+	class Config:
+		from_attributes = True
+
+
+class CounterpartyCategory(BaseModel):
+	category: str
+	contract_count: int  # contracts with at least one flag of the category
+	flag_count: int
+	share: float  # of the counterparty's contracts
+
+
+class CounterpartyDays(BaseModel):
+	median: Optional[float] = None
+	min: Optional[float] = None
+	max: Optional[float] = None
+	perpetual_share: Optional[float] = None  # term lengths only
+	contract_count: int = 0  # contracts stating it
+
+
+class CounterpartyTerritory(BaseModel):
+	territory: str
+	contract_count: int
+
+
+class CounterpartyProfile(BaseModel):
+	id: int
+	name: str
+	aliases: List[str] = []
+	contract_count: int
+	flag_count: int
+	categories: List[CounterpartyCategory] = []
+	payment_days: CounterpartyDays
+	term_days: CounterpartyDays
+	exclusivity_share: float
+	territories: List[CounterpartyTerritory] = []
+	updated_at: Optional[datetime] = None
+
+
+class CounterpartyAliasCreate(BaseModel):
+	name: str
+
+
 class GPTAnalysisResponse(BaseModel):
 	summary: str
 	key_risks: List[Dict[str, str]]
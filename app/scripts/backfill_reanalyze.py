@@ -1,26 +1,270 @@
+"""Re-run the rule analyzer over stored contracts.
+
+Contracts are streamed in id order in fixed-size batches, analyzed across a
+process pool and written back one transaction per batch. Each batch stamps
+contracts.ruleset_version, so an interrupted run resumes where it stopped and
+contracts already analyzed with the current rules are skipped.
+
+Re-analysis is incremental: only the categories touched by rules added,
+changed or removed since a contract's recorded ruleset are re-run (flags are
+merged per category), and their flags are diffed in place.
+Contracts with no known ruleset (and everything under --force) run all rules;
+--force progress is tracked in a checkpoint file. Contracts stored before
+clause segmentation get their clause tree along the way, and every contract
+visited gets its structured terms re-extracted and, with a classifier model,
+its clauses re-scored. OCR-sourced contracts also get approximate matches of
+the rules' key phrases. Contracts without a near-duplicate signature are
+visited too and get one. Counterparty profiles follow the new flags and
+terms, and visited contracts not yet linked to a counterparty are linked.
+Pending deadlines are rescheduled from the new terms, except on contracts a
+newer version replaces.
+
+Each language's contracts are analyzed with its own rule pack (see
+app.rulebook), and are stale when their ruleset is not that pack's current
+one. Contracts stored before language detection get their language first.
+
+    python -m app.scripts.backfill_reanalyze --batch-size 200 --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
 from app.database import SessionLocal
-from app import models
-from app.analyzer import analyze_text
+from app import counterparties, deadlines, models
+from app.analyzer import analyze_text, current_categories, current_ruleset
+from app.segmenter import Clause, attach_clauses, segment
+from app.terms import Term, extract_terms
+from app.classifier import ClauseScores, classify_clauses
+from app.dedup import index_contract
+from app.language import detect_language
+from app.reanalysis import apply_flag_diff, categories_to_rerun, load_rulesets, register_current_ruleset, rules_to_rerun
+from app.rulebook import DEFAULT_LANGUAGE, pack_languages, pin_all, rules_language, ruleset_fingerprint
+
+DEFAULT_CHECKPOINT = ".backfill_checkpoint.json"
+
+
+def _load_checkpoint(path: Optional[str], version: str) -> int:
+    if not path or not os.path.isfile(path):
+        return 0
+    with open(path) as f:
+        data = json.load(f)
+    return int(data.get("last_id", 0)) if data.get("ruleset_version") == version else 0
+
+
+def _save_checkpoint(path: Optional[str], version: str, last_id: int) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"ruleset_version": version, "last_id": last_id}, f)
+    os.replace(tmp, path)
+
+
+def _pending(db, versions: Dict[str, str], force: bool):
+    """Contracts to visit; versions maps each language with a rule pack to its current ruleset."""
+    query = db.query(models.Contract.id)
+    if not force:
+        packs = [language for language in versions if language != DEFAULT_LANGUAGE]
+        stale = [
+            and_(models.Contract.language == language, models.Contract.ruleset_version != versions[language])
+            for language in packs
+        ]
+        # Languages without a pack are analyzed with the default one
+        default = models.Contract.ruleset_version != versions[DEFAULT_LANGUAGE]
+        stale.append(and_(models.Contract.language.notin_(packs), default) if packs else default)
+        query = query.filter(or_(
+            models.Contract.ruleset_version.is_(None),
+            models.Contract.language.is_(None),
+            models.Contract.minhash.is_(None),
+            *stale,
+        ))
+    return query
+
+
+def _batches(versions: Dict[str, str], force: bool, after_id: int, batch_size: int) -> Iterator[List[Tuple[int, Optional[str], str, bool, Optional[str]]]]:
+    """Yield [(id, ruleset fingerprint, text, used_ocr, language)] batches by keyset pagination, so
+    every batch is a fresh short query and commits in between never invalidate
+    an open cursor."""
+    while True:
+        db = SessionLocal()
+        try:
+            rows = (
+                _pending(db, versions, force)
+                .add_columns(models.Contract.ruleset_version, models.Contract.text, models.Contract.used_ocr, models.Contract.language)
+                .filter(models.Contract.id > after_id)
+                .order_by(models.Contract.id)
+                .limit(batch_size)
+                .yield_per(batch_size)
+            )
+            batch = [(row.id, row.ruleset_version, row.text or "", bool(row.used_ocr), row.language) for row in rows]
+        finally:
+            db.close()
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1][0]
+
+
+def _plan(batch: List[Tuple[int, Optional[str], str, bool, Optional[str]]], rulesets: Dict[str, Dict[str, str]],
+          current: Dict[str, Dict[str, str]], categories: Dict[str, Dict[str, str]], languages: List[str]) -> List[Optional[List[str]]]:
+    """Categories to re-run per contract: those touched by rules changed since
+    its ruleset, or all (None). current and categories are per rule pack
+    language; languages holds each contract's."""
+    changed = {
+        contract_id: rules_to_rerun(rulesets.get(fingerprint), current[language])
+        for (contract_id, fingerprint, _, _, _), language in zip(batch, languages)
+    }
+    stored: Dict[int, List[Tuple[str, Optional[str]]]] = {contract_id: [] for contract_id in changed}
+    incremental = [contract_id for contract_id, rule_ids in changed.items() if rule_ids is not None]
+    if incremental:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(models.ClauseFlag.contract_id, models.ClauseFlag.category, models.ClauseFlag.rule_ids)
+                .filter(models.ClauseFlag.contract_id.in_(incremental))
+                .distinct()
+            )
+            for contract_id, category, rule_ids in rows:
+                stored[contract_id].append((category, rule_ids))
+        finally:
+            db.close()
+    plan = []
+    for (contract_id, _, _, _, _), language in zip(batch, languages):
+        rule_ids = changed[contract_id]
+        plan.append(None if rule_ids is None else sorted(categories_to_rerun(rule_ids, categories[language], stored[contract_id])))
+    return plan
 
 
-def backfill() -> None:
+def _analyze(text: str, rule_ids: Optional[List[str]], ocr: bool = False, language: Optional[str] = None) -> Tuple[List[Clause], list, List[Term], Optional[ClauseScores]]:
+    """Segment, analyze, extract terms and score clauses of one contract (runs in the worker processes)."""
+    clauses = segment(text)
+    flags = analyze_text(text, rule_ids, ocr=ocr, language=language)
+    attach_clauses(flags, clauses)
+    return clauses, flags, extract_terms(text, clauses), classify_clauses(text, clauses)
+
+
+def _write_batch(ids: List[int], plan: List[Optional[List[str]]], results: List[tuple], versions: List[str], languages: List[str]) -> Tuple[int, int, int]:
+    """Diff each contract's flags against the new results in one transaction,
+    stamping each with its language and the ruleset it was analyzed with."""
+    totals = [0, 0, 0]
     db = SessionLocal()
     try:
-        contracts = db.query(models.Contract).all()
-        updated = 0
-        for contract in contracts:
-            db.query(models.ClauseFlag).filter(models.ClauseFlag.contract_id == contract.id).delete(synchronize_session=False)
-            new_flags = analyze_text(contract.text)
-            for f in new_flags:
-                db.add(models.ClauseFlag(contract_id=contract.id, **f))
-            updated += 1
+        contracts = {c.id: c for c in db.query(models.Contract).filter(models.Contract.id.in_(ids)).all()}
+        superseded = deadlines.superseded(db, ids)
+        for contract_id, scope, (clauses, flags, terms, clause_scores), version, language in zip(ids, plan, results, versions, languages):
+            contract = contracts.get(contract_id)
+            if contract is None:  # deleted since it was read
+                continue
+            if not contract.clauses:
+                contract.clauses = [models.ContractClause.from_clause(c) for c in clauses]
+            # The counterparty profile is recomputed from the new flags and terms below
+            counterparties.apply_contract(db, contract, contract.flags, sign=-1)
+            # Terms do not depend on the rules; replacing them keeps extractor changes applied too
+            contract.terms = [models.ContractTerm.from_term(t) for t in terms]
+            if clause_scores is not None:
+                clause_scores.apply(contract)
+            if contract.minhash is None:
+                index_contract(contract)
+            counts = apply_flag_diff(db, contract, flags, set(scope) if scope is not None else None)
+            totals = [a + b for a, b in zip(totals, counts)]
+            if contract.counterparty_id is None:
+                counterparties.add_contract(db, contract, contract.flags)
+            else:
+                counterparties.apply_contract(db, contract, contract.flags)
+            if contract_id not in superseded:
+                deadlines.reschedule(db, contract, contract.flags)
+            contract.ruleset_version = version
+            contract.language = language
         db.commit()
-        print(f"Re-analyzed {updated} contracts. New flags have been saved.")
+        return tuple(totals)
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
 
-if __name__ == "__main__":
-    backfill()
+def backfill(batch_size: int = 200, workers: int = 0, force: bool = False, checkpoint: Optional[str] = DEFAULT_CHECKPOINT) -> None:
+    # Every batch is stamped with these rulesets, so rulebook edits must not apply midway
+    pin_all()
+    versions, current, categories = {}, {}, {}
+    for language in pack_languages():
+        versions[language] = register_current_ruleset(language)
+        current[language] = current_ruleset(language)
+        categories[language] = current_categories(language)
+    # The checkpoint is valid for this set of rulesets only
+    version = ruleset_fingerprint(versions)
+    described = ", ".join(f"{language} {fingerprint}" for language, fingerprint in versions.items())
+    workers = workers or os.cpu_count() or 1
+    checkpoint = checkpoint if force else None
+    after_id = _load_checkpoint(checkpoint, version)
+
+    db = SessionLocal()
+    try:
+        total = _pending(db, versions, force).filter(models.Contract.id > after_id).count()
+        rulesets = load_rulesets(db)
+    finally:
+        db.close()
+    if not total:
+        print(f"Nothing to do: all contracts are analyzed with the current rulesets ({described}).")
+        return
+    print(f"Re-analyzing {total} contracts with rulesets {described} ({workers} workers, batches of {batch_size})"
+          + (f", resuming after id {after_id}" if after_id else ""))
 
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    done = chars = 0
+    kept = added = removed = 0
+    start = time.perf_counter()
+    try:
+        for batch in _batches(versions, force, after_id, batch_size):
+            ids = [contract_id for contract_id, _, _, _, _ in batch]
+            texts = [text for _, _, text, _, _ in batch]
+            ocr = [used_ocr for _, _, _, used_ocr, _ in batch]
+            languages = [language or detect_language(text) for _, _, text, _, language in batch]
+            packs = [rules_language(language) for language in languages]
+            plan = _plan(batch, {} if force else rulesets, current, categories, packs)
+            rule_ids = [
+                None if scope is None else sorted(r for r, c in categories[pack].items() if c in scope)
+                for scope, pack in zip(plan, packs)
+            ]
+            if pool is not None:
+                results = list(pool.map(_analyze, texts, rule_ids, ocr, packs, chunksize=max(1, len(texts) // (workers * 4))))
+            else:
+                results = [_analyze(text, rules, used_ocr, pack) for text, rules, used_ocr, pack in zip(texts, rule_ids, ocr, packs)]
+            k, a, r = _write_batch(ids, plan, results, [versions[pack] for pack in packs], languages)
+            kept, added, removed = kept + k, added + a, removed + r
+            _save_checkpoint(checkpoint, version, ids[-1])
+
+            done += len(batch)
+            chars += sum(len(text) for text in texts)
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed if elapsed else 0.0
+            eta = (total - done) / rate if rate else 0.0
+            print(f"  {done}/{total} contracts  {rate:.1f} contracts/s  {chars / elapsed / 1e6 if elapsed else 0:.2f} MB/s  "
+                  f"flags +{added} -{removed} ={kept}  up to id {ids[-1]}  ETA {eta:.0f}s")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if checkpoint and os.path.isfile(checkpoint):
+        os.remove(checkpoint)
+    print(f"Re-analyzed {done} contracts in {time.perf_counter() - start:.1f}s. New flags have been saved.")
 
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200, help="contracts per transaction")
+    parser.add_argument("--workers", type=int, default=0, help="analysis processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-analyze contracts already at the current ruleset")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="progress file used with --force")
+    args = parser.parse_args()
+    backfill(batch_size=args.batch_size, workers=args.workers, force=args.force, checkpoint=args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Throughput benchmark for the clause classifier.
+
+Scores segmented clauses of synthetic contracts (or the given text files)
+in batches and reports clauses/s, split into feature hashing and the model
+itself, and the per-contract latency ingest adds. Uses the trained model
+when there is one, otherwise random weights of the same shape (throughput
+does not depend on the weight values).
+
+    python -m app.scripts.bench_classifier --contracts 200
+    python -m app.scripts.bench_classifier contract1.txt --bits 18
+"""
+import argparse
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from app.analyzer import current_categories
+from app.classifier import CLASSIFIER_MODEL_PATH, DEFAULT_HASH_BITS, ClauseModel, classify_clauses
+from app.segmenter import own_spans, segment
+
+SAMPLE_CONTRACT = (
+    "TALENT AGREEMENT\n\n"
+    "This agreement is made between the Producer and the Artist.\n\n"
+    "1. Term. The term of this agreement is two years from the Effective Date and renews automatically.\n"
+    "2. Compensation. Producer shall pay Artist the fee in Schedule A within sixty days of invoice. "
+    "Chargebacks may be deducted from any payment.\n"
+    "3. Rights. The Producer shall own all rights in perpetuity throughout the universe, in any media now known "
+    "or hereafter devised, including the Artist's name, voice and likeness.\n"
+    "4. Exclusivity. Artist agrees not to render services for any competing production during the term.\n"
+    "5. Indemnity. Artist shall indemnify and hold harmless the Producer from all claims.\n"
+    "6. Disputes. Binding arbitration applies in the venue of the Producer's choosing.\n\n"
+    "IN WITNESS WHEREOF the parties sign.\n"
+)
+
+
+def _model(bits: int) -> ClauseModel:
+    if os.path.isfile(CLASSIFIER_MODEL_PATH):
+        print(f"Model: {CLASSIFIER_MODEL_PATH}")
+        return ClauseModel.load(CLASSIFIER_MODEL_PATH)
+    categories = sorted(set(current_categories().values()))
+    model = ClauseModel.empty(categories, bits)
+    rng = np.random.default_rng(0)
+    model.weights[:] = rng.normal(0, 0.1, model.weights.shape)
+    print(f"Model: random weights, {len(categories)} categories, 2^{bits} features")
+    return model
+
+
+def _texts(paths: List[str], contracts: int) -> List[str]:
+    if not paths:
+        return [SAMPLE_CONTRACT] * contracts
+    texts = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            texts.append(f.read())
+    return texts * max(1, contracts // len(texts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="text files to use instead of the synthetic contract")
+    parser.add_argument("--contracts", type=int, default=200, help="contracts to score")
+    parser.add_argument("--bits", type=int, default=DEFAULT_HASH_BITS, help="feature hash size for random weights")
+    args = parser.parse_args()
+
+    model = _model(args.bits)
+    texts = _texts(args.files, args.contracts)
+    segmented = [(text, segment(text)) for text in texts]
+    clause_texts = [text[start:end] for text, clauses in segmented for _, start, end in own_spans(clauses)]
+    print(f"{len(texts)} contracts, {len(clause_texts)} clauses")
+
+    start = time.perf_counter()
+    features = model.featurize(clause_texts)
+    featurize_s = time.perf_counter() - start
+    start = time.perf_counter()
+    model.predict_features(features)
+    predict_s = time.perf_counter() - start
+    total = featurize_s + predict_s
+    print(f"features:  {len(clause_texts) / featurize_s:10.0f} clauses/s")
+    print(f"model:     {len(clause_texts) / predict_s:10.0f} clauses/s")
+    print(f"total:     {len(clause_texts) / total:10.0f} clauses/s")
+
+    latencies = []
+    for text, clauses in segmented:
+        start = time.perf_counter()
+        classify_clauses(text, clauses, model)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"per contract (classify_clauses): p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark of approximate (OCR) rule matching against exact matching.
+
+Runs analyze_text() over OCR-like text with and without ocr=True and reports
+MB/s for both, the slowdown factor, and how many of the high-severity key
+phrases (with typical Tesseract errors injected) each mode finds.
+
+    python -m app.scripts.bench_fuzzy --size-mb 2
+    python -m app.scripts.bench_fuzzy scan1.txt scan2.txt --repeat 5
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from app.analyzer import analyze_text
+from app.rulebook import active_rulebook
+
+FILLER = (
+    "The Producer may use recordings made under this agreement for the purposes set out in Schedule B. "
+    "Notices shall be sent in writing to the address above and take effect on receipt. "
+    "The parties shall act in good faith and perform their obligations in a timely manner. "
+)
+PHRASES_PER_TEXT = 40
+# Substitutions Tesseract commonly makes
+OCR_CONFUSIONS = {"y": "v", "l": "1", "i": "l", "o": "0", "rn": "m", "m": "rn", "e": "c", "h": "b"}
+
+
+def _corrupt(phrase: str, rng: random.Random) -> str:
+    """phrase with one OCR-style error: a confusion, a split word or a dropped letter."""
+    choice = rng.random()
+    if choice < 0.6:
+        options = [(i, a, b) for a, b in OCR_CONFUSIONS.items() for i in range(len(phrase)) if phrase.startswith(a, i)]
+        if options:
+            i, a, b = rng.choice(options)
+            return phrase[:i] + b + phrase[i + len(a):]
+    words = phrase.split(" ")
+    i = rng.randrange(len(words))
+    word = words[i]
+    if choice < 0.8 and len(word) > 5:
+        cut = rng.randrange(2, len(word) - 2)
+        words[i] = word[:cut] + " " + word[cut:]
+    elif len(word) > 5:
+        cut = rng.randrange(1, len(word) - 1)
+        words[i] = word[:cut] + word[cut + 1:]
+    return " ".join(words)
+
+
+def _synthetic(size_mb: float, rng: random.Random) -> List[str]:
+    phrases = [p.phrase for rule in active_rulebook().rules for p in rule.fuzzy]
+    texts, size = [], 0
+    while size < size_mb * 1e6:
+        parts = []
+        for _ in range(PHRASES_PER_TEXT):
+            parts.append(FILLER)
+            parts.append(f"The Artist agrees that {_corrupt(rng.choice(phrases), rng)} applies. ")
+        text = "".join(parts)
+        texts.append(text)
+        size += len(text)
+    return texts
+
+
+def _time(texts: List[str], repeat: int, ocr: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            analyze_text(text, ocr=ocr)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="OCR text files to use instead of synthetic text")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="synthetic corpus size")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.files:
+        texts = []
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                texts.append(f.read())
+    else:
+        texts = _synthetic(args.size_mb, random.Random(args.seed))
+    total_mb = sum(len(t) for t in texts) * args.repeat / 1e6
+    print(f"{len(texts)} texts, {total_mb / args.repeat:.2f} MB x {args.repeat} passes")
+
+    exact_s = _time(texts, args.repeat, ocr=False)
+    fuzzy_s = _time(texts, args.repeat, ocr=True)
+    exact_flags = sum(len(analyze_text(t)) for t in texts)
+    fuzzy_flags = [f for t in texts for f in analyze_text(t, ocr=True)]
+    approximate = sum(1 for f in fuzzy_flags if f["confidence"] < 1.0)
+    print(f"exact:        {total_mb / exact_s:8.2f} MB/s  {exact_flags} flags per pass")
+    print(f"ocr (fuzzy):  {total_mb / fuzzy_s:8.2f} MB/s  {len(fuzzy_flags)} flags per pass, {approximate} approximate")
+    if not args.files:
+        print(f"key phrases with an injected error: {PHRASES_PER_TEXT * len(texts)} per pass")
+    print(f"slowdown: {fuzzy_s / exact_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Throughput benchmark for the text normalizer and the rule analyzer.
+
+Runs normalize() and analyze_text() over extractor-like text (ligatures, smart
+quotes, hyphenated line breaks, page-number lines) or over the given files and
+reports MB/s for each, so normalization overhead can be compared with the cost
+of matching the rules.
+
+    python -m app.scripts.bench_normalize --size-mb 5
+    python -m app.scripts.bench_normalize contract1.txt contract2.txt --repeat 20
+"""
+import argparse
+import time
+from typing import List
+
+from app.analyzer import analyze_text
+from app.normalize import normalize
+
+SAMPLE_PAGE = (
+    "The Producer shall own all rights in per-\npetuity throughout the universe, in any\n"
+    "media now known or hereafter devised. Performer grants exclusive services and\n"
+    "agrees to a non-\ncompete for two years. “Artist” shall indemnify and hold\n"
+    "harmless the Producer — including for the ﬁrst and ﬁnal cut.\n\n"
+    "Page 3 of 12\n\n"
+    "Payment net 60 after acceptance. Binding    arbitration applies in the\n"
+    "venue of the Producer’s choosing.\n\f- 4 -\n"
+)
+
+
+def _texts(paths: List[str], size_mb: float) -> List[str]:
+    if paths:
+        texts = []
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                texts.append(f.read())
+        return texts
+    # ~20 pages per synthetic contract
+    contract = SAMPLE_PAGE * 20
+    count = max(1, int(size_mb * 1e6 / len(contract)))
+    return [contract] * count
+
+
+def _time(fn, texts: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="text files to use instead of synthetic contracts")
+    parser.add_argument("--size-mb", type=float, default=2.0, help="synthetic corpus size")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus")
+    args = parser.parse_args()
+
+    texts = _texts(args.files, args.size_mb)
+    total_mb = sum(len(t) for t in texts) * args.repeat / 1e6
+    print(f"{len(texts)} texts, {total_mb / args.repeat:.2f} MB x {args.repeat} passes")
+
+    norm_s = _time(normalize, texts, args.repeat)
+    analyze_s = _time(analyze_text, texts, args.repeat)
+    flags = sum(len(analyze_text(t)) for t in texts)
+    print(f"normalize:    {total_mb / norm_s:8.2f} MB/s")
+    print(f"analyze_text: {total_mb / analyze_s:8.2f} MB/s  (includes normalize; {flags} flags per pass)")
+    print(f"normalization share of analysis time: {norm_s / analyze_s * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
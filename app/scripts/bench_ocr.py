@@ -0,0 +1,201 @@
+"""Benchmark of OCR configurations: seconds per page and character accuracy.
+
+Pages are OCR'd with each configuration:
+
+- raw: the image as uploaded, or the PDF page rendered at 150 DPI, with
+  Tesseract's defaults (how pages were read before preprocessing);
+- prepared --psm 3: preprocessed (app.ocr_preprocess), Tesseract's default
+  segmentation;
+- prepared auto: preprocessed, with the DPI, --psm and --oem the app picks;
+- prepared --psm N: preprocessed, for each N given with --psm.
+
+The synthetic corpus has two kinds of pages with contract text: "scan", a
+clean PDF page, and "photo", a 12 MP phone photo of a printed page (skewed,
+unevenly lit, noisy, on a dark table). Real pages can be given instead:
+images or PDFs, each with its text in a file of the same name ending .txt.
+
+Accuracy is difflib's similarity ratio of the OCR text to the true text,
+whitespace collapsed. Without Tesseract only preprocessing is timed.
+
+    python -m app.scripts.bench_ocr --pages 3
+    python -m app.scripts.bench_ocr scan1.pdf photo1.jpg --psm 6
+"""
+import argparse
+import difflib
+import os
+import random
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pytesseract
+from pdf2image import convert_from_path
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.ocr import OCR_PAGES, PROBE_DPI, RENDER_DPI, tesseract_config
+from app.ocr_preprocess import choose_dpi, prepare
+from app.rulebook import active_rulebook
+
+FILLER = [
+    "The Producer may use recordings made under this agreement for the purposes set out in Schedule B.",
+    "Notices shall be sent in writing to the address above and take effect on receipt.",
+    "The parties shall act in good faith and perform their obligations in a timely manner.",
+    "Payment shall be made within thirty (30) days of receipt of a valid invoice.",
+    "This agreement is governed by the laws of the State of New York.",
+]
+PAGE_DPI = 300  # synthetic pages are drawn at this resolution
+PAGE_SIZE = (2550, 3300)  # US Letter at PAGE_DPI
+PHOTO_SIZE = (3024, 4032)
+
+
+class Page:
+    """A page to OCR: its true text and how to get its image at a DPI (None: as uploaded)."""
+
+    def __init__(self, name: str, kind: str, truth: str, image: Callable[[Optional[int]], Image.Image]):
+        self.name = name
+        self.kind = kind
+        self.truth = truth
+        self.image = image
+
+
+def _paragraphs(rng: random.Random) -> List[str]:
+    phrases = [p.phrase for rule in active_rulebook().rules for p in rule.fuzzy]
+    paragraphs = []
+    for n in range(1, 7):
+        sentences = rng.sample(FILLER, 3) + [f"The Artist agrees that {rng.choice(phrases)} applies."]
+        rng.shuffle(sentences)
+        paragraphs.append(f"{n}. " + " ".join(sentences))
+    return paragraphs
+
+
+def _draw_page(paragraphs: List[str], font_px: int) -> Tuple[Image.Image, str]:
+    """A page with the paragraphs drawn on it, and its text line by line."""
+    font = ImageFont.load_default(size=font_px)
+    page = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    margin, y, lines = 250, 250, []
+    for paragraph in paragraphs:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}".strip()
+            if font.getlength(candidate) > PAGE_SIZE[0] - 2 * margin:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.extend([line, ""])
+    for line in lines:
+        if y > PAGE_SIZE[1] - margin:
+            break
+        draw.text((margin, y), line, font=font, fill=0)
+        y += round(font_px * 1.5)
+    return page, "\n".join(lines)
+
+
+def _photograph(page: Image.Image, rng: random.Random) -> Image.Image:
+    """page as a phone photo: on a dark table, skewed, lit from one side, noisy and a little blurred."""
+    photo = Image.new("L", PHOTO_SIZE, 60)
+    paper = page.point(lambda v: 40 + v * 0.8)
+    photo.paste(paper, ((PHOTO_SIZE[0] - PAGE_SIZE[0]) // 2, (PHOTO_SIZE[1] - PAGE_SIZE[1]) // 2))
+    photo = photo.rotate(rng.uniform(-3, 3), resample=Image.BILINEAR, fillcolor=60)
+    h, w = PHOTO_SIZE[1], PHOTO_SIZE[0]
+    light = np.linspace(1.0, 0.55, w, dtype=np.float32)[None, :] * np.linspace(1.0, 0.85, h, dtype=np.float32)[:, None]
+    noise = np.random.default_rng(rng.randrange(1 << 30)).normal(0, 8, (h, w)).astype(np.float32)
+    pixels = np.clip(np.asarray(photo, dtype=np.float32) * light + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(1.2))
+
+
+def synthetic_pages(pages: int, rng: random.Random) -> List[Page]:
+    corpus = []
+    for i in range(pages):
+        # 11 pt text, as a PDF rendered at the requested DPI
+        page, truth = _draw_page(_paragraphs(rng), 46)
+        corpus.append(Page(
+            f"scan-{i}", "scan", truth,
+            lambda dpi, page=page: page.resize((round(PAGE_SIZE[0] * (dpi or PAGE_DPI) / PAGE_DPI), round(PAGE_SIZE[1] * (dpi or PAGE_DPI) / PAGE_DPI)), Image.LANCZOS),
+        ))
+        page, truth = _draw_page(_paragraphs(rng), rng.choice([40, 46, 52]))
+        photo = _photograph(page, rng)
+        corpus.append(Page(f"photo-{i}", "photo", truth, lambda dpi, photo=photo: photo))
+    return corpus
+
+
+def file_pages(paths: List[str]) -> List[Page]:
+    corpus = []
+    for path in paths:
+        with open(os.path.splitext(path)[0] + ".txt", encoding="utf-8") as f:
+            truth = f.read()
+        if path.lower().endswith(".pdf"):
+            # One page per PDF: its first, as the app reads at most OCR_PAGES
+            image = lambda dpi, path=path: convert_from_path(path, dpi=dpi or RENDER_DPI, grayscale=True, first_page=1, last_page=1)[0]
+            corpus.append(Page(os.path.basename(path), "pdf", truth, image))
+        else:
+            img = Image.open(path)
+            img.load()
+            corpus.append(Page(os.path.basename(path), "image", truth, lambda dpi, img=img: img))
+    return corpus
+
+
+def accuracy(text: str, truth: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(truth.split()), " ".join(text.split()), autojunk=False).ratio()
+
+
+def _run(page: Page, psm: Optional[str], tesseract: bool) -> Tuple[float, float, Optional[float]]:
+    """(preprocessing s, OCR s, accuracy) of one page with one configuration;
+    psm None is raw. Rendering or loading the page is not timed."""
+    pdf = page.kind in ("scan", "pdf")
+    if psm is None:
+        img, config, prep_s = page.image(RENDER_DPI if pdf else None), "", 0.0
+    else:
+        prep_s = 0.0
+        dpi = None
+        if pdf:
+            probe = page.image(PROBE_DPI)
+            start = time.perf_counter()
+            dpi = choose_dpi(probe, PROBE_DPI)
+            prep_s += time.perf_counter() - start
+        img = page.image(dpi)
+        start = time.perf_counter()
+        prepared = prepare(img)
+        prep_s += time.perf_counter() - start
+        img = prepared.image
+        config = tesseract_config(prepared) if psm == "auto" else f"--psm {psm}"
+    if not tesseract:
+        return prep_s, 0.0, None
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(img, config=config)
+    return prep_s, time.perf_counter() - start, accuracy(text, page.truth)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="images or PDFs with a .txt of their text, instead of synthetic pages")
+    parser.add_argument("--pages", type=int, default=2, help="synthetic pages of each kind")
+    parser.add_argument("--psm", nargs="*", default=[], help="extra page segmentation modes to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        print(f"Tesseract {pytesseract.get_tesseract_version()}")
+        tesseract = True
+    except Exception as e:
+        print(f"Tesseract not found ({type(e).__name__}); timing preprocessing only")
+        tesseract = False
+    corpus = file_pages(args.files) if args.files else synthetic_pages(args.pages, random.Random(args.seed))
+    kinds = sorted({page.kind for page in corpus})
+    configs = [("raw", None), ("prepared --psm 3", "3"), ("prepared auto", "auto")]
+    configs += [(f"prepared --psm {psm}", psm) for psm in args.psm]
+    print(f"{len(corpus)} pages; PDFs are OCR'd up to {OCR_PAGES or 'all'} pages in the app")
+    print(f"{'configuration':<20} {'kind':<6} {'prep s/page':>11} {'ocr s/page':>10} {'total s/page':>12} {'accuracy':>8}")
+    for label, psm in configs:
+        for kind in kinds:
+            pages = [page for page in corpus if page.kind == kind]
+            results = [_run(page, psm, tesseract) for page in pages]
+            prep_s = sum(r[0] for r in results) / len(results)
+            ocr_s = sum(r[1] for r in results) / len(results)
+            score = f"{100 * sum(r[2] for r in results) / len(results):7.1f}%" if tesseract else "       -"
+            print(f"{label:<20} {kind:<6} {prep_s:11.3f} {ocr_s:10.3f} {prep_s + ocr_s:12.3f} {score:>8}")
+
+
+if __name__ == "__main__":
+    main()
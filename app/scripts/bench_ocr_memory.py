@@ -0,0 +1,116 @@
+"""Benchmark of peak memory while OCR'ing scanned PDFs of growing length.
+
+Builds image-only PDFs of the synthetic scan pages of app.scripts.bench_ocr
+(300 DPI, so text extraction finds nothing and they go to OCR), and OCRs
+each in a fresh process, all pages (CG_OCR_MAX_PAGES=0), with:
+
+- streamed: app.ocr.extract_text_from_pdf_bytes, which renders and OCRs
+  one page at a time (app.pdf_render);
+- list: the previous path, pdf2image's convert_from_bytes rendering every
+  page into a list, then OCR.
+
+Reports each process's peak RSS, above what it used before the PDF, and
+seconds per page, with the peak when OCR started (after text extraction and,
+for list, rendering) and after the first page was read. Streamed should stay
+flat as pages grow; list grows by about a rendered page per page. Needs Poppler; without Tesseract the pages
+are still rendered and preprocessed, only not read. Peak RSS is read from
+/proc, or the resource module, so Unix only.
+
+    python -m app.scripts.bench_ocr_memory --pages 1 5 20
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from app.scripts.bench_ocr import PAGE_DPI, synthetic_pages
+
+
+def _peak_mb() -> float:
+    # On Linux ru_maxrss carries over from the parent process; VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+    except (OSError, StopIteration):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _worker(args) -> dict:
+    path, mode = args
+    from pdf2image import convert_from_bytes
+
+    from app import ocr
+    from app.ocr_preprocess import PREPROCESS, choose_dpi
+
+    with open(path, "rb") as f:
+        data = f.read()
+    stages = {}
+    ocr_images, read = ocr._ocr_images, ocr._read
+
+    def timed_ocr_images(*args, **kwargs):
+        stages["ocr_mb"] = _peak_mb()
+        return ocr_images(*args, **kwargs)
+
+    def timed_read(*args, **kwargs):
+        text = read(*args, **kwargs)
+        stages.setdefault("page1_mb", _peak_mb())
+        return text
+
+    ocr._ocr_images, ocr._read = timed_ocr_images, timed_read
+    start_mb = _peak_mb()
+    start = time.perf_counter()
+    if mode == "streamed":
+        text, _ = ocr.extract_text_from_pdf_bytes(data, "en")
+    else:
+        dpi = ocr.RENDER_DPI
+        if PREPROCESS:
+            dpi = choose_dpi(convert_from_bytes(data, dpi=ocr.PROBE_DPI, grayscale=True, first_page=1, last_page=1)[0], ocr.PROBE_DPI)
+        images = convert_from_bytes(data, dpi=dpi, grayscale=True)
+        text = ocr._ocr_images(images, "en")
+    return {"seconds": time.perf_counter() - start, "start_mb": start_mb, "peak_mb": _peak_mb(), "chars": len(text), **stages}
+
+
+def _write_pdf(path: str, pages: int, seed: int) -> None:
+    scans = [page.image(PAGE_DPI) for page in synthetic_pages(min(pages, 3), random.Random(seed)) if page.kind == "scan"]
+    images = [scans[i % len(scans)] for i in range(pages)]
+    images[0].save(path, "PDF", resolution=PAGE_DPI, save_all=True, append_images=images[1:])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20], help="PDF lengths to measure")
+    parser.add_argument("--modes", nargs="+", default=["streamed", "list"], choices=["streamed", "list"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if shutil.which("pdftoppm") is None:
+        raise SystemExit("pdftoppm (Poppler) not found: nothing to measure")
+    if shutil.which("tesseract") is None:
+        print("Tesseract not found: pages are rendered and preprocessed but not read")
+    # Inherited by the workers, which import app.ocr afresh. The rulebook's
+    # load-time fuzzing would set their peak before any page is read.
+    os.environ["CG_OCR_MAX_PAGES"] = "0"
+    os.environ["CG_RULE_FUZZ"] = "0"
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'pages':>5} {'mode':<9} {'at OCR MB':>9} {'page 1 MB':>9} {'peak MB':>8} {'above start MB':>14} {'s/page':>7} {'chars':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"scan-{pages}.pdf")
+            _write_pdf(path, pages, args.seed)
+            for mode in args.modes:
+                # A fresh process per run, so its peak RSS is this run's alone
+                with ctx.Pool(1) as pool:
+                    r = pool.apply(_worker, ((path, mode),))
+                print(f"{pages:5d} {mode:<9} {r['ocr_mb']:9.0f} {r['page1_mb']:9.0f} {r['peak_mb']:8.0f} {r['peak_mb'] - r['start_mb']:14.0f} {r['seconds'] / pages:7.2f} {r['chars']:7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Concurrency benchmark for SQLite production mode.
+
+Simulates several gunicorn workers (processes), each with many concurrent
+requests (threads), saving uploads (a contract plus its flags and summary
+counters) into a fresh SQLite database. Reports sustained uploads/s,
+latency percentiles and "database is locked" failures.
+
+Only the uploads are timed: each worker imports the app, compiles the
+rulebook and analyzes the sample text first, then waits until every worker
+is ready.
+
+    python -m app.scripts.bench_sqlite_writes --workers 4 --threads 8 --uploads 200
+    python -m app.scripts.bench_sqlite_writes --mode direct --no-tuning   # old behaviour
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+_ready = None  # multiprocessing.Barrier shared by the workers, set by _init
+
+
+def _init(barrier) -> None:
+    global _ready
+    _ready = barrier
+
+
+SAMPLE_TEXT = (
+    "The Producer shall own all rights in perpetuity throughout the universe. "
+    "Performer grants exclusive services and agrees to indemnify and hold harmless the Producer. "
+    "Payment net 60 after acceptance. Binding arbitration applies. "
+) * 2
+
+
+def _worker(args) -> dict:
+    db_url, mode, tuning, threads, uploads = args
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["CG_SQLITE_TUNING"] = "1" if tuning else "0"
+    os.environ["CG_SQLITE_WRITER"] = "1" if mode == "writer" else "0"
+
+    from app import models, summary
+    from app.analyzer import analyze_text
+    from app.database import SessionLocal
+
+    flags = analyze_text(SAMPLE_TEXT)
+
+    def save(session) -> int:
+        contract = models.Contract(title="bench", text=SAMPLE_TEXT, user_id=1, status="hold")
+        session.add(contract)
+        session.flush()
+        for flag in flags:
+            session.add(models.ClauseFlag.from_analysis(flag, contract_id=contract.id))
+        summary.apply_contract(session, contract.user_id, contract.status, flags)
+        return contract.id
+
+    if mode == "writer":
+        from app.writer import get_writer
+        writer = get_writer()
+
+        def one_upload():
+            writer.submit(save).result()
+    else:
+        def one_upload():
+            session = SessionLocal()
+            try:
+                save(session)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+                SessionLocal.remove()
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def run_thread():
+        for _ in range(uploads // threads):
+            start = time.perf_counter()
+            try:
+                one_upload()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e).splitlines()[0])
+
+    pool = [threading.Thread(target=run_thread) for _ in range(threads)]
+    _ready.wait()
+    # Wall clock, comparable between the worker processes
+    start = time.time()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    end = time.time()
+    if mode == "writer":
+        from app.writer import stop_writer
+        stop_writer()
+    return {"latencies": latencies, "errors": errors, "start": start, "end": end}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="processes, like gunicorn -w")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent requests per worker")
+    parser.add_argument("--uploads", type=int, default=200, help="uploads per worker")
+    parser.add_argument("--mode", choices=["writer", "direct"], default="writer")
+    parser.add_argument("--no-tuning", action="store_true", help="skip WAL/busy_timeout pragmas")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["DATABASE_URL"] = db_url
+        from alembic import command
+        from app.database import _alembic_config
+        command.upgrade(_alembic_config(), "head")
+
+        ctx = multiprocessing.get_context("spawn")
+        job = (db_url, args.mode, not args.no_tuning, args.threads, args.uploads)
+        # One job per worker: each holds its process at the barrier until all are ready
+        barrier = ctx.Barrier(args.workers, timeout=300)
+        with ctx.Pool(args.workers, initializer=_init, initargs=(barrier,)) as pool:
+            results = pool.map(_worker, [job] * args.workers, chunksize=1)
+        elapsed = max(r["end"] for r in results) - min(r["start"] for r in results)
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    errors = [e for r in results for e in r["errors"]]
+    print(f"mode={args.mode} tuning={'off' if args.no_tuning else 'on'} workers={args.workers} threads={args.threads}")
+    print(f"uploads ok: {len(latencies)}  failed: {len(errors)}  in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} uploads/s")
+    if latencies:
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        print(f"latency p50: {statistics.median(latencies) * 1000:.1f} ms  p95: {p95 * 1000:.1f} ms")
+    if errors:
+        print(f"first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
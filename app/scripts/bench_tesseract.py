@@ -0,0 +1,107 @@
+"""Benchmark of Tesseract pages/s: one process per page against pooled engines.
+
+The pages (the synthetic corpus of app.scripts.bench_ocr, or the given
+images or PDFs) are preprocessed once, as the app does, then read with:
+
+- cli: pytesseract, which writes each page to a temporary PNG and starts
+  the tesseract program on it (how pages were read before the pool);
+- engine: one libtesseract engine from app.tesseract_engine, initialized
+  once and handed raw pixels;
+- engine xN: N threads reading from the pool (CG_OCR_ENGINES engines), for
+  each N given with --threads.
+
+Each configuration reads every page --rounds times. Engines are created
+before timing starts. Agreement is difflib's similarity of the engine's text
+to the cli text, which should be close to 100%.
+
+    python -m app.scripts.bench_tesseract --pages 3 --threads 2 4
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, List
+
+import pytesseract
+
+from app import tesseract_engine
+from app.ocr import PREPARED_DPI, PROBE_DPI, engine_mode, segmentation_mode, tesseract_config
+from app.ocr_preprocess import PreparedPage, choose_dpi, prepare
+from app.scripts.bench_ocr import accuracy, file_pages, synthetic_pages
+
+
+def _prepared(pages) -> List[PreparedPage]:
+    prepared = []
+    for page in pages:
+        dpi = choose_dpi(page.image(PROBE_DPI), PROBE_DPI) if page.kind in ("scan", "pdf") else None
+        prepared.append(prepare(page.image(dpi)))
+    return prepared
+
+
+def _warm(pool: tesseract_engine.EnginePool, lang: str, oem: int) -> None:
+    """Create all of the pool's engines: holding each at once makes it start a new one."""
+    with ExitStack() as stack:
+        for _ in range(pool.size):
+            stack.enter_context(pool.engine(lang, oem))
+
+
+def _timed(read: Callable[[PreparedPage], str], pages: List[PreparedPage], rounds: int, threads: int = 1):
+    """(pages/s, seconds per page, texts of the first round)."""
+    work = pages * rounds
+    start = time.perf_counter()
+    if threads == 1:
+        texts = [read(page) for page in work]
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            texts = list(pool.map(read, work))
+    elapsed = time.perf_counter() - start
+    return len(work) / elapsed, elapsed / len(work), texts[:len(pages)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="images or PDFs with a .txt of their text, instead of synthetic pages")
+    parser.add_argument("--pages", type=int, default=2, help="synthetic pages of each kind")
+    parser.add_argument("--rounds", type=int, default=3, help="times each page is read per configuration")
+    parser.add_argument("--threads", type=int, nargs="*", default=[2], help="thread counts to read from the pool with")
+    parser.add_argument("--lang", default="eng", help="Tesseract language pack")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        print(f"Tesseract {pytesseract.get_tesseract_version()}")
+    except Exception as e:
+        raise SystemExit(f"Tesseract not found ({type(e).__name__}): nothing to compare")
+    if not tesseract_engine.available():
+        raise SystemExit("libtesseract not found (set CG_TESSERACT_LIBRARY, and leave CG_OCR_ENGINE unset): nothing to compare")
+
+    corpus = file_pages(args.files) if args.files else synthetic_pages(args.pages, random.Random(args.seed))
+    pages = _prepared(corpus)
+    oem = engine_mode()
+    size = max([tesseract_engine.ENGINES_PER_LANGUAGE] + args.threads)
+    pool = tesseract_engine.EnginePool(size)
+    # Create the engines up front, so their start-up is not timed
+    _warm(pool, args.lang, oem)
+
+    def cli(page: PreparedPage) -> str:
+        return pytesseract.image_to_string(page.image, lang=args.lang, config=tesseract_config(page))
+
+    def engine(page: PreparedPage) -> str:
+        with pool.engine(args.lang, oem) as e:
+            return e.read(page.image, segmentation_mode(page), PREPARED_DPI)
+
+    print(f"{len(pages)} pages x {args.rounds} rounds, {size} engines")
+    print(f"{'configuration':<14} {'pages/s':>8} {'s/page':>8} {'speedup':>8} {'agreement':>9}")
+    base_rate, _, base_texts = _timed(cli, pages, args.rounds)
+    print(f"{'cli':<14} {base_rate:8.2f} {1 / base_rate:8.3f} {1:8.2f}x {'-':>9}")
+    for threads in [1] + args.threads:
+        rate, per_page, texts = _timed(engine, pages, args.rounds, threads)
+        agreement = sum(accuracy(text, base) for text, base in zip(texts, base_texts)) / len(texts)
+        label = "engine" if threads == 1 else f"engine x{threads}"
+        print(f"{label:<14} {rate:8.2f} {per_page:8.3f} {rate / base_rate:8.2f}x {100 * agreement:8.1f}%")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
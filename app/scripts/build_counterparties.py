@@ -0,0 +1,61 @@
+"""Link stored contracts to counterparties and rebuild every counterparty profile.
+
+Profiles are maintained at ingest; run this once after upgrading to fill
+them for existing contracts, or any time to recompute them from scratch.
+Counterparties and their aliases are kept, so merges made through the API
+survive a rebuild.
+
+    python -m app.scripts.build_counterparties --batch-size 500
+"""
+import argparse
+import time
+
+from app import counterparties, models
+from app.database import SessionLocal
+
+
+def rebuild(batch_size: int) -> None:
+    db = SessionLocal()
+    done = linked = 0
+    start = time.perf_counter()
+    try:
+        db.query(models.Counterparty).update({
+            "contract_count": 0, "flag_count": 0, "exclusive_count": 0,
+            "category_counts": None, "payment_days": None, "term_days": None, "territories": None,
+        })
+        db.query(models.Contract).update({"counterparty_id": None})
+        db.commit()
+        after_id = 0
+        while True:
+            batch = (
+                db.query(models.Contract)
+                .filter(models.Contract.id > after_id)
+                .order_by(models.Contract.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for contract in batch:
+                counterparties.add_contract(db, contract, contract.flags)
+                linked += contract.counterparty_id is not None
+            db.commit()
+            done += len(batch)
+            after_id = batch[-1].id
+            db.expunge_all()
+            print(f"  {done} contracts  {done / (time.perf_counter() - start):.1f} contracts/s")
+        total = db.query(models.Counterparty).filter(models.Counterparty.contract_count > 0).count()
+    finally:
+        db.close()
+    print(f"Linked {linked} of {done} contracts to {total} counterparties")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="contracts per transaction")
+    args = parser.parse_args()
+    rebuild(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
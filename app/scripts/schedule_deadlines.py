@@ -0,0 +1,55 @@
+"""Schedule deadlines for stored contracts (see app.deadlines).
+
+Deadlines are scheduled at ingest; run this once after upgrading to schedule
+them for existing contracts. Pending deadlines are recomputed from the
+stored terms; fired and dismissed ones are kept, and contracts a newer
+version replaces are skipped.
+
+    python -m app.scripts.schedule_deadlines --batch-size 500
+"""
+import argparse
+import time
+
+from app import deadlines, models
+from app.database import SessionLocal
+
+
+def schedule_all(batch_size: int) -> None:
+    db = SessionLocal()
+    done = scheduled = 0
+    start = time.perf_counter()
+    try:
+        after_id = 0
+        while True:
+            batch = (
+                db.query(models.Contract)
+                .filter(models.Contract.id > after_id)
+                .order_by(models.Contract.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            superseded = deadlines.superseded(db, [contract.id for contract in batch])
+            for contract in batch:
+                if contract.id not in superseded:
+                    scheduled += deadlines.reschedule(db, contract, contract.flags)
+            db.commit()
+            done += len(batch)
+            after_id = batch[-1].id
+            db.expunge_all()
+            print(f"  {done} contracts  {done / (time.perf_counter() - start):.1f} contracts/s")
+    finally:
+        db.close()
+    print(f"Scheduled {scheduled} deadlines for {done} contracts")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="contracts per transaction")
+    args = parser.parse_args()
+    schedule_all(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Curate the standard clause library (see app.fingerprints).
+
+    python -m app.scripts.standard_clauses suggest --min-contracts 5   # recurring clauses worth curating
+    python -m app.scripts.standard_clauses import library.jsonl        # {"title", "text", "guidance", "category"?, "severity"?, "commentary"?}
+    python -m app.scripts.standard_clauses commentary                  # cache GPT commentary where missing
+    python -m app.scripts.standard_clauses apply                       # match stored contracts against the library
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Tuple
+
+from app import models
+from app.database import SessionLocal
+from app.fingerprints import fingerprint, generate_commentary, new_standard_clause, recognize
+from app.segmenter import own_spans, segment
+
+
+def cmd_suggest(args) -> None:
+    counts: Counter = Counter()
+    samples: Dict[int, Tuple[int, str]] = {}
+    db = SessionLocal()
+    try:
+        known = {exact for (exact,) in db.query(models.StandardClause.exact_hash)}
+        for contract in db.query(models.Contract).order_by(models.Contract.id).yield_per(200):
+            clauses = [c.to_clause() for c in contract.clauses] or segment(contract.text)
+            seen = set()
+            for _, start, end in own_spans(clauses):
+                fp = fingerprint(contract.text[start:end])
+                if fp is None or fp.exact in known or fp.exact in seen:
+                    continue
+                seen.add(fp.exact)
+                counts[fp.exact] += 1
+                samples.setdefault(fp.exact, (contract.id, contract.text[start:end].strip()))
+    finally:
+        db.close()
+    recurring = [(exact, n) for exact, n in counts.most_common(args.top) if n >= args.min_contracts]
+    if not recurring:
+        print(f"No clause outside the library appears in {args.min_contracts} or more contracts")
+    for exact, n in recurring:
+        contract_id, text = samples[exact]
+        print(f"{n} contracts (e.g. contract {contract_id}):")
+        print("    " + " ".join(text.split())[:args.width])
+        print(json.dumps({"title": "", "text": text, "guidance": ""}))
+
+
+def cmd_import(args) -> None:
+    db = SessionLocal()
+    added = skipped = 0
+    try:
+        with open(args.file, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                try:
+                    clause = new_standard_clause(db, **row)
+                except (TypeError, ValueError) as e:
+                    print(f"  line {number}: skipped: {e}")
+                    skipped += 1
+                    continue
+                if clause.commentary:
+                    clause.commentary_date = datetime.utcnow()
+                db.add(clause)
+                db.flush()
+                added += 1
+        db.commit()
+    finally:
+        db.close()
+    print(f"Added {added} standard clauses, skipped {skipped}")
+
+
+def cmd_commentary(args) -> None:
+    db = SessionLocal()
+    done = 0
+    try:
+        query = db.query(models.StandardClause).order_by(models.StandardClause.id)
+        if not args.all:
+            query = query.filter(models.StandardClause.commentary.is_(None))
+        for clause in query.all():
+            commentary = asyncio.run(generate_commentary(clause))
+            if not commentary:
+                raise SystemExit("GPT is not available (set OPENAI_API_KEY)")
+            clause.commentary, clause.commentary_date = commentary, datetime.utcnow()
+            db.commit()
+            done += 1
+            print(f"  {clause.id}: {clause.title}")
+    finally:
+        db.close()
+    print(f"Cached commentary for {done} standard clauses")
+
+
+def cmd_apply(args) -> None:
+    db = SessionLocal()
+    done = recognized = 0
+    start = time.perf_counter()
+    try:
+        after_id = 0
+        while True:
+            batch = (
+                db.query(models.Contract)
+                .filter(models.Contract.id > after_id)
+                .order_by(models.Contract.id)
+                .limit(args.batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for contract in batch:
+                if not contract.clauses:
+                    contract.clauses = [models.ContractClause.from_clause(c) for c in segment(contract.text)]
+                recognized += recognize(db, contract)
+            db.commit()
+            done += len(batch)
+            after_id = batch[-1].id
+            db.expunge_all()
+            print(f"  {done} contracts  {done / (time.perf_counter() - start):.1f} contracts/s")
+    finally:
+        db.close()
+    print(f"Matched {recognized} clauses in {done} contracts")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    suggest = commands.add_parser("suggest")
+    suggest.set_defaults(fn=cmd_suggest)
+    suggest.add_argument("--min-contracts", type=int, default=5, help="report clauses found in at least this many contracts")
+    suggest.add_argument("--top", type=int, default=20)
+    suggest.add_argument("--width", type=int, default=160, help="characters of each clause to print")
+    imports = commands.add_parser("import")
+    imports.set_defaults(fn=cmd_import)
+    imports.add_argument("file", help="JSONL file of standard clauses")
+    commentary = commands.add_parser("commentary")
+    commentary.set_defaults(fn=cmd_commentary)
+    commentary.add_argument("--all", action="store_true", help="regenerate existing commentary too")
+    apply = commands.add_parser("apply")
+    apply.set_defaults(fn=cmd_apply)
+    apply.add_argument("--batch-size", type=int, default=200, help="contracts per transaction")
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
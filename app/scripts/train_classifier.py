@@ -0,0 +1,164 @@
+"""Train, evaluate and apply the clause classifier (see app.classifier).
+
+Training examples are the clauses of stored contracts, labelled with the
+categories of the rule flags that start in them, plus optional JSONL files
+of hand-labelled clauses ({"text": ..., "categories": [...]}) -- the place
+for paraphrases the rules miss. A deterministic 20% of examples is held out
+and reported per category before the model is saved.
+
+    python -m app.scripts.train_classifier train --data labelled.jsonl
+    python -m app.scripts.train_classifier eval --data labelled.jsonl
+    python -m app.scripts.train_classifier score      # re-score stored contracts
+"""
+import argparse
+import json
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+from app import models
+from app.analyzer import current_categories
+from app.classifier import CLASSIFIER_MODEL_PATH, DEFAULT_HASH_BITS, ClauseModel, classify_clauses, evaluate, train
+from app.database import SessionLocal
+from app.segmenter import clause_at, own_spans, segment
+
+Example = Tuple[str, List[str]]
+
+
+def _stored_examples(limit: Optional[int]) -> List[Example]:
+    examples: List[Example] = []
+    db = SessionLocal()
+    try:
+        query = db.query(models.Contract).order_by(models.Contract.id)
+        if limit:
+            query = query.limit(limit)
+        for contract in query.yield_per(200):
+            clauses = [c.to_clause() for c in contract.clauses] or segment(contract.text)
+            if not clauses:
+                continue
+            starts = [c.start for c in clauses]
+            labels = {}
+            for flag in contract.flags:
+                if flag.start_index is None:
+                    continue
+                clause = clause_at(clauses, flag.start_index, starts)
+                if clause is not None:
+                    labels.setdefault(clause.ordinal, set()).add(flag.category)
+            for ordinal, start, end in own_spans(clauses):
+                text = contract.text[start:end].strip()
+                if text:
+                    examples.append((text, sorted(labels.get(ordinal, ()))))
+    finally:
+        db.close()
+    return examples
+
+
+def _file_examples(paths: List[str]) -> List[Example]:
+    examples: List[Example] = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    examples.append((row["text"], list(row.get("categories", []))))
+    return examples
+
+
+def _is_holdout(text: str, fraction: float) -> bool:
+    return zlib.crc32(text.encode("utf-8")) % 1000 < fraction * 1000
+
+
+def _print_report(report: dict) -> None:
+    print(f"  {'category':<40} {'precision':>9} {'recall':>7} {'f1':>6} {'support':>8}")
+    for name, row in report.items():
+        print(f"  {name:<40} {row['precision']:9.3f} {row['recall']:7.3f} {row['f1']:6.3f} {row['support']:8d}")
+
+
+def _examples(args) -> List[Example]:
+    examples = ([] if args.no_db else _stored_examples(args.limit)) + _file_examples(args.data)
+    positives = sum(1 for _, labels in examples if labels)
+    print(f"{len(examples)} clauses ({positives} flagged)")
+    return examples
+
+
+def cmd_train(args) -> None:
+    examples = _examples(args)
+    train_set = [e for e in examples if not _is_holdout(e[0], args.holdout)]
+    test_set = [e for e in examples if _is_holdout(e[0], args.holdout)]
+    if not train_set:
+        raise SystemExit("No training examples: store some contracts or pass --data")
+    categories = sorted(set(current_categories().values()) | {c for _, labels in examples for c in labels})
+    start = time.perf_counter()
+    model = train([t for t, _ in train_set], [l for _, l in train_set], categories, bits=args.bits, epochs=args.epochs)
+    print(f"Trained on {len(train_set)} clauses in {time.perf_counter() - start:.1f}s (model {model.version})")
+    if test_set:
+        print(f"Held-out evaluation ({len(test_set)} clauses):")
+        _print_report(evaluate(model, [t for t, _ in test_set], [l for _, l in test_set]))
+    model.save(args.out)
+    print(f"Saved {args.out}")
+
+
+def cmd_eval(args) -> None:
+    model = ClauseModel.load(args.model)
+    examples = _examples(args)
+    _print_report(evaluate(model, [t for t, _ in examples], [l for _, l in examples], threshold=args.threshold))
+
+
+def cmd_score(args) -> None:
+    model = ClauseModel.load(args.model)
+    db = SessionLocal()
+    done = 0
+    start = time.perf_counter()
+    try:
+        after_id = 0
+        while True:
+            batch = (
+                db.query(models.Contract)
+                .filter(models.Contract.id > after_id)
+                .order_by(models.Contract.id)
+                .limit(args.batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for contract in batch:
+                if not contract.clauses:
+                    contract.clauses = [models.ContractClause.from_clause(c) for c in segment(contract.text)]
+                classify_clauses(contract.text, [c.to_clause() for c in contract.clauses], model).apply(contract)
+            db.commit()
+            done += len(batch)
+            after_id = batch[-1].id
+            db.expunge_all()
+            print(f"  {done} contracts  {done / (time.perf_counter() - start):.1f} contracts/s")
+    finally:
+        db.close()
+    print(f"Scored {done} contracts with model {model.version}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, fn in (("train", cmd_train), ("eval", cmd_eval), ("score", cmd_score)):
+        sub = commands.add_parser(name)
+        sub.set_defaults(fn=fn)
+        if name in ("train", "eval"):
+            sub.add_argument("--data", action="append", default=[], help="JSONL file of labelled clauses (repeatable)")
+            sub.add_argument("--no-db", action="store_true", help="use only --data, not stored contracts")
+            sub.add_argument("--limit", type=int, default=0, help="at most this many stored contracts")
+        if name == "train":
+            sub.add_argument("--out", default=CLASSIFIER_MODEL_PATH, help="model file to write")
+            sub.add_argument("--bits", type=int, default=DEFAULT_HASH_BITS, help="feature hash size (2^bits buckets)")
+            sub.add_argument("--epochs", type=int, default=8)
+            sub.add_argument("--holdout", type=float, default=0.2, help="fraction of clauses held out for evaluation")
+        else:
+            sub.add_argument("--model", default=CLASSIFIER_MODEL_PATH, help="model file to use")
+        if name == "eval":
+            sub.add_argument("--threshold", type=float, default=0.5)
+        if name == "score":
+            sub.add_argument("--batch-size", type=int, default=200, help="contracts per transaction")
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
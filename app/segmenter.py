@@ -0,0 +1,196 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+# "1.", "4.2", "Section 3", "Article IV.", "12)" at the start of a line (a bare
+# "12" needs the prefix)
+_NUMBERED = re.compile(
+	r"[ \t]*(?P<prefix>(?:section|article|clause)[ \t]+)?"
+	r"(?P<number>\d{1,3}(?:\.\d{1,3})*|[IVXLC]{1,6}(?=[.)]))(?P<punct>[.)]?)(?:[ \t]+|$)(?P<rest>.*)",
+	re.IGNORECASE,
+)
+# "(a)", "(iv)" sub-clauses
+_LETTERED = re.compile(r"[ \t]*\((?P<number>[a-z]{1,2}|[ivx]{1,5})\)[ \t]+(?P<rest>.*)")
+# "Term. The term of ..." -> "Term"
+_TITLE = re.compile(r"([A-Z][^.:;\n]{0,60}?)[.:](?:\s|$)")
+_SIGNATURE = re.compile(r"[ \t]*(?:in witness whereof|signature:|signed:|by:[ \t]*_{3,}|_{8,})", re.IGNORECASE)
+_WORD = re.compile(r"[a-z]{3,}")
+
+_STOPWORDS = frozenset(
+	"the and for are but not you your with this that from have has can will what when does which who how its any "
+	"all our their they them than then there would could should about into under over such shall may".split()
+)
+
+HEADING_MAX_CHARS = 80
+
+
+@dataclass
+class Clause:
+	"""One node of a contract's clause tree. Offsets index the contract text;
+	a clause's span includes its children."""
+	ordinal: int
+	parent: Optional[int]
+	kind: str  # heading, section, paragraph, signature
+	depth: int
+	start: int
+	end: int
+	number: Optional[str] = None
+	heading: Optional[str] = None
+
+
+def _is_heading(line: str) -> bool:
+	stripped = line.strip()
+	if not 3 <= len(stripped) <= HEADING_MAX_CHARS or stripped[-1] in ".,;":
+		return False
+	letters = [c for c in stripped if c.isalpha()]
+	return len(letters) >= 3 and stripped.upper() == stripped
+
+
+def _number_depth(number: str) -> int:
+	return number.count(".") + 1
+
+
+def segment(text: str) -> List[Clause]:
+	"""Split contract text into a clause tree in one pass over its lines.
+
+	Numbered lines open sections nested by their numbering ("4.2" under "4"),
+	"(a)" lines open sub-clauses of the current section, all-caps lines are
+	headings, and blank-line separated text outside any section becomes
+	paragraphs. Everything from "IN WITNESS WHEREOF" or a signature line on is
+	one signature block. Clauses are returned in document order (parents
+	before children), ordinals numbered from 0.
+	"""
+	clauses: List[Clause] = []
+	stack: List[Clause] = []  # open clauses, outermost first
+	pos = 0
+	last_text_end = 0  # end of the last non-blank line, for trimming spans
+	blank_before = True
+	in_signature = False
+	sub_clauses = set()  # ordinals of "(a)" clauses, which nest under the numbered section
+
+	def heading_depth() -> int:
+		return 1 if any(c.kind == "heading" for c in stack) else 0
+
+	def close(depth: int) -> None:
+		while stack and (stack[-1].depth >= depth or stack[-1].kind == "paragraph"):
+			stack.pop().end = last_text_end
+
+	def open_clause(kind: str, depth: int, start: int, number: Optional[str] = None, heading: Optional[str] = None) -> None:
+		close(depth)  # also ends any open paragraph
+		clause = Clause(len(clauses), stack[-1].ordinal if stack else None, kind, depth, start, start, number, heading)
+		clauses.append(clause)
+		stack.append(clause)
+
+	for line in text.splitlines(keepends=True):
+		start = pos
+		pos += len(line)
+		content = line.rstrip()
+		if not content.strip():
+			blank_before = True
+			continue
+		start += len(content) - len(content.lstrip())
+		if not in_signature:
+			numbered = _NUMBERED.match(content)
+			if numbered and not (numbered.group("prefix") or numbered.group("punct") or "." in numbered.group("number")):
+				numbered = None  # "60 days after ..." wrapped onto a new line
+			lettered = None if numbered else _LETTERED.match(content)
+			if _SIGNATURE.match(content):
+				in_signature = True
+				open_clause("signature", 0, start, heading="Signatures")
+			elif numbered and (numbered.group("rest") or blank_before):
+				number = numbered.group("number")
+				rest = numbered.group("rest").strip()
+				title = _TITLE.match(rest)
+				if title:
+					heading = title.group(1).strip()
+				elif rest and len(rest) <= HEADING_MAX_CHARS and rest[-1] not in ".,;":
+					heading = rest
+				else:
+					heading = None
+				# Sections hang below the nearest heading
+				open_clause("section", heading_depth() + _number_depth(number), start, number, heading)
+			elif lettered and any(c.kind == "section" and c.ordinal not in sub_clauses for c in stack):
+				parent = next(c for c in reversed(stack) if c.kind == "section" and c.ordinal not in sub_clauses)
+				sub_clauses.add(len(clauses))
+				open_clause("section", parent.depth + 1, start, lettered.group("number"))
+			elif _is_heading(content):
+				open_clause("heading", 0, start, heading=content.strip())
+			elif blank_before and not (stack and stack[-1].kind == "section"):
+				open_clause("paragraph", heading_depth(), start)
+			elif not stack:
+				open_clause("paragraph", 0, start)
+		last_text_end = start + len(content.strip())
+		blank_before = False
+	close(0)
+	return clauses
+
+
+def clause_at(clauses: List[Clause], offset: int, _starts: Optional[List[int]] = None) -> Optional[Clause]:
+	"""Innermost clause containing offset."""
+	starts = _starts if _starts is not None else [c.start for c in clauses]
+	i = bisect_right(starts, offset) - 1
+	clause = clauses[i] if i >= 0 else None
+	while clause is not None and offset >= clause.end:
+		clause = clauses[clause.parent] if clause.parent is not None else None
+	return clause
+
+
+def attach_clauses(flags: Iterable[dict], clauses: List[Clause]) -> None:
+	"""Set clause_ordinal on analyzer flag dicts to the clause each starts in."""
+	starts = [c.start for c in clauses]
+	for flag in flags:
+		clause = clause_at(clauses, flag["start_index"], starts) if flag.get("start_index") is not None else None
+		flag["clause_ordinal"] = clause.ordinal if clause is not None else None
+
+
+def own_spans(clauses: List[Clause]) -> List[Tuple[int, int, int]]:
+	"""(ordinal, start, end) of each clause's own text, up to its first child.
+	Unlike full clause spans these never overlap."""
+	spans = []
+	for i, clause in enumerate(clauses):
+		end = clause.end
+		if i + 1 < len(clauses) and clauses[i + 1].parent == clause.ordinal:
+			end = min(end, clauses[i + 1].start)
+		if end > clause.start:
+			spans.append((clause.ordinal, clause.start, end))
+	return spans
+
+
+def question_scores(text: str, clauses: List[Clause], question: str) -> Dict[int, float]:
+	"""Score clauses by how many of the question's terms their own text contains."""
+	terms = {w for w in _WORD.findall(question.lower()) if w not in _STOPWORDS}
+	scores = {}
+	for ordinal, start, end in own_spans(clauses):
+		body = text[start:end].lower()
+		hits = sum(1 for term in terms if term in body)
+		if hits:
+			scores[ordinal] = hits
+	return scores
+
+
+def select_context(text: str, clauses: List[Clause], scores: Dict[int, float], budget: int) -> str:
+	"""Whole clauses (own text) that fit in budget chars, best scored first and
+	returned in document order; unscored clauses fill what is left, in order."""
+	spans = own_spans(clauses)
+	if not spans:
+		return text[:budget]
+	ranked = sorted(range(len(spans)), key=lambda i: (-scores.get(spans[i][0], 0), i))
+	chosen, used = [], 0
+	for i in ranked:
+		size = spans[i][2] - spans[i][1]
+		if used + size <= budget:
+			chosen.append(i)
+			used += size
+	if not chosen:  # a single clause larger than the budget
+		_, start, _ = spans[ranked[0]]
+		return text[start:start + budget]
+	parts = []
+	previous = None
+	for i in sorted(chosen):
+		if previous is not None and i != previous + 1:
+			parts.append("[...]")
+		_, start, end = spans[i]
+		parts.append(text[start:end].strip())
+		previous = i
+	return "\n\n".join(parts)
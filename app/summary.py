@@ -0,0 +1,117 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from . import models
+
+ALL = "*"
+DEFAULT_STATUS = "hold"
+
+
+def _pairs(flags: Iterable) -> Iterable[Tuple[str, str]]:
+	"""(category, severity) for analyzer dicts and ClauseFlag rows alike."""
+	for f in flags:
+		if isinstance(f, dict):
+			yield f["category"], f["severity"]
+		else:
+			yield f.category, f.severity
+
+
+def contract_deltas(flags: Iterable) -> Dict[Tuple[str, str], Tuple[int, int]]:
+	"""Map (category, severity) -> (flag_count, contract_count) for one contract."""
+	by_cell = Counter(_pairs(flags))
+	by_severity = Counter()
+	for (_, severity), n in by_cell.items():
+		by_severity[severity] += n
+	deltas = {cell: (n, 1) for cell, n in by_cell.items()}
+	for severity, n in by_severity.items():
+		deltas[(ALL, severity)] = (n, 1)
+	deltas[(ALL, ALL)] = (sum(by_cell.values()), 1)
+	return deltas
+
+
+_UPSERTS: Dict[str, object] = {}
+
+
+def _upsert_statement(dialect: str):
+	"""INSERT ... ON CONFLICT adding the inserted deltas to the existing counts.
+
+	Built once per dialect and run as executemany with one parameter set per cell.
+	"""
+	stmt = _UPSERTS.get(dialect)
+	if stmt is None:
+		if dialect == "sqlite":
+			from sqlalchemy.dialects.sqlite import insert
+		else:
+			from sqlalchemy.dialects.postgresql import insert
+		table = models.RiskSummary.__table__
+		stmt = insert(table)
+		stmt = stmt.on_conflict_do_update(
+			index_elements=["user_id", "status", "category", "severity"],
+			set_={
+				"flag_count": table.c.flag_count + stmt.excluded.flag_count,
+				"contract_count": table.c.contract_count + stmt.excluded.contract_count,
+			},
+		)
+		_UPSERTS[dialect] = stmt
+	return stmt
+
+
+def _apply_rows(db: Session, rows: List[dict]) -> None:
+	dialect = db.get_bind().dialect.name
+	if dialect in ("sqlite", "postgresql"):
+		db.execute(_upsert_statement(dialect), rows)
+		return
+	for values in rows:
+		key = (values["user_id"], values["status"], values["category"], values["severity"])
+		row = db.get(models.RiskSummary, key)
+		if row is None:
+			db.add(models.RiskSummary(**values))
+		else:
+			row.flag_count += values["flag_count"]
+			row.contract_count += values["contract_count"]
+
+
+def apply_contract(db: Session, user_id: Optional[int], status: Optional[str], flags: Iterable, sign: int = 1) -> None:
+	"""Add (sign=1) or remove (sign=-1) one contract's flags from its owner's counters.
+
+	Runs in the caller's session so counters commit or roll back with the flags.
+	"""
+	if user_id is None:
+		return
+	status = status or DEFAULT_STATUS
+	rows = [
+		{"user_id": user_id, "status": status, "category": category, "severity": severity, "flag_count": sign * n_flags, "contract_count": sign * n_contracts}
+		for (category, severity), (n_flags, n_contracts) in contract_deltas(flags).items()
+	]
+	_apply_rows(db, rows)
+
+
+def move_contract(db: Session, contract: models.Contract, old_status: Optional[str], new_status: Optional[str]) -> None:
+	"""Shift a contract's counters from one status to another."""
+	if (old_status or DEFAULT_STATUS) == (new_status or DEFAULT_STATUS):
+		return
+	flags = list(contract.flags)
+	apply_contract(db, contract.user_id, old_status, flags, sign=-1)
+	apply_contract(db, contract.user_id, new_status, flags, sign=1)
+
+
+def get_user_summary(db: Session, user_id: int) -> dict:
+	"""Group the user's counter rows by status; touches O(statuses x categories) rows."""
+	rows = (
+		db.query(models.RiskSummary)
+		.filter(models.RiskSummary.user_id == user_id, models.RiskSummary.contract_count > 0)
+		.all()
+	)
+	statuses: Dict[str, dict] = {}
+	for row in rows:
+		entry = statuses.setdefault(row.status, {"status": row.status, "contract_count": 0, "flag_count": 0, "by_severity": {}, "by_category": []})
+		counts = {"flag_count": row.flag_count, "contract_count": row.contract_count}
+		if row.category == ALL and row.severity == ALL:
+			entry.update(counts)
+		elif row.category == ALL:
+			entry["by_severity"][row.severity] = counts
+		else:
+			entry["by_category"].append({"category": row.category, "severity": row.severity, **counts})
+	for entry in statuses.values():
+		entry["by_category"].sort(key=lambda c: (-c["flag_count"], c["category"]))
+	return {"statuses": sorted(statuses.values(), key=lambda e: e["status"])}
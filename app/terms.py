@@ -0,0 +1,227 @@
+"""Structured contract terms: durations, payment days, money, dates, territory.
+
+extract_terms() makes one pass of a combined pattern over the normalized
+text and turns each match into a typed Term. What a duration or date means
+(contract term, payment window, effective or expiry date) is decided from
+the words just before it. Offsets refer to the original text.
+"""
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional
+import re
+
+from .normalize import normalize
+from .segmenter import Clause, clause_at
+
+# Kinds stored in contract_terms.kind
+TERM_LENGTH = "term_length"  # number = days (None when perpetual)
+PAYMENT_DAYS = "payment_days"  # number = days
+DURATION = "duration"  # any other period (non-compete, notice, ...), number = days
+FEE = "fee"  # number = amount, unit = currency
+EFFECTIVE_DATE = "effective_date"
+EXPIRY_DATE = "expiry_date"
+DATE = "date"  # a date with no telling context
+TERRITORY = "territory"
+
+_SMALL = "one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen seventeen eighteen nineteen".split()
+_TENS = "twenty thirty forty fifty sixty seventy eighty ninety".split()
+_WORD_VALUES = {word: i + 1 for i, word in enumerate(_SMALL)}
+_WORD_VALUES.update({word: 20 + 10 * i for i, word in enumerate(_TENS)})
+
+_NUMBER = (
+	r"(?:\d{1,4}|(?:" + "|".join(_TENS) + r")(?:[- ](?:" + "|".join(_SMALL[:9]) + r"))?|" + "|".join(reversed(_SMALL)) + r")"
+	r"(?:[ ]?\(\d{1,4}\))?"  # "thirty (30)"
+)
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]
+_MONTH = r"(?:" + "|".join(m + ("" if len(m) <= 4 else "|" + m[:3]) for m in _MONTHS) + r"|sept)\.?"
+_CURRENCY_SYMBOLS = {"$": "USD", "us$": "USD", "usd": "USD", "€": "EUR", "eur": "EUR", "£": "GBP", "gbp": "GBP",
+	"dollars": "USD", "euros": "EUR", "pounds": "GBP"}
+_AMOUNT = r"\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?"
+_SCALE = {"thousand": 1_000, "k": 1_000, "million": 1_000_000, "m": 1_000_000}
+
+_TERMS = re.compile(
+	r"\bnet[ -]?(?P<net>\d{1,3})\b"
+	r"|(?P<perpetual>\bin perpetuity\b|\bperpetual(?:ly)?\b)"
+	r"|\b(?P<dur_n>" + _NUMBER + r") (?P<dur_unit>(?:business |calendar )?(?:day|week|month|year))s?\b"
+	r"|(?P<cur>us\$|\$|€|£|\b(?:usd|eur|gbp)\b) ?(?P<amount>" + _AMOUNT + r")(?: ?(?P<scale>million|thousand|k|m)\b)?"
+	r"|\b(?P<amount2>" + _AMOUNT + r")(?: (?P<scale2>million|thousand))? (?P<cur2>dollars|euros|pounds|usd|eur|gbp)\b"
+	r"|\b(?P<m_month>" + _MONTH + r") (?P<m_day>\d{1,2})(?:st|nd|rd|th)?,? (?P<m_year>\d{4})\b"
+	r"|\b(?P<d_day>\d{1,2})(?:st|nd|rd|th)? (?:day of )?(?P<d_month>" + _MONTH + r"),? (?P<d_year>\d{4})\b"
+	r"|\b(?P<iso>\d{4}-\d{2}-\d{2})\b"
+	r"|\b(?P<us>\d{1,2}/\d{1,2}/(?:\d{4}|\d{2}))\b"  # month/day/year
+	r"|\bthroughout the (?:entire )?(?P<terr_world>universe|world)\b|\b(?P<terr_wide>world-?wide)\b"
+	r"|\bterritory(?: shall be| is| means|:)? (?:the )?(?P<terr_name>(?-i:[A-Z][A-Za-z]+(?: (?:of )?[A-Z][A-Za-z]+){0,4}))",
+	re.IGNORECASE,
+)
+
+# Context read backwards from a match, up to this many chars within its sentence
+CONTEXT_CHARS = 80
+_TERM_CONTEXT = re.compile(r"\b(?:term|period of|continue for|remain in (?:full )?(?:force|effect)(?: and effect)? for|ends?|expires?)\b", re.IGNORECASE)
+# A period of notice, cure or payment right before the number is not the contract's term
+_OTHER_PERIOD = re.compile(r"\b(?:notice|cure|grace|payment)\s+period\s+of\b[^.;]{0,20}$", re.IGNORECASE)
+# Nor is one that runs after it ("for 12 months thereafter", "24 months following
+# expiration"), or a non-compete or surviving obligation's
+_AFTER_TERM = re.compile(r"\s*(?:thereafter|(?:after|following|beyond|from) (?:the )?(?:expiration|expiry|termination|end)\b)", re.IGNORECASE)
+_RESTRICTION = re.compile(r"\b(?:non-?compet|compet|solicit|surviv)", re.IGNORECASE)
+# Words that name the agreement's own term; the expiry date is derived from
+# the first term length after one of them, else from the first term length
+_AGREEMENT_TERM = re.compile(
+	r"\b(?:(?:the|this|its|initial|original) term(?: of (?:this|the) (?:agreement|contract))?(?: (?:is|shall be|will be|of))?"
+	r"|continue for|remain in (?:full )?(?:force|effect)(?: and effect)? for)\b[^.;]{0,30}$",
+	re.IGNORECASE,
+)
+_PAYMENT_CONTEXT = re.compile(r"\b(?:pay|paid|payable|payment|invoice|remit)", re.IGNORECASE)
+_PAYMENT_AFTER = re.compile(r" (?:of|after|from|following) (?:the )?(?:receipt|invoice|date of invoice|acceptance|delivery)", re.IGNORECASE)
+_DATE_CONTEXT = re.compile(
+	r"(?P<effective>\beffective|\bcommenc|\bstart|\bbegin|\bdated\b|\bas of\b|\bentered into\b|\bmade on\b)"
+	r"|(?P<expiry>\bexpir|\bterminat|\bends?\b|\bend on\b|\buntil\b|\bthrough\b|\bno later than\b)",
+	re.IGNORECASE,
+)
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+
+@dataclass
+class Term:
+	kind: str
+	value: str  # canonical text: "12 months", "USD 5000.00", "2025-01-31", "worldwide"
+	number: Optional[float] = None
+	unit: Optional[str] = None
+	date: Optional[date] = None
+	start: Optional[int] = None  # offsets into the original text; None when derived
+	end: Optional[int] = None
+	clause_ordinal: Optional[int] = None
+
+
+def _number(text: str) -> int:
+	"""30 for "30", "thirty" and "thirty (30)"."""
+	digits = re.search(r"\d+", text)
+	if digits:
+		return int(digits.group())
+	words = re.split(r"[- ]", text.lower())
+	return sum(_WORD_VALUES.get(w, 0) for w in words)
+
+
+def _month(name: str) -> int:
+	name = name.lower().rstrip(".")[:3]
+	return next(i + 1 for i, m in enumerate(_MONTHS) if m.startswith(name))
+
+
+def _date(year: int, month: int, day: int) -> Optional[date]:
+	if year < 100:
+		year += 2000
+	try:
+		return date(year, month, day)
+	except ValueError:
+		return None
+
+
+def add_period(start: date, count: int, unit: str) -> date:
+	"""start + count units, by the calendar for months and years."""
+	if unit in ("day", "week"):
+		return date.fromordinal(start.toordinal() + count * _UNIT_DAYS[unit])
+	months = start.month - 1 + count * (12 if unit == "year" else 1)
+	year, month = start.year + months // 12, months % 12 + 1
+	return date(year, month, min(start.day, monthrange(year, month)[1]))
+
+
+def _context(text: str, start: int) -> str:
+	"""Up to CONTEXT_CHARS before start, not crossing a sentence end."""
+	window = text[max(0, start - CONTEXT_CHARS):start]
+	cut = max(window.rfind(". "), window.rfind("; "))
+	return window[cut + 2:] if cut >= 0 else window
+
+
+def extract_terms(text: str, clauses: Optional[List[Clause]] = None) -> List[Term]:
+	"""Typed terms found in text, in document order. With the contract's
+	clauses, each term gets the ordinal of the clause it starts in.
+
+	An expiry date is derived from the effective date and the term length
+	when the text states no expiry itself.
+	"""
+	normalized = normalize(text or "")
+	norm = normalized.text
+	terms: List[Term] = []
+	# (count, unit) of the term lengths that name the agreement's term, and of
+	# the first term length, for the derived expiry date
+	named_period = first_period = None
+	for m in _TERMS.finditer(norm):
+		kind = m.lastgroup
+		group = m.groupdict()
+		context = _context(norm, m.start())
+		term = None
+		if group["net"] is not None:
+			days = int(group["net"])
+			term = Term(PAYMENT_DAYS, f"net {days}", days, "days")
+		elif group["perpetual"] is not None:
+			term = Term(TERM_LENGTH, "perpetual")
+		elif group["dur_n"] is not None:
+			count = _number(group["dur_n"])
+			unit = group["dur_unit"].split()[-1].lower()
+			if not count:
+				continue
+			value = f"{count} {group['dur_unit'].lower()}{'s' if count != 1 else ''}"
+			days = count * _UNIT_DAYS[unit]
+			after = norm[m.end():m.end() + 40]
+			sentence_after = re.split(r"[.;]", after, 1)[0]
+			if unit == "day" and (_PAYMENT_CONTEXT.search(context) or _PAYMENT_AFTER.match(after)):
+				term = Term(PAYMENT_DAYS, value, days, "days")
+			elif (
+				_TERM_CONTEXT.search(context) and not _OTHER_PERIOD.search(context) and not _AFTER_TERM.match(after)
+				and not _RESTRICTION.search(context) and not _RESTRICTION.search(sentence_after)
+			):
+				term = Term(TERM_LENGTH, value, days, "days")
+				if "business" not in value:
+					if named_period is None and _AGREEMENT_TERM.search(context):
+						named_period = (count, unit)
+					if first_period is None:
+						first_period = (count, unit)
+			else:
+				term = Term(DURATION, value, days, "days")
+		elif group["amount"] is not None or group["amount2"] is not None:
+			amount = float((group["amount"] or group["amount2"]).replace(",", ""))
+			scale = (group["scale"] or group["scale2"] or "").lower()
+			amount *= _SCALE.get(scale, 1)
+			currency = _CURRENCY_SYMBOLS[(group["cur"] or group["cur2"]).lower()]
+			term = Term(FEE, f"{currency} {amount:.2f}", amount, currency)
+		elif kind in ("m_year", "d_year", "iso", "us"):
+			if group["iso"]:
+				year, month, day = (int(part) for part in group["iso"].split("-"))
+			elif group["us"]:
+				month, day, year = (int(part) for part in group["us"].split("/"))
+			elif group["m_year"]:
+				year, month, day = int(group["m_year"]), _month(group["m_month"]), int(group["m_day"])
+			else:
+				year, month, day = int(group["d_year"]), _month(group["d_month"]), int(group["d_day"])
+			value = _date(year, month, day)
+			if value is None:
+				continue
+			last = None
+			for hint in _DATE_CONTEXT.finditer(context):
+				last = hint.lastgroup
+			kind = {"effective": EFFECTIVE_DATE, "expiry": EXPIRY_DATE}.get(last, DATE)
+			term = Term(kind, value.isoformat(), date=value)
+		elif group["terr_world"] is not None or group["terr_wide"] is not None:
+			term = Term(TERRITORY, "universe" if (group["terr_world"] or "").lower() == "universe" else "worldwide")
+		elif group["terr_name"] is not None:
+			term = Term(TERRITORY, group["terr_name"])
+		if term is None:
+			continue
+		term.start, term.end = normalized.to_original(m.start(), m.end())
+		terms.append(term)
+
+	kinds = {t.kind for t in terms}
+	term_period = named_period or first_period
+	if EXPIRY_DATE not in kinds and term_period is not None:
+		effective = next((t for t in terms if t.kind == EFFECTIVE_DATE), None)
+		if effective is not None:
+			expiry = add_period(effective.date, *term_period)
+			terms.append(Term(EXPIRY_DATE, expiry.isoformat(), date=expiry))
+
+	if clauses:
+		starts = [c.start for c in clauses]
+		for term in terms:
+			if term.start is not None:
+				clause = clause_at(clauses, term.start, starts)
+				term.clause_ordinal = clause.ordinal if clause is not None else None
+	return terms
@@ -0,0 +1,232 @@
+"""Tesseract through its C API, with engines kept initialized between pages.
+
+pytesseract runs the tesseract program once per image: it writes the image
+to a temporary PNG, and the program starts, loads the language model,
+decodes the PNG, recognizes the page and exits. Here an engine is a
+TessBaseAPI handle of libtesseract (through ctypes, no extra package) that
+loads its language once and is handed the page's raw pixels.
+
+Engines are pooled per language, at most CG_OCR_ENGINES (default: 2) per
+language in each process, and each is used by one thread at a time; a page
+waits for a free engine. Without libtesseract, or with CG_OCR_ENGINE=cli,
+app.ocr uses pytesseract as before. CG_TESSERACT_LIBRARY names the library
+file when it is not found on the library path.
+"""
+from contextlib import contextmanager
+from ctypes import CDLL, POINTER, c_char_p, c_int, c_void_p, string_at
+from ctypes.util import find_library
+from typing import Dict, Iterator, List, Optional, Set
+import atexit
+import glob
+import os
+import threading
+
+from PIL import Image
+
+ENGINE = os.environ.get("CG_OCR_ENGINE", "api")
+ENGINES_PER_LANGUAGE = int(os.environ.get("CG_OCR_ENGINES", "2"))
+LIBRARY = os.environ.get("CG_TESSERACT_LIBRARY") or None
+
+PSM_AUTO = 3
+OEM_DEFAULT = 3
+# Where tessdata is usually installed, for listing packs when no engine starts
+TESSDATA_DIRS = [
+	"/usr/share/tesseract-ocr/*/tessdata", "/usr/share/tessdata", "/usr/local/share/tessdata",
+	"/opt/homebrew/share/tessdata", "/usr/local/share/tesseract-ocr/*/tessdata",
+]
+_BYTES_PER_PIXEL = {"1": 0, "L": 1, "RGB": 3, "RGBA": 4}  # 0: binary, 1 bit a pixel
+
+_lib = None
+_lib_loaded = False
+_lib_lock = threading.Lock()
+
+
+def _load():
+	"""libtesseract with its C API declared, or None when it is not installed."""
+	global _lib, _lib_loaded
+	with _lib_lock:
+		if not _lib_loaded:
+			_lib_loaded = True
+			path = LIBRARY or find_library("tesseract")
+			if path is None:
+				print("[ocr] libtesseract not found; running the tesseract program per page")
+				return None
+			try:
+				lib = CDLL(path)
+				lib.TessVersion.restype = c_char_p
+				lib.TessBaseAPICreate.restype = c_void_p
+				lib.TessBaseAPIDelete.argtypes = [c_void_p]
+				lib.TessBaseAPIInit2.argtypes = [c_void_p, c_char_p, c_char_p, c_int]
+				lib.TessBaseAPIInit2.restype = c_int
+				lib.TessBaseAPISetPageSegMode.argtypes = [c_void_p, c_int]
+				lib.TessBaseAPISetImage.argtypes = [c_void_p, c_char_p, c_int, c_int, c_int, c_int]
+				lib.TessBaseAPISetSourceResolution.argtypes = [c_void_p, c_int]
+				lib.TessBaseAPIGetUTF8Text.argtypes = [c_void_p]
+				lib.TessBaseAPIGetUTF8Text.restype = c_void_p
+				lib.TessDeleteText.argtypes = [c_void_p]
+				lib.TessBaseAPIClear.argtypes = [c_void_p]
+				lib.TessBaseAPIEnd.argtypes = [c_void_p]
+				lib.TessBaseAPIGetAvailableLanguagesAsVector.argtypes = [c_void_p]
+				lib.TessBaseAPIGetAvailableLanguagesAsVector.restype = POINTER(c_char_p)
+				lib.TessDeleteTextArray.argtypes = [POINTER(c_char_p)]
+				print(f"[ocr] Using libtesseract {lib.TessVersion().decode()} ({path})")
+				_lib = lib
+			except (OSError, AttributeError) as e:
+				print(f"[ocr] Could not load libtesseract from {path}: {e}; running the tesseract program per page")
+		return _lib
+
+
+def available() -> bool:
+	"""Whether pages are read by pooled engines (else by pytesseract)."""
+	return ENGINE == "api" and _load() is not None
+
+
+def version() -> Optional[str]:
+	lib = _load()
+	return lib.TessVersion().decode() if lib is not None else None
+
+
+class TesseractEngine:
+	"""One initialized TessBaseAPI; not safe to use from two threads at once."""
+
+	def __init__(self, lang: str, oem: int = OEM_DEFAULT):
+		self._lib = _load()
+		if self._lib is None:
+			raise RuntimeError("libtesseract is not available")
+		self.lang = lang
+		self._handle = self._lib.TessBaseAPICreate()
+		if self._lib.TessBaseAPIInit2(self._handle, None, lang.encode(), oem) != 0:
+			self._lib.TessBaseAPIDelete(self._handle)
+			self._handle = None
+			raise RuntimeError(f"Tesseract could not load language {lang!r} with engine mode {oem}")
+
+	def read(self, image: Image.Image, psm: int = PSM_AUTO, dpi: Optional[int] = None) -> str:
+		"""Text of a page image, passed to Tesseract as raw pixels. Binarized pages
+		(mode "1") go as packed bits, which Tesseract reads without thresholding again."""
+		if image.mode not in _BYTES_PER_PIXEL:
+			image = image.convert("L")
+		bpp = _BYTES_PER_PIXEL[image.mode]
+		# Pillow packs mode "1" rows the way Tesseract takes binary images: MSB first, 1 = white
+		row_bytes = (image.width + 7) // 8 if bpp == 0 else image.width * bpp
+		pixels = image.tobytes()
+		lib, handle = self._lib, self._handle
+		lib.TessBaseAPISetPageSegMode(handle, psm)
+		lib.TessBaseAPISetImage(handle, pixels, image.width, image.height, bpp, row_bytes)
+		if dpi:
+			lib.TessBaseAPISetSourceResolution(handle, dpi)
+		text = lib.TessBaseAPIGetUTF8Text(handle)
+		try:
+			if not text:
+				raise RuntimeError("Tesseract could not read the page")
+			return string_at(text).decode("utf-8", errors="replace")
+		finally:
+			if text:
+				lib.TessDeleteText(text)
+			lib.TessBaseAPIClear(handle)
+
+	def languages(self) -> Set[str]:
+		"""Language packs in this engine's tessdata directory."""
+		names = self._lib.TessBaseAPIGetAvailableLanguagesAsVector(self._handle)
+		if not names:
+			return set()
+		try:
+			found = set()
+			i = 0
+			while names[i] is not None:
+				found.add(names[i].decode())
+				i += 1
+			return found
+		finally:
+			self._lib.TessDeleteTextArray(names)
+
+	def close(self) -> None:
+		if self._handle is not None:
+			self._lib.TessBaseAPIEnd(self._handle)
+			self._lib.TessBaseAPIDelete(self._handle)
+			self._handle = None
+
+
+class EnginePool:
+	"""Initialized engines per (language, engine mode), created on first use, up to size each."""
+
+	def __init__(self, size: int = ENGINES_PER_LANGUAGE):
+		self.size = max(1, size)
+		self._idle: Dict[tuple, List[TesseractEngine]] = {}
+		self._count: Dict[tuple, int] = {}
+		self._available = threading.Condition()
+
+	@contextmanager
+	def engine(self, lang: str, oem: int = OEM_DEFAULT) -> Iterator[TesseractEngine]:
+		key = (lang, oem)
+		engine = None
+		with self._available:
+			while True:
+				idle = self._idle.setdefault(key, [])
+				if idle:
+					engine = idle.pop()
+					break
+				if self._count.get(key, 0) < self.size:
+					self._count[key] = self._count.get(key, 0) + 1
+					break
+				self._available.wait()
+		if engine is None:
+			try:
+				engine = TesseractEngine(lang, oem)
+			except Exception:
+				with self._available:
+					self._count[key] -= 1
+					self._available.notify()
+				raise
+		try:
+			yield engine
+		finally:
+			with self._available:
+				self._idle[key].append(engine)
+				self._available.notify()
+
+	def close(self) -> None:
+		"""Free the idle engines (those in use are freed with the process)."""
+		with self._available:
+			for key, engines in self._idle.items():
+				for engine in engines:
+					engine.close()
+				self._count[key] -= len(engines)
+				engines.clear()
+
+
+_pool = EnginePool()
+# Ending the engines before exit keeps libtesseract from reporting their models as leaked
+atexit.register(lambda: _pool.close())
+
+
+def languages() -> Set[str]:
+	"""Language packs libtesseract can load: asked of a short-lived English
+	engine, or else the .traineddata files in TESSDATA_PREFIX or TESSDATA_DIRS."""
+	try:
+		engine = TesseractEngine("eng")
+	except RuntimeError as e:
+		print(f"[ocr] {e}; listing tessdata directories instead")
+	else:
+		try:
+			return engine.languages()
+		finally:
+			engine.close()
+	prefix = os.environ.get("TESSDATA_PREFIX")
+	# The tessdata directory itself on Tesseract 4 and later, its parent on 3.x
+	dirs = [prefix, os.path.join(prefix, "tessdata")] if prefix else []
+	dirs += [d for pattern in TESSDATA_DIRS for d in sorted(glob.glob(pattern))]
+	for d in dirs:
+		found = {os.path.basename(f)[:-len(".traineddata")] for f in glob.glob(os.path.join(d, "*.traineddata"))}
+		if found:
+			return found
+	return set()
+
+
+def read(image: Image.Image, lang: str, psm: int = PSM_AUTO, dpi: Optional[int] = None, oem: int = OEM_DEFAULT) -> str:
+	"""Text of a page image, read by a pooled engine for lang."""
+	with _pool.engine(lang, oem) as engine:
+		return engine.read(image, psm, dpi)
+
+
+def close_engines() -> None:
+	_pool.close()
@@ -0,0 +1,125 @@
+"""Contract versions: the chain of renegotiated uploads and what changed between them.
+
+A contract uploaded with previous_version_id is the next version of that
+contract. Its flags are carried over from the previous version for the
+unchanged text, and only the changed text is re-analyzed (see app.diffing).
+The previous version's GPT analysis is reused unless a flag was introduced
+or resolved. Otherwise GPT is called again, with the changed clauses first
+in its context.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .diffing import Span, map_span
+from .segmenter import Clause, own_spans
+
+# Longest chain walked when listing versions
+MAX_VERSIONS = 500
+
+
+def _get(flag: Any, key: str):
+	return flag[key] if isinstance(flag, dict) else getattr(flag, key)
+
+
+def changed_clauses(spans: List[Span], clauses: List[Clause]) -> Set[int]:
+	"""Ordinals of the new version's clauses whose own text was changed, inserted
+	or had text removed from it."""
+	changes = [(b1, b2) for tag, _, _, b1, b2 in spans if tag != "equal"]
+	if not changes:
+		return set()
+	own = own_spans(clauses)
+	starts = [start for _, start, _ in own]
+	changed = set()
+	for b1, b2 in changes:
+		# Removed text (b1 == b2) belongs to the clause it was removed from
+		first = max(0, bisect_right(starts, b1) - 1)
+		for ordinal, start, end in own[first:]:
+			if start > b2 or (start == b2 and b2 > b1):
+				break
+			if end > b1 or (end == b1 and b1 == b2):
+				changed.add(ordinal)
+	return changed
+
+
+@dataclass
+class FlagChanges:
+	"""Flags of two versions: resolved ones are the older version's, the others the newer's."""
+	resolved: List[Any] = field(default_factory=list)
+	introduced: List[Any] = field(default_factory=list)
+	unchanged: List[Any] = field(default_factory=list)
+
+
+def compare_flags(spans: List[Span], old_flags: List[Any], new_flags: List[Any]) -> FlagChanges:
+	"""Match the flags of two versions (ClauseFlag rows or analyzer dicts).
+
+	A new flag is unchanged when a flag of the same rule sat at the same place
+	in the old version: the same offsets after the edits, or, for a flag whose
+	text was edited, any overlap with them. The old flags left over were
+	resolved, and the new ones left over were introduced."""
+	changes = FlagChanges()
+	starts = [span[1] for span in spans]
+	pending: Dict[Tuple[str, int, int], List[Any]] = {}
+	for flag in new_flags:
+		pending.setdefault((_get(flag, "rule_id"), _get(flag, "start_index"), _get(flag, "end_index")), []).append(flag)
+	moved = []
+	for flag in old_flags:
+		start, end = _get(flag, "start_index"), _get(flag, "end_index")
+		if start is None or not spans:
+			moved.append((flag, start, end))
+			continue
+		new_start, new_end, _ = map_span(spans, starts, start, end)
+		same = pending.get((_get(flag, "rule_id"), new_start, new_end))
+		if same:
+			changes.unchanged.append(same.pop())
+		else:
+			moved.append((flag, new_start, new_end))
+	left = [flag for flags in pending.values() for flag in flags]
+	for flag, start, end in moved:
+		match = next((
+			other for other in left
+			if _get(other, "rule_id") == _get(flag, "rule_id") and (
+				start is None or _get(other, "start_index") is None
+				or (_get(other, "start_index") <= end and start <= _get(other, "end_index"))
+			)
+		), None)
+		if match is None:
+			changes.resolved.append(flag)
+		else:
+			left.remove(match)
+			changes.unchanged.append(match)
+	changes.introduced = left
+	changes.unchanged.sort(key=lambda flag: _get(flag, "start_index") or 0)
+	return changes
+
+
+def next_version(previous: models.Contract) -> int:
+	return (previous.version or 1) + 1
+
+
+def version_chain(db: Session, contract: models.Contract) -> List[models.Contract]:
+	"""The versions of contract, oldest first. After a fork (two uploads naming
+	the same previous version), the newest branch is followed."""
+	chain = [contract]
+	seen = {contract.id}
+	while chain[0].previous_version_id is not None and len(chain) < MAX_VERSIONS:
+		previous = db.query(models.Contract).filter_by(id=chain[0].previous_version_id, user_id=contract.user_id).first()
+		if previous is None or previous.id in seen:
+			break
+		chain.insert(0, previous)
+		seen.add(previous.id)
+	while len(chain) < MAX_VERSIONS:
+		following = (
+			db.query(models.Contract)
+			.filter_by(previous_version_id=chain[-1].id, user_id=contract.user_id)
+			.order_by(models.Contract.created_at.desc(), models.Contract.id.desc())
+			.first()
+		)
+		if following is None or following.id in seen:
+			break
+		chain.append(following)
+		seen.add(following.id)
+	return chain
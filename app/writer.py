@@ -0,0 +1,135 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+from .database import WriterSession
+
+# Writes queued within this window are committed together (one fsync per batch)
+WRITER_MAX_BATCH = int(os.environ.get("CG_SQLITE_WRITER_BATCH", "64"))
+WRITER_MAX_DELAY = float(os.environ.get("CG_SQLITE_WRITER_DELAY_MS", "2")) / 1000
+
+_STOP = object()
+
+
+class SQLiteWriter:
+	"""Single writer thread that owns all SQLite writes of this process.
+
+	Jobs are callables taking a Session. The thread drains the queue into
+	batches, runs each job inside a SAVEPOINT (a failing job is rolled back
+	alone and its caller gets the exception) and commits the batch once.
+	Cross-process contention is left to BEGIN IMMEDIATE + busy_timeout.
+	"""
+
+	def __init__(self, session_factory=None, max_batch: int = WRITER_MAX_BATCH, max_delay: float = WRITER_MAX_DELAY):
+		self.session_factory = session_factory or WriterSession
+		self.max_batch = max_batch
+		self.max_delay = max_delay
+		self._queue: "queue.Queue" = queue.Queue()
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+		self.batches = 0
+		self.jobs = 0
+
+	def start(self) -> None:
+		with self._lock:
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+				self._thread.start()
+
+	def stop(self, timeout: float = 10.0) -> None:
+		with self._lock:
+			thread = self._thread
+			self._thread = None
+		if thread is not None and thread.is_alive():
+			self._queue.put(_STOP)
+			thread.join(timeout)
+
+	def submit(self, fn: Callable) -> Future:
+		self.start()
+		future: Future = Future()
+		self._queue.put((fn, future))
+		return future
+
+	async def run(self, fn: Callable):
+		return await asyncio.wrap_future(self.submit(fn))
+
+	def _next_batch(self):
+		first = self._queue.get()
+		if first is _STOP:
+			return None
+		batch = [first]
+		deadline = time.monotonic() + self.max_delay
+		while len(batch) < self.max_batch:
+			remaining = deadline - time.monotonic()
+			try:
+				item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+			except queue.Empty:
+				break
+			if item is _STOP:
+				self._queue.put(_STOP)
+				break
+			batch.append(item)
+		return batch
+
+	def _run(self) -> None:
+		while True:
+			batch = self._next_batch()
+			if batch is None:
+				return
+			self._commit_batch(batch)
+
+	def _commit_batch(self, batch) -> None:
+		results = []
+		session = self.session_factory()
+		try:
+			for fn, future in batch:
+				if not future.set_running_or_notify_cancel():
+					continue
+				savepoint = session.begin_nested()
+				try:
+					result = fn(session)
+					savepoint.commit()
+					results.append((future, result, None))
+				except BaseException as e:
+					savepoint.rollback()
+					results.append((future, None, e))
+			session.commit()
+		except Exception as e:
+			session.rollback()
+			for _, future in batch:
+				if not future.done():
+					future.set_exception(e)
+			return
+		finally:
+			session.close()
+		self.batches += 1
+		self.jobs += len(results)
+		for future, result, error in results:
+			if error is not None:
+				future.set_exception(error)
+			else:
+				future.set_result(result)
+
+
+_writer: Optional[SQLiteWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> SQLiteWriter:
+	"""Get the process-wide writer, creating it if needed"""
+	global _writer
+	with _writer_lock:
+		if _writer is None:
+			_writer = SQLiteWriter()
+		return _writer
+
+
+def stop_writer() -> None:
+	global _writer
+	with _writer_lock:
+		writer, _writer = _writer, None
+	if writer is not None:
+		writer.stop()
@@ -0,0 +1,49 @@
+"""Short English contract text must stay English: another language's rule
+pack would lose its flags."""
+import random
+
+import pytest
+
+from app.language import detect_language
+
+CLAUSES = [
+    "Exclusive services of Artist.",
+    "Cancellation fee applies.",
+    "Arbitration shall take place in Los Angeles, California.",
+    "Payment shall be made within thirty (30) days of receipt of a valid invoice.",
+    "Notices shall be sent in writing to the address above and take effect on receipt.",
+    "This agreement is governed by the laws of the State of New York.",
+    "Artist grants Producer the right to use Artist's name and likeness in perpetuity.",
+    "Performer shall indemnify and hold harmless the Company from any claims.",
+    "The Company may terminate this agreement at any time without notice.",
+    "All rights in the recordings shall vest in the Producer throughout the universe.",
+    "Artist agrees not to render services for any other production during the term.",
+    "The parties shall act in good faith and perform their obligations in a timely manner.",
+]
+
+
+@pytest.mark.parametrize("text", [
+    "Exclusive services of Artist. Cancellation fee applies.",
+    "Arbitration shall take place in Los Angeles, California.",
+])
+def test_reported_clauses_are_english(text):
+    assert detect_language(text) == "en"
+
+
+@pytest.mark.parametrize("sentences", [1, 2, 4, 6, 8])
+def test_random_short_english_is_english(sentences):
+    rng = random.Random(sentences)
+    for _ in range(100):
+        text = " ".join(rng.sample(CLAUSES, sentences))
+        assert detect_language(text) == "en", text
+
+
+def test_longer_foreign_text_is_detected():
+    spanish = (
+        "El Artista cede al Productor todos los derechos sobre las grabaciones a perpetuidad y en todo el universo. "
+        "El pago se realizará dentro de los sesenta días siguientes a la recepción de la factura. "
+        "Cualquier controversia se resolverá mediante arbitraje vinculante en la ciudad de Madrid. "
+        "El Productor podrá rescindir este contrato en cualquier momento sin previo aviso. "
+        "El Artista se obliga a indemnizar y mantener indemne al Productor frente a cualquier reclamación."
+    )
+    assert detect_language(spanish) == "es"
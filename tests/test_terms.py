@@ -0,0 +1,44 @@
+"""Periods that run after the contract, or belong to a restriction, must not
+become its term: the expiry date derived from the term sets its deadlines."""
+from app.terms import DURATION, EXPIRY_DATE, TERM_LENGTH, extract_terms
+
+
+def _kinds(text):
+    return [(t.kind, t.value) for t in extract_terms(text)]
+
+
+def test_period_thereafter_is_not_the_term():
+    terms = _kinds(
+        "This Agreement commences on March 1, 2024. During the Term and for twelve (12) months thereafter, "
+        "Artist shall not perform for any competitor. The term of this Agreement is three (3) years."
+    )
+    assert (DURATION, "12 months") in terms
+    assert [value for kind, value in terms if kind == TERM_LENGTH] == ["3 years"]
+    assert (EXPIRY_DATE, "2027-03-01") in terms
+
+
+def test_non_compete_after_expiration_is_not_the_term():
+    terms = _kinds(
+        "This Agreement commences on March 1, 2024. Artist shall not compete for a period of 24 months "
+        "following expiration. This Agreement shall continue for a period of 2 years."
+    )
+    assert (DURATION, "24 months") in terms
+    assert (EXPIRY_DATE, "2026-03-01") in terms
+
+
+def test_non_compete_alone_derives_no_expiry():
+    terms = _kinds("This Agreement commences on March 1, 2024. Artist shall not compete for a period of 24 months following expiration.")
+    assert (DURATION, "24 months") in terms
+    assert not [t for t in terms if t[0] in (TERM_LENGTH, EXPIRY_DATE)]
+
+
+def test_named_term_wins_over_an_earlier_period():
+    terms = _kinds(
+        "Effective January 1, 2020. The exclusivity period of 6 months starts on signing. "
+        "The Agreement shall remain in full force and effect for 18 months."
+    )
+    assert (EXPIRY_DATE, "2021-07-01") in terms
+
+
+def test_notice_period_is_a_duration():
+    assert _kinds("Either party may terminate on a notice period of 30 days.") == [(DURATION, "30 days")]